@@ -0,0 +1,244 @@
+"""
+Hermetic end-to-end benchmark of auto_process against local stand-ins
+
+Usage:
+    python benchmarks/bench_e2e.py [--episodes 8] [--audio-seconds 600] [--transcribe local|api]
+                                   [--output report.json] [--compare baseline.json]
+
+Starts three local servers: episode pages + synthetic audio (+ a Whisper API
+for --transcribe api), an OpenAI-compatible streaming endpoint and the Notion
+stand-in with real rate and size limits. auto_process then runs unmodified in
+a fresh process and temporary directory, with the browser replaced by an HTTP
+page driver (use --chrome to keep Selenium). Per-span metrics come from the
+METRICS_JSONL export; the JSON report holds per-stage timings, throughput,
+peak memory and service counters, tagged with the git commit, and --compare
+prints the change against an earlier report.
+
+--transcribe local (the default) runs the real Whisper model and needs
+faster-whisper and ffmpeg; --transcribe api needs neither.
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+SRC = os.path.join(ROOT, "src")
+sys.path.insert(0, SRC)
+sys.path.insert(0, BENCH_DIR)
+
+# Metrics compared between reports (dotted paths into the report) and whether lower is better
+COMPARED = [
+    ("wall_seconds", True),
+    ("throughput.episodes_per_minute", False),
+    ("throughput.audio_realtime_factor", False),
+    ("peak_rss_mb", True),
+    ("stages.download.mean", True),
+    ("stages.transcribe.mean", True),
+    ("stages.analyze.mean", True),
+    ("stages.upload.mean", True),
+    ("spans.llm.completion.first_token_seconds.mean", True),
+    ("services.notion.requests", True),
+    ("services.notion.rate_limited", True),
+]
+
+def run_child(chrome: bool) -> None:
+    """Run auto_process.main() in this process (cwd is the benchmark work directory)"""
+    if not chrome:
+        import selenium.webdriver
+        from mock_podcast import PageDriver
+        selenium.webdriver.Chrome = PageDriver
+    logging.getLogger("notion_client").setLevel(logging.ERROR)
+    import auto_process
+    sys.argv = ["auto_process.py"]
+    auto_process.main()
+
+def summarize(values: list) -> dict:
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "total": round(sum(values), 4),
+        "mean": round(statistics.mean(values), 4),
+        "p50": round(values[len(values) // 2], 4),
+        "p95": round(values[min(len(values) - 1, int(len(values) * 0.95))], 4),
+        "max": round(values[-1], 4),
+    }
+
+def read_metrics(path: str) -> tuple:
+    """
+    Aggregate the METRICS_JSONL export
+
+    Returns:
+        tuple: (spans {name: timing summary + field summaries + errors}, peak sampled RSS in bytes)
+    """
+    seconds, fields, errors, peak_rss = {}, {}, {}, 0
+    if not os.path.exists(path):
+        return {}, 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            name = entry.pop("span")
+            if name == "process":
+                peak_rss = max(peak_rss, entry.get("rss_bytes", 0))
+                continue
+            seconds.setdefault(name, []).append(entry.pop("seconds"))
+            if entry.pop("status") == "error":
+                errors[name] = errors.get(name, 0) + 1
+            for key, value in entry.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool) and key != "ts":
+                    fields.setdefault(name, {}).setdefault(key, []).append(value)
+    spans = {}
+    for name, values in seconds.items():
+        spans[name] = dict(summarize(values), errors=errors.get(name, 0))
+        for key, field_values in fields.get(name, {}).items():
+            spans[name][key] = summarize(field_values)
+    return spans, peak_rss
+
+def git_revision() -> dict:
+    def git(*args):
+        result = subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True)
+        return result.stdout.strip() if result.returncode == 0 else None
+    return {"commit": git("rev-parse", "--short", "HEAD"), "dirty": bool(git("status", "--porcelain", "--", "src"))}
+
+def lookup(report: dict, dotted: str):
+    """Follow a dotted path; span names contain dots, so keys are matched greedily"""
+    node, parts = report, dotted.split(".")
+    while parts and isinstance(node, dict):
+        for size in range(len(parts), 0, -1):
+            key = ".".join(parts[:size])
+            if key in node:
+                node, parts = node[key], parts[size:]
+                break
+        else:
+            return None
+    return node if not parts and isinstance(node, (int, float)) else None
+
+def compare(old: dict, new: dict) -> None:
+    print(f"\nvs {old.get('git', {}).get('commit')} ({old.get('timestamp', '?')})")
+    changed = sorted(key for key in new["config"] if old.get("config", {}).get(key) != new["config"][key])
+    if changed:
+        print(f"Warning: configuration differs ({', '.join(changed)}); numbers are not comparable")
+    print(f"{'metric':<46} {'before':>10} {'after':>10} {'change':>8}")
+    for metric, lower_is_better in COMPARED:
+        before, after = lookup(old, metric), lookup(new, metric)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before * 100 if before else 0.0
+        better = (change < 0) == lower_is_better or change == 0
+        print(f"{metric:<46} {before:>10.3f} {after:>10.3f} {change:>+7.1f}%{'' if better else ' !'}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Hermetic end-to-end pipeline benchmark")
+    parser.add_argument("--episodes", type=int, default=8)
+    parser.add_argument("--audio-seconds", type=float, default=600, help="Length of each synthetic episode")
+    parser.add_argument("--bandwidth-mbps", type=float, default=100, help="Audio download speed (0 = unlimited)")
+    parser.add_argument("--transcribe", choices=["local", "api"], default="local")
+    parser.add_argument("--asr-rtf", type=float, default=0.02, help="Mock Whisper API seconds per audio second")
+    parser.add_argument("--llm-tps", type=float, default=60, help="Mock LLM tokens per second per stream")
+    parser.add_argument("--llm-ttft", type=float, default=0.8, help="Mock LLM time to first token (s)")
+    parser.add_argument("--llm-tokens", type=int, default=1200, help="Completion tokens per analysis")
+    parser.add_argument("--notion-rate", type=float, default=3.0, help="Mock Notion requests/second")
+    parser.add_argument("--notion-latency", type=float, default=0.05)
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--compare", metavar="REPORT", help="Earlier JSON report to compare against")
+    parser.add_argument("--keep", action="store_true", help="Keep the work directory")
+    parser.add_argument("--chrome", action="store_true", help="Scrape pages with Selenium/Chrome")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args.chrome)
+
+    from mock_llm import MockLLMServer
+    from mock_notion import MockNotionServer
+    from mock_podcast import MockPodcastServer
+
+    podcast = MockPodcastServer(
+        args.episodes, args.audio_seconds, args.bandwidth_mbps * 125000, args.asr_rtf
+    ).start()
+    llm = MockLLMServer(args.llm_tps, args.llm_ttft, args.llm_tokens).start()
+    notion = MockNotionServer(rate=args.notion_rate, latency=args.notion_latency).start()
+
+    workdir = tempfile.mkdtemp(prefix="bench_e2e_")
+    with open(os.path.join(workdir, "podcast_urls.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(podcast.episode_urls()) + "\n")
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join([SRC, BENCH_DIR]),
+        OPENROUTER_API_KEY="bench", OPENROUTER_BASE_URL=f"{llm.url}/v1",
+        NOTION_TOKEN="secret_bench", NOTION_DATABASE_ID="bench-db", NOTION_BASE_URL=notion.url,
+        TRANSCRIBE_MODE=args.transcribe, TRANSCRIBE_API_URL=f"{podcast.url}/transcribe",
+        METRICS_JSONL=os.path.join(workdir, "metrics.jsonl"), METRICS_PROM="", METRICS_SAMPLE_SECONDS="0.5",
+        JOB_LEDGER_PATH=os.path.join(workdir, "jobs.db"),
+    )
+    log_path = os.path.join(workdir, "auto_process.log")
+    print(f"{args.episodes} episode(s) x {args.audio_seconds:.0f}s audio, transcribe={args.transcribe}, work dir {workdir}")
+    start = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        child = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child"] + (["--chrome"] if args.chrome else []),
+            cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+    wall = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux: the peak of the (only) child process
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+    spans, sampled_rss = read_metrics(env["METRICS_JSONL"])
+    stages = {name[len("stage."):]: summary for name, summary in spans.items() if name.startswith("stage.")}
+    succeeded = notion.state.stats["by_endpoint"].get("POST pages", 0)
+    audio_hours = args.episodes * args.audio_seconds / 3600
+    report = {
+        "git": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {key: value for key, value in vars(args).items() if key not in ("child", "output", "compare", "keep")},
+        "exit_code": child.returncode,
+        "wall_seconds": round(wall, 3),
+        "episodes": {"total": args.episodes, "uploaded": succeeded},
+        "throughput": {
+            "episodes_per_minute": round(succeeded / wall * 60, 3),
+            "audio_realtime_factor": round(audio_hours * 3600 / wall, 2) if succeeded == args.episodes else 0.0,
+        },
+        "peak_rss_mb": round(peak_rss_mb, 1),
+        "sampled_peak_rss_mb": round(sampled_rss / 2**20, 1),
+        "stages": {name: stages[name] for name in ("download", "transcribe", "analyze", "upload") if name in stages},
+        "spans": {name: summary for name, summary in spans.items() if not name.startswith("stage.")},
+        "services": {"podcast": podcast.state.stats, "llm": llm.state.stats,
+                     "notion": {key: value for key, value in notion.state.stats.items() if key != "by_endpoint"}},
+    }
+
+    print(f"exit {child.returncode}, {succeeded}/{args.episodes} uploaded in {wall:.1f}s "
+          f"({report['throughput']['episodes_per_minute']:.2f} episodes/min, "
+          f"{report['throughput']['audio_realtime_factor']:.0f}x realtime), peak RSS {peak_rss_mb:.0f} MiB")
+    print(f"{'stage':<12} {'count':>5} {'mean s':>8} {'p95 s':>8} {'max s':>8}")
+    for name, s in report["stages"].items():
+        print(f"{name:<12} {s['count']:>5} {s['mean']:>8.2f} {s['p95']:>8.2f} {s['max']:>8.2f}")
+    notion_stats = report["services"]["notion"]
+    print(f"LLM: {llm.state.stats['requests']} requests, {llm.state.stats['completion_tokens']} completion tokens; "
+          f"Notion: {notion_stats['requests']} requests, {notion_stats['rate_limited']} rate limited, "
+          f"{notion_stats['rejected']} rejected")
+    if child.returncode != 0 or succeeded < args.episodes:
+        print(f"See {log_path} for the auto_process output")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Report written to {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+    for server in (podcast, llm, notion):
+        server.stop()
+    if not args.keep and child.returncode == 0 and succeeded == args.episodes:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Micro-benchmarks for the Markdown -> Notion compiler
+
+Usage:
+    python benchmarks/bench_markdown.py [--repeat 5]
+
+Reports the best time per run and microseconds per KB for growing synthetic
+analyses and for marker-heavy single lines. Linear scaling shows up as a
+roughly constant us/KB column.
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from bench_notion_upload import synthetic_analysis
+
+def marker_heavy_line(n: int) -> str:
+    """Unmatched and nested markers, the worst case for find()-based scanning"""
+    return "".join(f"*a **b `c [d" if i % 2 else "e** f* g` h](http://x.io) " for i in range(n))
+
+def bench(label: str, func, text: str, repeat: int) -> None:
+    number = max(1, 200_000 // max(len(text), 1))
+    best = min(timeit.repeat(lambda: func(text), number=number, repeat=repeat)) / number
+    size_kb = len(text.encode("utf-8")) / 1024
+    print(f"{label:<28} {size_kb:>9.1f} {best * 1000:>10.3f} {best * 1e6 / size_kb:>8.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Markdown compiler micro-benchmarks")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions (best is reported)")
+    args = parser.parse_args()
+
+    from notion_utils import convert_markdown_to_notion_blocks, parse_markdown_text
+
+    print(f"{'case':<28} {'KB':>9} {'ms':>10} {'us/KB':>8}")
+    for sections in (10, 40, 160, 640):
+        bench(f"analysis x{sections}", convert_markdown_to_notion_blocks, synthetic_analysis(sections), args.repeat)
+    for n in (100, 1000, 10000):
+        bench(f"marker-heavy line x{n}", parse_markdown_text, marker_heavy_line(n), args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark concurrent Notion uploads through the shared request scheduler
+
+Usage:
+    python benchmarks/bench_notion_scheduler.py [--workers 1,4,8] [--pages 8] [--rate 3]
+
+Uploads the same batch of pages with a growing number of worker threads
+against the local Notion stand-in. With the scheduler the 429 column stays at
+(or near) zero and throughput holds at the mock's rate regardless of workers.
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from mock_notion import MockNotionServer
+from bench_notion_upload import synthetic_analysis
+
+def main():
+    parser = argparse.ArgumentParser(description="Notion scheduler benchmark")
+    parser.add_argument("--workers", default="1,4,8", help="Comma separated upload worker counts")
+    parser.add_argument("--pages", type=int, default=8, help="Pages uploaded per run")
+    parser.add_argument("--sections", type=int, default=5, help="Analysis sections per page")
+    parser.add_argument("--rate", type=float, default=3.0, help="Mock requests/second")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock per-request latency (s)")
+    args = parser.parse_args()
+
+    logging.getLogger("notion_client").setLevel(logging.ERROR)
+    server = MockNotionServer(rate=args.rate, burst=3, latency=args.latency).start()
+    os.environ["NOTION_BASE_URL"] = server.url
+
+    from notion_utils import upload_to_notion
+    from notion_scheduler import get_scheduler
+
+    analysis = synthetic_analysis(args.sections)
+    scheduler = get_scheduler()
+    print(f"{'workers':>7} {'pages':>5} {'requests':>8} {'429s':>5} {'max queue':>9} {'seconds':>8} {'req/s':>6}")
+    for workers in (int(n) for n in args.workers.split(",")):
+        before = dict(server.state.stats)
+        peak = {"queue": 0}
+        done = threading.Event()
+
+        def sample():
+            while not done.wait(0.05):
+                peak["queue"] = max(peak["queue"], scheduler.stats()["queue_depth"])
+
+        def upload(i):
+            podcast_info = {
+                "title": f"Episode {i}", "host": "Host", "date": "2024-01-01",
+                "url": f"https://example.com/{workers}/{i}"
+            }
+            return upload_to_notion(analysis, podcast_info, "secret_benchmark", "benchmark-db", upsert=False)
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            ok = sum(pool.map(upload, range(args.pages)))
+        elapsed = time.perf_counter() - start
+        done.set()
+
+        requests = server.state.stats["requests"] - before["requests"]
+        limited = server.state.stats["rate_limited"] - before["rate_limited"]
+        status = "" if ok == args.pages else f"  {args.pages - ok} FAILED"
+        print(f"{workers:>7} {args.pages:>5} {requests:>8} {limited:>5} {peak['queue']:>9} "
+              f"{elapsed:>8.2f} {requests / elapsed:>6.2f}{status}")
+
+    print(f"scheduler: {scheduler.stats()}")
+    server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark Notion uploads of growing analyses against the local Notion stand-in
+
+Usage:
+    python benchmarks/bench_notion_upload.py [--rate 3] [--latency 0.05]
+
+Prints one row per analysis size: blocks, append requests, 429s and upload time.
+Upload time should grow linearly with the number of blocks.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from mock_notion import MockNotionServer
+
+def synthetic_analysis(sections: int) -> str:
+    """Build a Markdown analysis shaped like real LLM output"""
+    lines = ["# 内容摘要", "本期节目讨论了" + "人工智能与教育的关系，" * 30, ""]
+    lines.append("# Show Notes解读（按原结构扩展）")
+    for i in range(sections):
+        lines.append(f"## 第{i + 1}部分：**关键话题** 与 `术语`")
+        lines.append(f"- 核心观点：*观点{i}* " + "详细展开的论述，" * 20)
+        lines.append(f"- 强化例证：案例{i} [参考链接](https://example.com/{i})")
+        lines.append("  - 二级要点：" + "补充说明" * 10)
+        lines.append(f"1. 编号要点{i}")
+        lines.append("> 引用：" + "原话" * 15)
+        lines.append("")
+    # One very long paragraph to exercise rich text splitting
+    lines.append("超长段落：" + "这是一段非常长的文字。" * 400)
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Notion upload benchmark")
+    parser.add_argument("--rate", type=float, default=3.0, help="Mock requests/second (0 = unlimited)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock per-request latency (s)")
+    parser.add_argument("--sizes", default="10,50,200,800", help="Comma separated section counts")
+    args = parser.parse_args()
+
+    # Retries are expected at the rate limit; keep the client's warnings out of the table
+    logging.getLogger("notion_client").setLevel(logging.ERROR)
+    server = MockNotionServer(rate=args.rate, latency=args.latency).start()
+    os.environ["NOTION_BASE_URL"] = server.url
+
+    from notion_utils import convert_markdown_to_notion_blocks, upload_to_notion
+
+    podcast_info = {"title": "Benchmark", "host": "Host", "date": "2024-01-01", "url": "https://example.com"}
+    print(f"{'sections':>8} {'blocks':>7} {'requests':>8} {'429s':>5} {'seconds':>8} {'ms/block':>8}")
+    for sections in (int(n) for n in args.sizes.split(",")):
+        analysis = synthetic_analysis(sections)
+        blocks = len(convert_markdown_to_notion_blocks(analysis))
+        before = dict(server.state.stats)
+        start = time.perf_counter()
+        # A plain create each time: upsert would diff against the previous size's page
+        ok = upload_to_notion(analysis, podcast_info, "secret_benchmark", "benchmark-db", upsert=False)
+        elapsed = time.perf_counter() - start
+        requests = server.state.stats["requests"] - before["requests"]
+        limited = server.state.stats["rate_limited"] - before["rate_limited"]
+        status = "" if ok else "  FAILED"
+        print(f"{sections:>8} {blocks:>7} {requests:>8} {limited:>5} {elapsed:>8.2f} {elapsed * 1000 / blocks:>8.1f}{status}")
+
+    server.stop()
+
+if __name__ == "__main__":
+    main()
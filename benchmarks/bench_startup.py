@@ -0,0 +1,140 @@
+"""
+Measure cold-start cost of the CLI entry points and the Streamlit app
+
+Usage:
+    python benchmarks/bench_startup.py [--repeat 5] [--top 8] [--app]
+
+Each target is imported in a fresh interpreter under `python -X importtime`;
+the report shows the median wall time, the import time Python attributes to
+the target, and the heaviest top-level packages it pulled in. With --app the
+Streamlit script is also executed once per run through streamlit's AppTest
+harness, giving the time to first render of a new session (imports included).
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+TARGETS = {
+    "auto_process": "import auto_process",
+    "worker": "import worker",
+    "job_ledger CLI": "import job_ledger",
+    "UI page modules": "import download_ui, transcribe_ui, analyze, file_manager_ui, state_manager",
+}
+
+APP_RENDER = f"""
+import time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({os.path.join(SRC, 'app.py')!r}, default_timeout=120)
+at.run()
+for exception in at.exception:
+    print("app exception:", exception.message, file=__import__("sys").stderr)
+print(time.perf_counter() - start, len(at.exception))
+"""
+
+def parse_importtime(stderr: str) -> tuple:
+    """
+    Summarize `-X importtime` output
+
+    Returns:
+        tuple: ({top-level module: cumulative us}, {package: us spent entering it from other packages})
+    """
+    roots, packages, pending = {}, {}, []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        package, cumulative = name.strip().split(".")[0], int(cumulative)
+        # Rows are printed children first; a child from another package is an entry point into it
+        while pending and pending[-1][0] > level:
+            _, child, child_us = pending.pop()
+            if child != package:
+                packages[child] = packages.get(child, 0) + child_us
+        pending.append((level, package, cumulative))
+        if level == 0:
+            roots[name.strip()] = roots.get(name.strip(), 0) + cumulative
+            packages[package] = packages.get(package, 0) + cumulative
+            pending.clear()
+    return roots, packages
+
+def child_env() -> dict:
+    path = os.pathsep.join(filter(None, [SRC, os.environ.get("PYTHONPATH")]))
+    return dict(os.environ, PYTHONPATH=path)
+
+def run_import(statement: str) -> tuple:
+    """
+    Import in a fresh interpreter
+
+    Returns:
+        tuple: (wall seconds, parse_importtime result, error line or None)
+    """
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=SRC, env=child_env(), capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start
+    error = None
+    if proc.returncode != 0:
+        lines = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")]
+        error = lines[-1] if lines else f"exit code {proc.returncode}"
+    return wall, parse_importtime(proc.stderr), error
+
+def bench_target(name: str, statement: str, repeat: int, top: int) -> None:
+    walls, totals, packages = [], [], {}
+    # Modules loaded by the bare interpreter (encodings, site, ...) are not the target's cost
+    startup_roots = set(run_import("pass")[1][0])
+    for _ in range(repeat):
+        wall, (roots, entered), error = run_import(statement)
+        if error:
+            print(f"{name:<18} import failed: {error}")
+            return
+        walls.append(wall)
+        totals.append(sum(us for module, us in roots.items() if module not in startup_roots))
+        for package, us in entered.items():
+            if package not in startup_roots:
+                packages.setdefault(package, []).append(us)
+    medians = {package: statistics.median(values) / 1000 for package, values in packages.items()}
+    heaviest = sorted(medians.items(), key=lambda item: -item[1])[:top]
+    print(f"{name:<18} wall {statistics.median(walls) * 1000:7.0f} ms   imports {statistics.median(totals) / 1000:7.0f} ms")
+    print("    " + ", ".join(f"{package} {ms:.0f}" for package, ms in heaviest))
+
+def bench_app(repeat: int) -> None:
+    renders = []
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-c", APP_RENDER], cwd=SRC,
+            env=child_env(), capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            print(f"{'first render':<18} failed: {proc.stderr.strip().splitlines()[-1]}")
+            return
+        seconds, exceptions = proc.stdout.split()[-2:]
+        if int(exceptions):
+            print(f"{'first render':<18} app raised {exceptions} exception(s): {proc.stderr.strip()[-200:]}")
+        renders.append(float(seconds))
+    print(f"{'first render':<18} {statistics.median(renders) * 1000:7.0f} ms (AppTest, fresh process)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per target")
+    parser.add_argument("--top", type=int, default=8, help="Heaviest packages listed per target")
+    parser.add_argument("--app", action="store_true", help="Also time the first render of the Streamlit app")
+    args = parser.parse_args()
+
+    print(f"Median of {args.repeat} cold starts, import times from -X importtime (ms)")
+    for name, statement in TARGETS.items():
+        bench_target(name, statement, args.repeat, args.top)
+    if args.app:
+        bench_app(args.repeat)
+
+if __name__ == "__main__":
+    main()
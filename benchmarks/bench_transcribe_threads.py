@@ -0,0 +1,101 @@
+"""
+Sweep Whisper thread/worker splits and report the best real-time factor for this host
+
+Usage:
+    python benchmarks/bench_transcribe_threads.py --audio sample.mp3 [--max-seconds 120]
+
+Each configuration (transcription workers x intra-op threads, within the
+detected CPU budget) runs in a fresh process so OpenMP settings take effect.
+Every worker transcribes the clip concurrently; the real-time factor is wall
+time divided by the total audio transcribed (lower is better). Model load time
+is reported separately. Requires faster-whisper and ffmpeg.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+def run_child(audio: str) -> None:
+    """Transcribe the clip once per worker with the plan taken from the environment"""
+    from resources import configure_threads, get_thread_plan
+    configure_threads('batch')
+    from transcribe import get_whisper_model
+
+    plan = get_thread_plan()
+    start = time.perf_counter()
+    model = get_whisper_model('cpu', 'int8')
+    load = time.perf_counter() - start
+
+    def transcribe(_):
+        segments, info = model.transcribe(audio, beam_size=5)
+        list(segments)
+        return info.duration
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=plan['transcribe_workers']) as pool:
+        audio_seconds = sum(pool.map(transcribe, range(plan['transcribe_workers'])))
+    wall = time.perf_counter() - start
+    print(json.dumps({"load": load, "wall": wall, "audio_seconds": audio_seconds}))
+
+def configurations(cpus: int) -> list:
+    """(workers, threads) pairs that fit in the CPU budget, skipping clearly idle splits"""
+    threads = sorted({t for t in (1, 2, 4, 8, 16, cpus) if t <= cpus})
+    return [(w, t) for t in threads for w in range(1, cpus // t + 1) if w * t > cpus // 2 or w == 1]
+
+def main():
+    parser = argparse.ArgumentParser(description="Whisper CPU thread planner benchmark")
+    parser.add_argument("--audio", required=True, help="Audio clip to transcribe")
+    parser.add_argument("--max-seconds", type=float, default=120, help="Trim the clip to this length")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args.audio)
+
+    from resources import available_cpus, plan_threads
+
+    cpus = available_cpus()
+    with tempfile.TemporaryDirectory() as tmp:
+        clip = os.path.join(tmp, "clip.wav")
+        subprocess.run(
+            ["ffmpeg", "-v", "error", "-y", "-i", args.audio, "-t", str(args.max_seconds), "-ac", "1", "-ar", "16000", clip],
+            check=True
+        )
+        print(f"{cpus} usable cores (affinity + cgroup quota)")
+        print(f"{'workers':>7} {'threads':>7} {'load s':>7} {'wall s':>7} {'RTF':>7}")
+        results = []
+        for workers, threads in configurations(cpus):
+            env = dict(
+                os.environ,
+                PIPELINE_TRANSCRIBE_WORKERS=str(workers),
+                WHISPER_CPU_THREADS=str(threads),
+                OMP_NUM_THREADS=str(threads)
+            )
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", "--audio", clip],
+                env=env, cwd=SRC, capture_output=True, text=True
+            )
+            if output.returncode != 0:
+                print(f"{workers:>7} {threads:>7}  failed: {output.stderr.strip().splitlines()[-1:]}")
+                continue
+            run = json.loads(output.stdout.strip().splitlines()[-1])
+            rtf = run["wall"] / run["audio_seconds"]
+            results.append((rtf, workers, threads))
+            print(f"{workers:>7} {threads:>7} {run['load']:>7.1f} {run['wall']:>7.1f} {rtf:>7.3f}")
+
+    if results:
+        rtf, workers, threads = min(results)
+        plan = plan_threads('batch', cpus)
+        print(f"\nBest: {workers} worker(s) x {threads} threads, RTF {rtf:.3f} ({1 / rtf:.1f}x real time)")
+        print(f"Default plan: {plan['transcribe_workers']} worker(s) x {plan['cpu_threads']} threads")
+        print(f"To pin the best split: PIPELINE_TRANSCRIBE_WORKERS={workers} WHISPER_CPU_THREADS={threads}")
+
+if __name__ == "__main__":
+    main()
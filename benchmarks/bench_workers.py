@@ -0,0 +1,98 @@
+"""
+Verify that lease-based workers scale across processes sharing one job ledger
+
+Usage:
+    python benchmarks/bench_workers.py [--episodes 64] [--workers 1,2,4,8]
+
+Each worker process runs the batch pipeline with stand-in stages that sleep
+(download, transcribe, analyze, upload) and claims episodes from a fresh
+SQLite ledger. The table reports episodes/second and speedup over one worker;
+a final run kills one worker midway to show its leases being reclaimed.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+STAGE_SECONDS = {"download": 0.05, "transcribe": 0.3, "analyze": 0.1, "upload": 0.05}
+
+def fake_stage(name):
+    def run(item):
+        time.sleep(STAGE_SECONDS[name])
+        if isinstance(item, str):
+            return {"source_url": item, "audio_path": f"/tmp/{item}"}
+        return dict(item, **{name: True})
+    return run
+
+def worker_main(ledger_path: str, owner: str, ttl: float) -> None:
+    from job_ledger import JobLedger, tracked_stage
+    from pipeline import Stage
+    from worker import run_worker
+
+    ledger = JobLedger(ledger_path)
+    # One transcription at a time per worker, as on a CPU-bound host
+    stages = [
+        Stage("download", tracked_stage(
+            ledger, "download", fake_stage("download"), lambda item: {"audio_path": item["audio_path"]},
+            lambda url, artifact: {"source_url": url, **artifact}
+        ), 2),
+        Stage("transcribe", tracked_stage(ledger, "transcribe", fake_stage("transcribe")), 1),
+        Stage("analyze", tracked_stage(ledger, "analyze", fake_stage("analyze")), 2),
+        Stage("upload", tracked_stage(ledger, "upload", fake_stage("upload")), 2)
+    ]
+    run_worker(ledger, stages, owner, ttl=ttl, poll=0.2)
+    ledger.close()
+
+def run(episodes: int, workers: int, ttl: float, kill_after: float = None) -> tuple:
+    from job_ledger import JobLedger
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "jobs.db")
+        ledger = JobLedger(path)
+        ledger.enqueue([f"episode-{i}" for i in range(episodes)])
+        processes = [
+            multiprocessing.Process(target=worker_main, args=(path, f"worker-{n}", ttl))
+            for n in range(workers)
+        ]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        if kill_after:
+            time.sleep(kill_after)
+            processes[0].kill()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+        counts = ledger.queue_counts()
+        reclaimed = ledger._execute("SELECT COUNT(*) FROM leases WHERE claims > 1")[0][0]
+        ledger.close()
+    return elapsed, counts, reclaimed
+
+def main():
+    parser = argparse.ArgumentParser(description="Lease-based worker scaling benchmark")
+    parser.add_argument("--episodes", type=int, default=64)
+    parser.add_argument("--workers", default="1,2,4,8", help="Comma separated worker process counts")
+    parser.add_argument("--ttl", type=float, default=2.0, help="Lease length (s)")
+    args = parser.parse_args()
+
+    # Keep stage logs out of the table
+    sys.stdout = open(os.devnull, "w")
+    rows, base = [], None
+    for workers in (int(n) for n in args.workers.split(",")):
+        elapsed, counts, _ = run(args.episodes, workers, args.ttl)
+        base = base or elapsed
+        rows.append(f"{workers:>7} {counts['done']:>5} {elapsed:>8.2f} {args.episodes / elapsed:>7.2f} {base / elapsed:>8.2f}x")
+    elapsed, counts, reclaimed = run(args.episodes, 2, args.ttl, kill_after=1.0)
+    sys.stdout = sys.__stdout__
+
+    print(f"{'workers':>7} {'done':>5} {'seconds':>8} {'ep/s':>7} {'speedup':>9}")
+    print("\n".join(rows))
+    print(f"2 workers, one killed after 1s: {counts['done']}/{args.episodes} done, "
+          f"{reclaimed} lease(s) reclaimed, {elapsed:.2f}s")
+
+if __name__ == "__main__":
+    main()
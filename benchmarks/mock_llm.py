@@ -0,0 +1,154 @@
+"""
+Local OpenAI-compatible chat completions endpoint for benchmarks
+
+Streams a Markdown analysis (headings, bullets, quotes) as server-sent events
+at a configurable token rate after a configurable time to first token, ends
+with a usage chunk when stream_options.include_usage is set, and optionally
+limits concurrent requests with 429 responses like a provider would.
+
+Usage:
+    server = MockLLMServer(tokens_per_second=60, first_token_seconds=0.5).start()
+    os.environ['OPENROUTER_BASE_URL'] = server.url + "/v1"
+"""
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Tokens sent per SSE chunk; keeps the server cheap at high simulated rates
+TOKENS_PER_CHUNK = 4
+
+def synthetic_tokens(count: int) -> list:
+    """Markdown shaped like a real analysis, split into roughly token-sized pieces"""
+    lines = ["# 内容摘要", "本期节目讨论了人工智能、创业与教育。", "", "# Show Notes解读"]
+    section = 0
+    while sum(len(line) for line in lines) < count * 2:
+        section += 1
+        lines += [
+            f"## 第{section}部分：**关键话题**",
+            f"- 核心观点：*观点{section}* 详细展开的论述，包括背景与推理。",
+            f"- 强化例证：案例{section}，嘉宾给出了具体数据。",
+            "> 引用：这是节目中的一句原话。",
+            ""
+        ]
+    text = "\n".join(lines)
+    # Chinese averages about two characters per token
+    return [text[i:i + 2] for i in range(0, min(len(text), count * 2), 2)]
+
+class MockLLMState:
+    def __init__(self, tokens_per_second: float, first_token_seconds: float, completion_tokens: int,
+                 max_concurrency: int):
+        self.lock = threading.Lock()
+        self.tokens_per_second = tokens_per_second
+        self.first_token_seconds = first_token_seconds
+        self.completion_tokens = completion_tokens
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.stats = {"requests": 0, "rejected": 0, "prompt_tokens": 0, "completion_tokens": 0, "peak_in_flight": 0}
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    state: MockLLMState = None
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status: int, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        state = self.state
+        if not self.path.endswith("/chat/completions"):
+            return self._json(404, {"error": {"message": f"Unsupported: {self.path}"}})
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+        with state.lock:
+            state.stats["requests"] += 1
+            if state.max_concurrency and state.in_flight >= state.max_concurrency:
+                state.stats["rejected"] += 1
+                rejected = True
+            else:
+                rejected = False
+                state.in_flight += 1
+                state.stats["peak_in_flight"] = max(state.stats["peak_in_flight"], state.in_flight)
+        if rejected:
+            return self._json(429, {"error": {"message": "Too many concurrent requests", "code": 429}})
+        try:
+            self._complete(request)
+        finally:
+            with state.lock:
+                state.in_flight -= 1
+
+    def _complete(self, request: dict):
+        state = self.state
+        prompt_chars = sum(len(str(message.get("content", ""))) for message in request.get("messages", []))
+        prompt_tokens = prompt_chars // 2
+        tokens = synthetic_tokens(state.completion_tokens)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                 "total_tokens": prompt_tokens + len(tokens)}
+        with state.lock:
+            state.stats["prompt_tokens"] += prompt_tokens
+            state.stats["completion_tokens"] += len(tokens)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = request.get("model", "mock")
+        time.sleep(state.first_token_seconds)
+
+        if not request.get("stream"):
+            time.sleep(len(tokens) / state.tokens_per_second if state.tokens_per_second else 0)
+            return self._json(200, {
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)},
+                             "finish_reason": "stop"}],
+                "usage": usage
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        def event(choices: list, extra: dict = None) -> bytes:
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": choices, **(extra or {})}
+            return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode()
+
+        try:
+            start = time.perf_counter()
+            for i in range(0, len(tokens), TOKENS_PER_CHUNK):
+                delta = "".join(tokens[i:i + TOKENS_PER_CHUNK])
+                self.wfile.write(event([{"index": 0, "delta": {"content": delta}, "finish_reason": None}]))
+                self.wfile.flush()
+                if state.tokens_per_second:
+                    ahead = (i + TOKENS_PER_CHUNK) / state.tokens_per_second - (time.perf_counter() - start)
+                    if ahead > 0:
+                        time.sleep(ahead)
+            self.wfile.write(event([{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+            if request.get("stream_options", {}).get("include_usage"):
+                self.wfile.write(event([], {"usage": usage}))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+class MockLLMServer:
+    """
+    Threaded mock chat completions server bound to a free local port
+    """
+
+    def __init__(self, tokens_per_second: float = 60, first_token_seconds: float = 0.5,
+                 completion_tokens: int = 1200, max_concurrency: int = 0):
+        self.state = MockLLMState(tokens_per_second, first_token_seconds, completion_tokens, max_concurrency)
+        handler = type("Handler", (MockLLMHandler,), {"state": self.state})
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def start(self) -> "MockLLMServer":
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
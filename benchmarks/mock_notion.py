@@ -0,0 +1,221 @@
+"""
+Local Notion API stand-in for benchmarks
+
+Implements the endpoints the uploader uses (databases, pages, block children
+including positional inserts, block update/delete)
+and enforces the real request limits: 100 children per append, 2000 characters
+per rich text item, 100 rich text items per block, and an average request rate
+(token bucket) answered with 429 + Retry-After when exceeded.
+
+Usage:
+    server = MockNotionServer(rate=3.0, latency=0.05).start()
+    os.environ['NOTION_BASE_URL'] = server.url
+"""
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MAX_CHILDREN = 100
+MAX_TEXT_LENGTH = 2000
+MAX_RICH_TEXT_ITEMS = 100
+
+class MockNotionState:
+    """
+    In-memory workspace plus request statistics
+    """
+
+    def __init__(self, rate: float, burst: int, latency: float):
+        self.lock = threading.Lock()
+        self.rate = rate
+        self.burst = burst
+        self.latency = latency
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self.databases = {}
+        self.pages = {}
+        self.children = {}   # parent id -> [block id]
+        self.blocks = {}     # block id -> block
+        self.stats = {"requests": 0, "rate_limited": 0, "rejected": 0, "by_endpoint": {}}
+
+    def take_token(self) -> float:
+        """Return 0 if the request may proceed, else the seconds to wait"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+            if not self.rate or self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def database(self, db_id: str) -> dict:
+        return self.databases.setdefault(db_id, {
+            "object": "database",
+            "id": db_id,
+            "properties": {
+                "Title": {"type": "title", "title": {}},
+                "Date": {"type": "date", "date": {}},
+                "URL": {"type": "url", "url": {}}
+            }
+        })
+
+def _validate_blocks(blocks: list, depth: int = 0) -> str:
+    """Return an error message if blocks violate Notion limits"""
+    if len(blocks) > MAX_CHILDREN:
+        return f"body.children.length should be ≤ `{MAX_CHILDREN}`, instead was `{len(blocks)}`."
+    for block in blocks:
+        body = block.get(block.get("type"), {})
+        rich_text = body.get("rich_text", [])
+        if len(rich_text) > MAX_RICH_TEXT_ITEMS:
+            return f"rich_text.length should be ≤ `{MAX_RICH_TEXT_ITEMS}`"
+        for item in rich_text:
+            if len(item.get("text", {}).get("content", "")) > MAX_TEXT_LENGTH:
+                return f"text.content.length should be ≤ `{MAX_TEXT_LENGTH}`"
+        if body.get("children"):
+            if depth >= 1:
+                return "children nested too deeply"
+            error = _validate_blocks(body["children"], depth + 1)
+            if error:
+                return error
+    return ""
+
+class MockNotionHandler(BaseHTTPRequestHandler):
+    state: MockNotionState = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status: int, code: str, message: str, headers: dict = None):
+        self._send(status, {"object": "error", "status": status, "code": code, "message": message}, headers)
+
+    def _store_children(self, parent_id: str, blocks: list, after: str = None, at_start: bool = False) -> list:
+        siblings = self.state.children.setdefault(parent_id, [])
+        insert_at = siblings.index(after) + 1 if after in siblings else (0 if at_start else len(siblings))
+        results = []
+        for block in blocks:
+            block = dict(block)
+            body = dict(block.get(block["type"], {}))
+            nested = body.pop("children", None)
+            block[block["type"]] = body
+            block.update({"object": "block", "id": str(uuid.uuid4()), "has_children": bool(nested)})
+            self.state.blocks[block["id"]] = block
+            siblings.insert(insert_at, block["id"])
+            insert_at += 1
+            if nested:
+                self._store_children(block["id"], nested)
+            results.append(block)
+        return results
+
+    def _handle(self, method: str):
+        state = self.state
+        wait = state.take_token()
+        path = self.path.split("?")[0].strip("/").split("/")[1:]  # drop "v1"
+        endpoint = f"{method} {path[0] if path else ''}"
+        with state.lock:
+            state.stats["requests"] += 1
+            state.stats["by_endpoint"][endpoint] = state.stats["by_endpoint"].get(endpoint, 0) + 1
+        if wait:
+            with state.lock:
+                state.stats["rate_limited"] += 1
+            return self._error(429, "rate_limited", "Rate limited", {"Retry-After": f"{wait:.2f}"})
+        if state.latency:
+            time.sleep(state.latency)
+
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+        with state.lock:
+            if path[:1] == ["databases"] and len(path) == 2:
+                database = state.database(path[1])
+                if method == "PATCH":
+                    for name, prop in payload.get("properties", {}).items():
+                        prop_type = next(iter(prop))
+                        database["properties"][name] = {"type": prop_type, prop_type: prop[prop_type]}
+                return self._send(200, database)
+            if path[:1] == ["databases"] and path[2:] == ["query"]:
+                return self._send(200, {"object": "list", "results": [], "has_more": False, "next_cursor": None})
+            if path == ["pages"] and method == "POST":
+                page = {"object": "page", "id": str(uuid.uuid4()), **payload}
+                state.pages[page["id"]] = page
+                return self._send(200, page)
+            if path[:1] == ["pages"] and len(path) == 2:
+                page = state.pages.get(path[1])
+                if not page:
+                    return self._error(404, "object_not_found", "Page not found")
+                if method == "PATCH":
+                    page.setdefault("properties", {}).update(payload.get("properties", {}))
+                return self._send(200, page)
+            if path[:1] == ["blocks"] and path[2:] == ["children"]:
+                if method == "PATCH":
+                    error = _validate_blocks(payload.get("children", []))
+                    if error:
+                        state.stats["rejected"] += 1
+                        return self._error(400, "validation_error", error)
+                    results = self._store_children(
+                        path[1], payload["children"], payload.get("after"),
+                        payload.get("position", {}).get("type") == "start"
+                    )
+                    return self._send(200, {"object": "list", "results": results})
+                ids = state.children.get(path[1], [])
+                return self._send(200, {
+                    "object": "list",
+                    "results": [state.blocks[i] for i in ids if i in state.blocks],
+                    "has_more": False,
+                    "next_cursor": None
+                })
+            if path[:1] == ["blocks"] and len(path) == 2:
+                block = state.blocks.get(path[1])
+                if not block:
+                    return self._error(404, "object_not_found", "Block not found")
+                if method == "DELETE":
+                    del state.blocks[path[1]]
+                    for siblings in state.children.values():
+                        if path[1] in siblings:
+                            siblings.remove(path[1])
+                    block = dict(block, archived=True)
+                elif method == "PATCH":
+                    block.update(payload)
+                return self._send(200, block)
+        return self._error(400, "invalid_request_url", f"Unsupported: {method} {self.path}")
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+class MockNotionServer:
+    """
+    Threaded mock Notion server bound to a free local port
+    """
+
+    def __init__(self, rate: float = 3.0, burst: int = 10, latency: float = 0.05):
+        self.state = MockNotionState(rate, burst, latency)
+        handler = type("Handler", (MockNotionHandler,), {"state": self.state})
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def start(self) -> "MockNotionServer":
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
@@ -0,0 +1,239 @@
+"""
+Local stand-in for Xiaoyuzhou episode pages, episode audio and a Whisper API server
+
+Episode pages carry the elements download.fetch_episode scrapes (title, host,
+publish time, shownotes JSON, <audio src>). Audio is a silent 128 kbps MPEG-1
+Layer III stream of the configured length, built from empty frames so no
+encoder is needed, and served at a configurable bandwidth. POST /transcribe
+mimics the self-hosted Whisper API used in TRANSCRIBE_MODE=api, taking
+`asr_rtf` seconds per audio second.
+
+PageDriver is a minimal stand-in for selenium's Chrome driver that loads the
+pages over HTTP and answers the XPath lookups fetch_episode makes, so the
+benchmark runs without a browser.
+
+Usage:
+    server = MockPodcastServer(episodes=8, audio_seconds=600).start()
+    urls = server.episode_urls()
+"""
+import json
+import random
+import re
+import threading
+import time
+import urllib.request
+from html.parser import HTMLParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, mono; an all-zero frame body decodes as silence
+FRAME_HEADER = bytes([0xFF, 0xFB, 0x90, 0xC4])
+FRAME_BYTES = 417
+FRAME_SECONDS = 1152 / 44100
+SILENT_FRAME = FRAME_HEADER + bytes(FRAME_BYTES - len(FRAME_HEADER))
+SEGMENT_SECONDS = 5
+
+PHRASES = [
+    "我们今天聊聊大模型", "创业公司如何融资", "开源社区的变化", "嘉宾认为市场还很早",
+    "数据和算力的成本", "产品要先找到用户", "这一期的内容很长", "教育和人工智能的关系",
+]
+
+def audio_bytes(seconds: float) -> int:
+    return int(seconds / FRAME_SECONDS) * FRAME_BYTES
+
+def audio_seconds(size: int) -> float:
+    return size // FRAME_BYTES * FRAME_SECONDS
+
+def srt_time(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d},000"
+
+def synthetic_segments(seconds: float, seed: int = 0) -> list:
+    """(start, end, text) every SEGMENT_SECONDS of audio"""
+    rng = random.Random(seed)
+    return [
+        (start, min(start + SEGMENT_SECONDS, seconds), "，".join(rng.sample(PHRASES, 3)) + "。")
+        for start in range(0, int(seconds), SEGMENT_SECONDS)
+    ]
+
+def episode_page(episode_id: str, audio_url: str) -> str:
+    shownotes = "\n".join(f"{i + 1}. {phrase}" for i, phrase in enumerate(PHRASES[:5]))
+    schema = json.dumps({"@type": "PodcastEpisode", "description": shownotes}, ensure_ascii=False)
+    return f"""<!DOCTYPE html><html><body>
+<h1 class="jsx-1 title">基准测试节目 {episode_id}</h1>
+<a class="jsx-2 name" href="/podcast/bench">Benchmark Host</a>
+<time class="jsx-399326063" datetime="2024-01-01T00:00:00.000Z">2024/01/01</time>
+<script name="schema:podcast-show" type="application/ld+json">{schema}</script>
+<audio src="{audio_url}"></audio>
+</body></html>"""
+
+class MockPodcastState:
+    def __init__(self, episodes: int, audio_seconds: float, bandwidth: float, asr_rtf: float, latency: float):
+        self.lock = threading.Lock()
+        self.episodes = episodes
+        self.audio_seconds = audio_seconds
+        self.bandwidth = bandwidth
+        self.asr_rtf = asr_rtf
+        self.latency = latency
+        self.stats = {"pages": 0, "audio_requests": 0, "audio_bytes": 0, "transcriptions": 0}
+
+    def count(self, key: str, amount: int = 1) -> None:
+        with self.lock:
+            self.stats[key] += amount
+
+class MockPodcastHandler(BaseHTTPRequestHandler):
+    state: MockPodcastState = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        state = self.state
+        if state.latency:
+            time.sleep(state.latency)
+        match = re.fullmatch(r"/episode/([0-9a-f]+)", self.path)
+        if match:
+            state.count("pages")
+            host = self.headers.get("Host")
+            page = episode_page(match.group(1), f"http://{host}/audio/{match.group(1)}.mp3")
+            return self._send(200, page.encode(), "text/html; charset=utf-8")
+        if re.fullmatch(r"/audio/[0-9a-f]+\.mp3", self.path):
+            return self._send_audio()
+        self._send(404, b"not found", "text/plain")
+
+    def _send_audio(self):
+        state = self.state
+        frames = audio_bytes(state.audio_seconds) // FRAME_BYTES
+        state.count("audio_requests")
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Content-Length", str(frames * FRAME_BYTES))
+        self.end_headers()
+        chunk = SILENT_FRAME * 64
+        frames_per_chunk = 64
+        start = time.perf_counter()
+        sent = 0
+        try:
+            while frames > 0:
+                n = min(frames, frames_per_chunk)
+                self.wfile.write(chunk if n == frames_per_chunk else SILENT_FRAME * n)
+                frames -= n
+                sent += n * FRAME_BYTES
+                if state.bandwidth:
+                    ahead = sent / state.bandwidth - (time.perf_counter() - start)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        state.count("audio_bytes", sent)
+
+    def do_POST(self):
+        state = self.state
+        if self.path != "/transcribe":
+            return self._send(404, b"not found", "text/plain")
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        # The multipart body is almost entirely the audio file
+        seconds = audio_seconds(len(body))
+        time.sleep(seconds * state.asr_rtf)
+        state.count("transcriptions")
+        segments = synthetic_segments(seconds, len(body))
+        if b'name="response_format"\r\n\r\nsrt' in body:
+            srt = "\n".join(
+                f"{i}\n{srt_time(start)} --> {srt_time(end)}\n{text}\n"
+                for i, (start, end, text) in enumerate(segments, start=1)
+            )
+            return self._send(200, srt.encode(), "text/plain; charset=utf-8")
+        text = "\n".join(text for _, _, text in segments)
+        self._send(200, json.dumps({"text": text}, ensure_ascii=False).encode(), "application/json")
+
+class MockPodcastServer:
+    """
+    Threaded episode page / audio / Whisper API server bound to a free local port
+    """
+
+    def __init__(self, episodes: int = 8, audio_seconds: float = 600, bandwidth: float = 0,
+                 asr_rtf: float = 0.02, latency: float = 0.02):
+        self.state = MockPodcastState(episodes, audio_seconds, bandwidth, asr_rtf, latency)
+        handler = type("Handler", (MockPodcastHandler,), {"state": self.state})
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def episode_urls(self) -> list:
+        return [f"{self.url}/episode/{i:024x}" for i in range(1, self.state.episodes + 1)]
+
+    def start(self) -> "MockPodcastServer":
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+
+class _Element:
+    def __init__(self, tag: str, attrs: dict):
+        self.tag = tag
+        self.attrs = attrs
+        self.text = ""
+
+    def get_attribute(self, name: str) -> str:
+        return self.text if name == "textContent" else self.attrs.get(name)
+
+class _PageParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.elements = []
+        self._open = []
+
+    def handle_starttag(self, tag, attrs):
+        element = _Element(tag, {key: value or "" for key, value in attrs})
+        self.elements.append(element)
+        self._open.append(element)
+
+    def handle_endtag(self, tag):
+        while self._open:
+            if self._open.pop().tag == tag:
+                break
+
+    def handle_data(self, data):
+        for element in self._open:
+            element.text += data
+
+XPATH = re.compile(r"//(\w+)\[(?:contains\(@(\w+),\s*'([^']*)'\)|@(\w+)='([^']*)')\]")
+
+class PageDriver:
+    """
+    Browser-free stand-in for selenium.webdriver.Chrome (get, find_element, quit)
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.elements = []
+
+    def get(self, url: str) -> None:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            parser = _PageParser()
+            parser.feed(response.read().decode("utf-8"))
+        self.elements = parser.elements
+
+    def find_element(self, by: str, value: str) -> _Element:
+        if by == "tag name":
+            matches = [e for e in self.elements if e.tag == value]
+        else:
+            match = XPATH.fullmatch(value)
+            if not match:
+                raise ValueError(f"Unsupported XPath: {value}")
+            tag, contains_attr, contains_value, equals_attr, equals_value = match.groups()
+            if contains_attr:
+                matches = [e for e in self.elements if e.tag == tag and contains_value in e.attrs.get(contains_attr, "")]
+            else:
+                matches = [e for e in self.elements if e.tag == tag and e.attrs.get(equals_attr) == equals_value]
+        if not matches:
+            raise LookupError(f"No element matches {value}")
+        return matches[0]
+
+    def quit(self) -> None:
+        self.elements = []
@@ -19,7 +19,7 @@ conda activate xyz
 
 # Run the automatic processing script
 echo "Starting podcast processing..."
-python src/auto_process.py
+python src/auto_process.py "$@"  # --watch runs it as a resident service
 
 # Deactivate conda environment
 conda deactivate
@@ -0,0 +1,325 @@
+import argparse
+import threading
+import time
+import os
+from metrics import record
+from resources import available_cpus
+
+# Gate transcriptions on memory and load (1 = on)
+ADMISSION_CONTROL = os.getenv('ADMISSION_CONTROL', '1') == '1'
+# Memory ceiling for this process in MB (0 = 85% of RAM or of the cgroup memory limit)
+ADMISSION_MEMORY_MB = float(os.getenv('ADMISSION_MEMORY_MB', '0'))
+# System memory left free for the OS and other processes
+ADMISSION_HEADROOM_MB = float(os.getenv('ADMISSION_HEADROOM_MB', '512'))
+# 1-minute load average per core above which no new transcription starts (0 = ignore load)
+ADMISSION_MAX_LOAD = float(os.getenv('ADMISSION_MAX_LOAD', '1.5'))
+# Times a queued episode may be overtaken by smaller ones that fit before it goes next
+ADMISSION_MAX_OVERTAKES = int(os.getenv('ADMISSION_MAX_OVERTAKES', '3'))
+# Seconds between re-checks of live usage while episodes wait
+ADMISSION_POLL_SECONDS = 2.0
+
+MB = 1024 * 1024
+# Whisper on CPU (int8): resident model incl. runtime, and working set per running transcription, in MB
+MODEL_MEMORY_MB = {
+    "tiny": (150, 100), "base": (250, 150), "small": (600, 300),
+    "medium": (1600, 600), "large-v2": (3500, 1200), "large-v3": (3500, 1200),
+}
+# Decoded 16 kHz float32 audio (64 KB/s) plus decode copies and log-mel features
+BYTES_PER_AUDIO_SECOND = 128_000
+# Audio size per second when the duration is unknown (128 kbps)
+AUDIO_BYTES_PER_SECOND = 16_000
+
+def _cgroup_memory_limit() -> int:
+    """
+    Memory limit from cgroup v2 (memory.max) or v1 (memory.limit_in_bytes), or None if unlimited
+    """
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path, 'r') as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        # v1 reports "unlimited" as a huge page-aligned number
+        if value != 'max' and int(value) < 1 << 60:
+            return int(value)
+    return None
+
+def memory_ceiling() -> int:
+    """
+    Bytes this process may use: ADMISSION_MEMORY_MB, or 85% of RAM capped by the cgroup limit
+    """
+    if ADMISSION_MEMORY_MB:
+        return int(ADMISSION_MEMORY_MB * MB)
+    import psutil
+    total = psutil.virtual_memory().total
+    limit = _cgroup_memory_limit()
+    return int(min(total, limit or total) * 0.85)
+
+def estimate_transcription_memory(audio_path: str, mode: str = 'local', model: str = 'base',
+                                  model_loaded: bool = True, duration: float = None) -> int:
+    """
+    Estimate the peak extra memory of transcribing one file
+
+    Args:
+        audio_path: Audio file
+        mode: 'local' decodes the whole file in this process; 'api' only uploads it
+        model: Whisper model size
+        model_loaded: Whether the shared model is already resident (otherwise it is counted too)
+        duration: Audio seconds, if known (else derived from the file size)
+
+    Returns:
+        int: Bytes
+    """
+    size = os.path.getsize(audio_path) if os.path.exists(audio_path) else 0
+    if mode == 'api':
+        # The request body holds the file, plus a converted copy for unsupported formats
+        return 2 * size + 50 * MB
+    if duration is None:
+        duration = size / AUDIO_BYTES_PER_SECOND
+    resident, working = MODEL_MEMORY_MB.get(model, MODEL_MEMORY_MB["large-v3"])
+    cost = duration * BYTES_PER_AUDIO_SECOND + working * MB
+    return int(cost + (0 if model_loaded else resident * MB))
+
+class Reservation:
+    """Memory admitted for one job; release it (or leave the with block) when the job ends"""
+    __slots__ = ("controller", "cost", "label", "released")
+
+    def __init__(self, controller, cost: int, label: str):
+        self.controller = controller
+        self.cost = cost
+        self.label = label
+        self.released = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.controller._release(self)
+
+class _Waiter:
+    __slots__ = ("cost", "label", "overtaken")
+
+    def __init__(self, cost: int, label: str):
+        self.cost = cost
+        self.label = label
+        self.overtaken = 0
+
+class AdmissionController:
+    """
+    Admit, queue or defer memory-heavy jobs so the host stays under its ceilings
+
+    Each job reserves its estimated memory. A job starts when its cost fits
+    under the ceiling on top of what is already committed (the larger of live
+    RSS and the idle baseline plus reservations), the system keeps its
+    headroom free and the load average is below the limit. Otherwise it
+    waits; smaller jobs that fit may overtake it up to ADMISSION_MAX_OVERTAKES
+    times. A job that can never share the host is deferred until nothing else
+    runs. The first job always starts, so work cannot stall.
+    """
+
+    def __init__(self, ceiling: int = None, headroom: int = None, max_load: float = None, cpus: int = None):
+        import psutil
+        self._psutil = psutil
+        self._process = psutil.Process()
+        self.ceiling = ceiling or memory_ceiling()
+        self.headroom = int(ADMISSION_HEADROOM_MB * MB) if headroom is None else headroom
+        self.max_load = ADMISSION_MAX_LOAD if max_load is None else max_load
+        self.cpus = cpus or available_cpus()
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._running = 0
+        self._reserved = 0
+        self._idle_rss = self._rss()
+        self.stats = {"admitted": 0, "queued": 0, "deferred": 0, "wait_seconds": 0.0, "peak_committed": 0}
+
+    def _rss(self) -> int:
+        """RSS of this process and its children (ffmpeg, ...)"""
+        rss = self._process.memory_info().rss
+        for child in self._process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except self._psutil.Error:
+                pass
+        return rss
+
+    def _load(self) -> float:
+        try:
+            return os.getloadavg()[0] / self.cpus
+        except OSError:
+            return 0.0
+
+    def usage(self) -> dict:
+        """Live usage next to the ceilings"""
+        rss = self._rss()
+        with self._cond:
+            return {
+                "ceiling": self.ceiling,
+                "rss": rss,
+                "committed": max(rss, self._idle_rss + self._reserved),
+                "reserved": self._reserved,
+                "running": self._running,
+                "waiting": len(self._waiting),
+                "available": self._psutil.virtual_memory().available,
+                "load_per_cpu": self._load(),
+            }
+
+    def _blocked(self, waiter: _Waiter) -> str:
+        """Why the waiter cannot start now, or None if it can"""
+        for other in self._waiting:
+            if other is waiter:
+                break
+            if other.overtaken >= ADMISSION_MAX_OVERTAKES:
+                return f"waiting for {other.label} to start first"
+        if self._running == 0:
+            # An idle host always takes the longest-waiting job
+            return None if self._waiting[0] is waiter else f"waiting for {self._waiting[0].label} to start first"
+        if waiter.cost > self.ceiling - self._idle_rss:
+            return "too large to share the host; deferred until nothing else runs"
+        committed = max(self._rss(), self._idle_rss + self._reserved)
+        if committed + waiter.cost > self.ceiling:
+            return f"memory ceiling ({committed / MB:.0f} of {self.ceiling / MB:.0f} MB committed)"
+        if self._psutil.virtual_memory().available - waiter.cost < self.headroom:
+            return "system memory low"
+        if self.max_load and self._load() > self.max_load:
+            return f"load {self._load():.1f} per core"
+        return None
+
+    def acquire(self, cost: int, label: str = "job", on_wait=None) -> Reservation:
+        """
+        Block until a job of the given memory cost may start
+
+        Args:
+            cost: Estimated peak extra memory in bytes
+            label: Name for log messages
+            on_wait: Optional callable run at every re-check while waiting; an
+                     exception it raises (e.g. a cancel) abandons the wait
+
+        Returns:
+            Reservation: Release it when the job is done
+        """
+        waiter = _Waiter(cost, label)
+        start = time.perf_counter()
+        reason = None
+        with self._cond:
+            self._waiting.append(waiter)
+            try:
+                while True:
+                    blocked = self._blocked(waiter)
+                    if blocked is None:
+                        break
+                    if reason is None:
+                        deferred = blocked.startswith("too large")
+                        self.stats["deferred" if deferred else "queued"] += 1
+                        print(f"Admission: {label} ({cost / MB:.0f} MB) waits: {blocked}")
+                    reason = blocked
+                    self._cond.wait(ADMISSION_POLL_SECONDS)
+                    if on_wait:
+                        on_wait()
+                position = self._waiting.index(waiter)
+            except BaseException:
+                self._waiting.remove(waiter)
+                # The jobs queued behind this one may start now
+                self._cond.notify_all()
+                raise
+            self._waiting.remove(waiter)
+            # Everything queued ahead of this job was overtaken
+            for other in self._waiting[:position]:
+                other.overtaken += 1
+            if cost > self.ceiling - self._idle_rss:
+                print(f"Admission: {label} needs {cost / MB:.0f} MB, above the {self.ceiling / MB:.0f} MB ceiling; running it alone")
+            self._running += 1
+            self._reserved += cost
+            self.stats["admitted"] += 1
+            waited = time.perf_counter() - start
+            self.stats["wait_seconds"] += waited
+            self.stats["peak_committed"] = max(self.stats["peak_committed"], self._idle_rss + self._reserved)
+        if reason is not None:
+            print(f"Admission: {label} started after {waited:.0f}s")
+        record("admission.wait", waited, cost_bytes=cost, queued=int(reason is not None))
+        return Reservation(self, cost, label)
+
+    def _release(self, reservation: Reservation) -> None:
+        with self._cond:
+            self._running -= 1
+            self._reserved -= reservation.cost
+            if self._running == 0:
+                # Memory the finished jobs left behind (model, allocator caches) becomes the new baseline
+                self._idle_rss = self._rss()
+            self._cond.notify_all()
+
+_controller = None
+_controller_lock = threading.Lock()
+
+def get_admission() -> AdmissionController:
+    """
+    Return the process-wide admission controller, or None if ADMISSION_CONTROL is off
+    """
+    global _controller
+    if not ADMISSION_CONTROL:
+        return None
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController()
+        return _controller
+
+def admit_transcription(audio_path: str, label: str, mode: str = 'local', duration: float = None,
+                        model: str = 'base', model_loaded: bool = True, on_wait=None) -> Reservation:
+    """
+    Wait until transcribing audio_path fits the host, then reserve its memory
+
+    Args:
+        audio_path: Audio file
+        label: Name for log messages
+        mode: 'local' or 'api'
+        duration: Audio seconds, if the caller probed them (else estimated from the file size)
+        model: Whisper model size
+        model_loaded: Whether the caller's Whisper model is already resident
+        on_wait: See AdmissionController.acquire
+
+    Returns:
+        Reservation: Context manager releasing the memory (a no-op one when admission control is off)
+    """
+    controller = get_admission()
+    if controller is None:
+        return _NULL_RESERVATION
+    cost = estimate_transcription_memory(audio_path, mode, model, model_loaded=model_loaded, duration=duration)
+    return controller.acquire(cost, label, on_wait)
+
+class _NullReservation:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def release(self):
+        pass
+
+_NULL_RESERVATION = _NullReservation()
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcription admission control")
+    parser.add_argument("audio", nargs="*", help="Audio files to estimate")
+    parser.add_argument("--mode", default=os.getenv('TRANSCRIBE_MODE', 'local'), choices=["local", "api"])
+    args = parser.parse_args()
+
+    controller = AdmissionController()
+    usage = controller.usage()
+    print(f"Ceiling {usage['ceiling'] / MB:.0f} MB, headroom {controller.headroom / MB:.0f} MB, "
+          f"available {usage['available'] / MB:.0f} MB, RSS {usage['rss'] / MB:.0f} MB, "
+          f"load {usage['load_per_cpu']:.2f}/core (limit {controller.max_load or 'off'}) on {controller.cpus} core(s)")
+    from transcribe import WHISPER_MODEL
+    resident = MODEL_MEMORY_MB.get(WHISPER_MODEL, MODEL_MEMORY_MB["large-v3"])[0] * MB
+    for path in args.audio:
+        cost = estimate_transcription_memory(path, args.mode, WHISPER_MODEL)
+        fits = int((controller.ceiling - usage['rss'] - resident) // cost)
+        print(f"{path}: ~{cost / MB:.0f} MB per transcription; {max(1, fits)} at once under the ceiling")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,26 @@
-import streamlit as st
-from openai import OpenAI
 from datetime import datetime
+import asyncio
+import threading
+import queue
+import time
 import os
 import io
-from notion_utils import upload_to_notion
+from compact import compact_transcript, DEFAULT_TOKEN_BUDGET
+from metrics import span
+
+# Any OpenAI-compatible endpoint (e.g. a local stand-in for benchmarks)
+OPENROUTER_BASE_URL = os.getenv('OPENROUTER_BASE_URL', "https://openrouter.ai/api/v1")
+ANALYSIS_MODEL = "deepseek/deepseek-r1:free"
+EXTRA_HEADERS = {
+    "HTTP-Referer": "https://your-domain.com",
+    "X-Title": "Podcast Analyzer"
+}
+# Maximum number of analysis requests in flight when fanning out over episodes
+DEFAULT_MAX_IN_FLIGHT = int(os.getenv('ANALYSIS_MAX_IN_FLIGHT', '4'))
+# Send only the transcript passages relevant to each shownotes section
+DEFAULT_RETRIEVAL = os.getenv('ANALYSIS_RETRIEVAL', '0') == '1'
+# Minimum interval between UI refreshes while streaming
+STREAM_REFRESH_SECONDS = 0.25
 
 # Default system prompt template
 DEFAULT_SYSTEM_PROMPT = """你是一名专业的播客内容分析师。请根据Show Notes分析播客内容，并按照指定格式输出分析结果：  
@@ -23,50 +40,482 @@ DEFAULT_SYSTEM_PROMPT = """你是一名专业的播客内容分析师。请根
 - 强化例证（该部分提到的具体案例/数据）
 """
 
-def analyze_podcast_content(transcript: str, api_key: str, system_prompt: str, shownotes: str = "", temperature: float = 0.7) -> str:
+# Shared prefix for multi-template analysis: identical across templates so that
+# provider-side prompt caching can reuse it; the template instruction comes last
+SHARED_CONTEXT_PROMPT = """你是一名专业的播客内容分析师。以下是播客的Show Notes和转录文本，请根据之后的指令进行分析。
+
+以下是Show Notes：
+```
+{shownotes}
+```
+
+以下是播客转录文本：
+```
+{transcript}
+```
+"""
+
+# Named analysis templates (instruction part only, see SHARED_CONTEXT_PROMPT)
+ANALYSIS_TEMPLATES = {
+    "summary": """请按照以下格式输出分析结果，并确保格式完全匹配要求：
+
+# 内容摘要
+[核心内容总结，限 200 字以内]
+
+# Show Notes解读（按原结构扩展）
+## [原Show Notes标题1]
+- 核心观点
+- 强化例证（该部分提到的具体案例/数据）
+""",
+    "quotes": """请摘录本期播客中最有价值的 5-10 句原话，按照以下格式输出：
+
+# 金句摘录
+- "原话内容"（说话人或上下文）
+""",
+    "action_items": """请总结听众可以付诸实践的行动建议，按照以下格式输出：
+
+# 行动清单
+1. [具体可执行的建议]（对应的播客内容依据）
+"""
+}
+
+# Section titles used when rendering template results
+ANALYSIS_TEMPLATE_TITLES = {
+    "summary": "内容分析",
+    "quotes": "金句摘录",
+    "action_items": "行动清单"
+}
+
+# Request rate limit shared by concurrent analysis requests (0 = unlimited)
+DEFAULT_REQUESTS_PER_MINUTE = int(os.getenv('ANALYSIS_REQUESTS_PER_MINUTE', '0'))
+
+# Pooled clients keyed by (api_key, event loop); httpx pools are bound to a loop
+_async_clients = {}
+_clients_lock = threading.Lock()
+_background_loop = None
+_loop_lock = threading.Lock()
+
+def _get_async_client(api_key: str) -> "AsyncOpenAI":
+    """
+    Return the shared AsyncOpenAI client for this API key and the running event loop
+    """
+    key = (api_key, asyncio.get_running_loop())
+    with _clients_lock:
+        client = _async_clients.get(key)
+        if client is None:
+            # openai (with httpx and pydantic) is imported on the first request, not at startup
+            from openai import AsyncOpenAI
+            client = AsyncOpenAI(base_url=OPENROUTER_BASE_URL, api_key=api_key)
+            _async_clients[key] = client
+    return client
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Start (once) the event loop thread that serves synchronous callers
+    """
+    global _background_loop
+    with _loop_lock:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_background_loop.run_forever,
+                name="analysis-loop",
+                daemon=True
+            ).start()
+    return _background_loop
+
+def _run_sync(coro):
+    """
+    Run a coroutine on the shared background loop and wait for its result
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_background_loop()).result()
+
+def build_messages(transcript: str, system_prompt: str, shownotes: str = "") -> list:
+    """
+    Build the chat messages for one analysis request
+    """
+    # Format system prompt with shownotes
+    formatted_prompt = system_prompt.format(shownotes=shownotes)
+    
+    return [
+        {"role": "system", "content": formatted_prompt},
+        {"role": "user", "content": "Please analyze the following podcast content:"},
+        {"role": "assistant", "content": "I will analyze the podcast content according to the specified format:"},
+        {"role": "user", "content": transcript}
+    ]
+
+def build_template_messages(transcript: str, template: str, shownotes: str = "") -> list:
+    """
+    Build the chat messages for one named template
+    
+    The shownotes and transcript form an identical leading prefix for every
+    template, so only the trailing instruction differs between requests.
+    """
+    return [
+        {"role": "system", "content": SHARED_CONTEXT_PROMPT.format(shownotes=shownotes, transcript=transcript)},
+        {"role": "user", "content": template.format(shownotes=shownotes)}
+    ]
+
+class RequestLimiter:
+    """
+    Shared limit on concurrent analysis requests and on request rate
+    
+    Use as `async with limiter:` around each request. Must be created and used
+    within a single event loop.
+    """
+    
+    def __init__(self, max_in_flight: int = None, requests_per_minute: int = None):
+        self._semaphore = asyncio.Semaphore(max(1, max_in_flight or DEFAULT_MAX_IN_FLIGHT))
+        rate = DEFAULT_REQUESTS_PER_MINUTE if requests_per_minute is None else requests_per_minute
+        self._interval = 60.0 / rate if rate else 0.0
+        self._next_slot = 0.0
+    
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        if self._interval:
+            # Reserve the next start slot, then wait for it outside any lock
+            now = asyncio.get_running_loop().time()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+            if slot > now:
+                await asyncio.sleep(slot - now)
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        self._semaphore.release()
+
+def create_limiter(max_in_flight: int = None, requests_per_minute: int = None) -> RequestLimiter:
+    """
+    Create a RequestLimiter on the shared background loop
+    
+    Pass it to every analyze_many call of a run so the in-flight and rate limits
+    apply across episodes, not per call.
+    """
+    async def create():
+        return RequestLimiter(max_in_flight, requests_per_minute)
+    return _run_sync(create())
+
+def _report_compaction(stats: dict) -> None:
+    """
+    Log transcript token savings and the estimated analysis latency they saved
+    
+    Prefill time grows with the prompt, so the latency saved is estimated from the
+    measured time to first chunk scaled by the tokens removed.
+    """
+    removed = stats["input_tokens"] - stats["output_tokens"]
+    if "retrieval_seconds" in stats:
+        print(f"Retrieved passages for {stats['sections']} shownotes sections in {stats['retrieval_seconds'] * 1000:.0f}ms")
+    first_chunk = stats.get("first_chunk_seconds")
+    if first_chunk and stats["output_tokens"]:
+        stats["latency_saved_seconds"] = first_chunk * removed / stats["output_tokens"]
+    print(
+        f"Transcript reduced: {stats['input_tokens']} -> {stats['output_tokens']} tokens "
+        f"(ratio {stats['ratio']:.2f}), analysis took {stats.get('total_seconds', 0):.1f}s, "
+        f"estimated {stats.get('latency_saved_seconds', 0):.1f}s saved"
+    )
+
+async def _prepare_transcript(transcript: str, shownotes: str, compact: bool, token_budget: int,
+                              retrieval: bool, stats: dict) -> str:
+    """
+    Reduce the transcript with retrieval or compaction before it is sent
+    """
+    if retrieval is None:
+        retrieval = DEFAULT_RETRIEVAL
+    
+    # Transcript preparation is CPU-bound; keep it off the event loop
+    context = None
+    if retrieval:
+        from retrieval import build_section_context  # loads numpy
+        context, retrieval_stats = await asyncio.to_thread(build_section_context, transcript, shownotes)
+        stats.update(retrieval_stats)
+    if context:
+        return context
+    if compact:
+        transcript, compaction = await asyncio.to_thread(compact_transcript, transcript, token_budget)
+        stats.update(compaction)
+    return transcript
+
+async def _stream_completion(api_key: str, messages: list, temperature: float, stats: dict,
+                             on_delta=None, on_first_chunk=None) -> str:
+    """
+    Run one streamed chat completion on the pooled client and collect its text
+    """
+    openai_client = _get_async_client(api_key)
+    start_time = time.perf_counter()
+    
+    with span("llm.completion", model=ANALYSIS_MODEL) as llm_span:
+        stream = await openai_client.chat.completions.create(
+            model=ANALYSIS_MODEL,
+            messages=messages,
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True},
+            extra_headers=EXTRA_HEADERS
+        )
+        
+        parts = []
+        try:
+            async for chunk in stream:
+                if "first_chunk_seconds" not in stats:
+                    stats["first_chunk_seconds"] = time.perf_counter() - start_time
+                    if on_first_chunk:
+                        on_first_chunk()
+                # The final chunk carries token usage and no choices
+                if getattr(chunk, "usage", None):
+                    stats["prompt_tokens"] = chunk.usage.prompt_tokens
+                    stats["completion_tokens"] = chunk.usage.completion_tokens
+                if chunk.choices and chunk.choices[0].delta.content:
+                    delta = chunk.choices[0].delta.content
+                    if not parts:
+                        stats["first_token_seconds"] = time.perf_counter() - start_time
+                    parts.append(delta)
+                    if on_delta:
+                        on_delta(delta)
+        finally:
+            # Release the connection promptly, also when the request is cancelled
+            await stream.close()
+        
+        stats["total_seconds"] = time.perf_counter() - start_time
+        llm_span.set(**{
+            key: stats[key] for key in ("first_token_seconds", "prompt_tokens", "completion_tokens") if key in stats
+        })
+    return "".join(parts)
+
+async def analyze_podcast_content_async(transcript: str, api_key: str, system_prompt: str, shownotes: str = "",
+                                        temperature: float = 0.7, compact: bool = True,
+                                        token_budget: int = None, stats: dict = None,
+                                        retrieval: bool = None, on_delta=None) -> str:
+    """
+    Analyze podcast content using Deepseek-chat model (async, pooled client)
+    
+    Args:
+        transcript: Podcast transcription text
+        api_key: OpenRouter API key
+        system_prompt: System prompt template
+        shownotes: Podcast shownotes/description
+        temperature: Creativity parameter (0.0-1.0)
+        compact: Compact the transcript before sending it
+        token_budget: Transcript token budget (None uses ANALYSIS_TOKEN_BUDGET)
+        stats: Optional dict filled with token counts and timings
+        retrieval: Send per-section passages instead of the whole transcript
+            (None uses ANALYSIS_RETRIEVAL)
+        on_delta: Optional callback receiving each text delta as it arrives
+    
+    Returns:
+        str: Analysis result
+    """
+    stats = {} if stats is None else stats
+    transcript = await _prepare_transcript(transcript, shownotes, compact, token_budget, retrieval, stats)
+    
+    result = await _stream_completion(
+        api_key, build_messages(transcript, system_prompt, shownotes), temperature, stats, on_delta
+    )
+    if "output_tokens" in stats:
+        _report_compaction(stats)
+    
+    return result
+
+def analyze_podcast_content(transcript: str, api_key: str, system_prompt: str, shownotes: str = "",
+                            temperature: float = 0.7, compact: bool = True,
+                            token_budget: int = None, stats: dict = None,
+                            retrieval: bool = None) -> str:
     """
     Analyze podcast content using Deepseek-chat model
     
+    Synchronous wrapper around analyze_podcast_content_async for the UI and CLI.
+    
     Args:
         transcript: Podcast transcription text
         api_key: OpenRouter API key
         system_prompt: System prompt template
         shownotes: Podcast shownotes/description
         temperature: Creativity parameter (0.0-1.0)
+        compact: Compact the transcript before sending it
+        token_budget: Transcript token budget (None uses ANALYSIS_TOKEN_BUDGET)
+        stats: Optional dict filled with token counts and timings
+        retrieval: Send per-section passages instead of the whole transcript
+            (None uses ANALYSIS_RETRIEVAL)
     
     Returns:
         str: Analysis result
     """
-    openai_client = OpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key=api_key,
+    return _run_sync(analyze_podcast_content_async(
+        transcript, api_key, system_prompt, shownotes, temperature,
+        compact, token_budget, stats, retrieval
+    ))
+
+def stream_podcast_analysis(transcript: str, api_key: str, system_prompt: str, shownotes: str = "",
+                            temperature: float = 0.7, compact: bool = True,
+                            token_budget: int = None, stats: dict = None,
+                            retrieval: bool = None):
+    """
+    Stream podcast analysis as incremental text deltas
+    
+    The request runs on the shared background loop. Closing the generator early
+    (e.g. on a Streamlit rerun or cancel) aborts the in-flight request. While no
+    text arrives (e.g. during model reasoning) an empty string is yielded every
+    STREAM_REFRESH_SECONDS so the consumer stays responsive.
+    
+    Args:
+        Same as analyze_podcast_content
+    
+    Yields:
+        str: Text deltas in arrival order
+    """
+    deltas = queue.Queue()
+    finished = object()
+    future = asyncio.run_coroutine_threadsafe(
+        analyze_podcast_content_async(
+            transcript, api_key, system_prompt, shownotes, temperature,
+            compact, token_budget, stats, retrieval, on_delta=deltas.put
+        ),
+        _get_background_loop()
     )
+    future.add_done_callback(lambda _: deltas.put(finished))
+    try:
+        while True:
+            try:
+                delta = deltas.get(timeout=STREAM_REFRESH_SECONDS)
+            except queue.Empty:
+                yield ""
+                continue
+            if delta is finished:
+                break
+            yield delta
+        # Surface request errors to the consumer
+        future.result()
+    finally:
+        if not future.done():
+            future.cancel()
+            print("Analysis request cancelled")
+
+async def analyze_templates_async(transcript: str, api_key: str, templates: dict = None, shownotes: str = "",
+                                  temperature: float = 0.7, compact: bool = True, token_budget: int = None,
+                                  retrieval: bool = None, limiter: RequestLimiter = None,
+                                  stats: dict = None) -> dict:
+    """
+    Run several named templates concurrently against the same transcript
     
-    # Format system prompt with shownotes
-    formatted_prompt = system_prompt.format(shownotes=shownotes)
+    The first template is started alone; the others start once it has produced
+    its first chunk, by which time the shared prefix is in the provider's cache.
     
-    messages = [
-        {"role": "system", "content": formatted_prompt},
-        {"role": "user", "content": "Please analyze the following podcast content:"},
-        {"role": "assistant", "content": "I will analyze the podcast content according to the specified format:"},
-        {"role": "user", "content": transcript}
-    ]
+    Args:
+        transcript: Podcast transcription text
+        api_key: OpenRouter API key
+        templates: Dict of template name -> instruction (defaults to ANALYSIS_TEMPLATES)
+        shownotes: Podcast shownotes/description
+        temperature: Creativity parameter (0.0-1.0)
+        compact: Compact the transcript before sending it
+        token_budget: Transcript token budget (None uses ANALYSIS_TOKEN_BUDGET)
+        retrieval: Send per-section passages instead of the whole transcript
+        limiter: Shared RequestLimiter (a new one is created if omitted)
+        stats: Optional dict filled with per-template timings
+    
+    Returns:
+        dict: Template name -> analysis text, or the raised exception
+    """
+    templates = templates or ANALYSIS_TEMPLATES
+    limiter = limiter or RequestLimiter()
+    stats = {} if stats is None else stats
+    transcript = await _prepare_transcript(transcript, shownotes, compact, token_budget, retrieval, stats)
+    
+    prefix_warm = asyncio.Event()
     
-    full_response = ""
-    for chunk in openai_client.chat.completions.create(
-        model="deepseek/deepseek-r1:free",
-        messages=messages,
-        temperature=temperature,
-        stream=True,
-        extra_headers={
-            "HTTP-Referer": "https://your-domain.com",
-            "X-Title": "Podcast Analyzer"
-        }
-    ):
-        if chunk.choices[0].delta.content:
-            full_response += chunk.choices[0].delta.content
-    
-    return full_response
+    async def run(index, name, template):
+        template_stats = stats.setdefault(name, {})
+        if index > 0:
+            await prefix_warm.wait()
+        try:
+            async with limiter:
+                return await _stream_completion(
+                    api_key, build_template_messages(transcript, template, shownotes),
+                    temperature, template_stats, on_first_chunk=prefix_warm.set
+                )
+        except Exception as e:
+            return e
+        finally:
+            prefix_warm.set()
+    
+    start_time = time.perf_counter()
+    results = await asyncio.gather(*(
+        run(index, name, template) for index, (name, template) in enumerate(templates.items())
+    ))
+    stats["total_seconds"] = time.perf_counter() - start_time
+    first_chunks = [stats[name]["first_chunk_seconds"] for name in templates if "first_chunk_seconds" in stats[name]]
+    if first_chunks:
+        stats["first_chunk_seconds"] = min(first_chunks)
+    if "output_tokens" in stats:
+        _report_compaction(stats)
+    return dict(zip(templates, results))
+
+def analyze_templates(transcript: str, api_key: str, templates: dict = None, shownotes: str = "",
+                      temperature: float = 0.7, compact: bool = True, token_budget: int = None,
+                      retrieval: bool = None, stats: dict = None) -> dict:
+    """
+    Synchronous wrapper around analyze_templates_async
+    """
+    return _run_sync(analyze_templates_async(
+        transcript, api_key, templates, shownotes, temperature,
+        compact, token_budget, retrieval, stats=stats
+    ))
+
+def select_templates(names: str) -> dict:
+    """
+    Pick templates from a comma separated list of names (e.g. "summary,quotes")
+    """
+    selected = {}
+    for name in (n.strip() for n in names.split(',')):
+        if not name:
+            continue
+        if name not in ANALYSIS_TEMPLATES:
+            raise ValueError(f"Unknown analysis template: {name}")
+        selected[name] = ANALYSIS_TEMPLATES[name]
+    return selected
+
+async def analyze_many_async(jobs: list, api_key: str, system_prompt: str = DEFAULT_SYSTEM_PROMPT,
+                             temperature: float = 0.7, max_in_flight: int = None,
+                             templates: dict = None, limiter: RequestLimiter = None) -> list:
+    """
+    Analyze several episodes concurrently with a bounded number of requests in flight
+    
+    Args:
+        jobs: List of dicts with "transcript" and optional "shownotes"
+        api_key: OpenRouter API key
+        system_prompt: System prompt template (single-template mode)
+        temperature: Creativity parameter (0.0-1.0)
+        max_in_flight: Concurrency limit (defaults to ANALYSIS_MAX_IN_FLIGHT)
+        templates: Optional named templates; each job then returns a dict of results
+        limiter: RequestLimiter shared with other calls (see create_limiter); max_in_flight is then ignored
+    
+    Returns:
+        list: Analysis result or the raised exception for each job, in input order
+    """
+    limiter = limiter or RequestLimiter(max_in_flight)
+    
+    async def run(job):
+        try:
+            if templates:
+                return await analyze_templates_async(
+                    job["transcript"], api_key, templates,
+                    job.get("shownotes", ""), temperature, limiter=limiter
+                )
+            async with limiter:
+                return await analyze_podcast_content_async(
+                    job["transcript"], api_key, system_prompt,
+                    job.get("shownotes", ""), temperature
+                )
+        except Exception as e:
+            return e
+    
+    return await asyncio.gather(*(run(job) for job in jobs))
+
+def analyze_many(jobs: list, api_key: str, system_prompt: str = DEFAULT_SYSTEM_PROMPT,
+                 temperature: float = 0.7, max_in_flight: int = None, templates: dict = None,
+                 limiter: RequestLimiter = None) -> list:
+    """
+    Synchronous wrapper around analyze_many_async
+    """
+    return _run_sync(analyze_many_async(jobs, api_key, system_prompt, temperature, max_in_flight, templates, limiter))
 
 def render_analysis_section(st):
     """
@@ -94,6 +543,23 @@ def render_analysis_section(st):
                 help="Get API key from https://openrouter.ai/"
             )
             temperature = st.slider("Creativity Level", 0.0, 1.0, 0.7, 0.1)
+            compact = st.checkbox(
+                "Compact transcript before analysis",
+                value=True,
+                help="Merge segments, drop filler words and repeats to save tokens"
+            )
+            token_budget = st.number_input(
+                "Transcript token budget (0 = no limit)",
+                min_value=0,
+                value=DEFAULT_TOKEN_BUDGET,
+                step=1000,
+                disabled=not compact
+            )
+            retrieval = st.checkbox(
+                "Send only passages relevant to each Show Notes section",
+                value=DEFAULT_RETRIEVAL,
+                help="Index the transcript locally and retrieve the top passages per Show Notes heading"
+            )
 
         # ========== Notion Configuration ==========
         with st.container():
@@ -109,38 +575,47 @@ def render_analysis_section(st):
             )
         
         # ========== Analysis Button ==========
+        # The analysis runs as a background job; its stream is polled below and survives reruns
+        from job_runner import get_job_runner
+        from jobs_ui import render_job_progress
+        from state_manager import current_job
+        
+        job = current_job()
+        busy = bool(job and job.active)
         if st.button("🧠 Start Smart Analysis", 
-                    disabled=(not api_key or st.session_state.is_analyzing),
+                    disabled=(not api_key or busy),
                     help="API key is required" if not api_key else ""):
-            try:
-                st.session_state.is_analyzing = True
-                
-                message_placeholder = st.empty()
-                full_response = ""
-                
-                analysis_result = analyze_podcast_content(
-                    st.session_state.transcript,
-                    api_key,
-                    system_prompt,  # Use user-modified prompt
-                    st.session_state.shownotes,
-                    temperature
+            get_job_runner().submit(job.url if job else st.session_state.podcast_url, [("analyze", {
+                "api_key": api_key,
+                "system_prompt": system_prompt,  # Use user-modified prompt
+                "temperature": temperature,
+                "compact": compact,
+                "token_budget": int(token_budget),
+                "retrieval": retrieval
+            })])
+        
+        render_job_progress(st, "analyze")
+        
+        analysis_stats = job.analysis_stats if job else {}
+        if st.session_state.get('analysis') and analysis_stats:
+            if "first_token_seconds" in analysis_stats:
+                st.caption(f"Time to first token: {analysis_stats['first_token_seconds']:.1f}s")
+            if "output_tokens" in analysis_stats:
+                st.caption(
+                    f"Transcript tokens: {analysis_stats['input_tokens']} → {analysis_stats['output_tokens']} "
+                    f"(ratio {analysis_stats['ratio']:.2f}), "
+                    f"estimated {analysis_stats.get('latency_saved_seconds', 0):.1f}s saved"
                 )
-                
-                message_placeholder.markdown(analysis_result)
-                st.session_state.analysis = analysis_result
-                st.success("Analysis completed!")
-
-            except Exception as e:
-                st.error(f"Analysis failed: {str(e)}")
-            finally:
-                st.session_state.is_analyzing = False
 
         # ========== Persistent Analysis Result Display ==========
         if st.session_state.get('analysis'):
+            if not busy:
+                st.markdown(st.session_state.analysis)
             
             # ========== Upload Button ==========
             if notion_token and db_id:
                 if st.button("📤 Upload to Notion"):
+                    from notion_utils import upload_to_notion
                     podcast_info = {
                         'title': st.session_state.podcast_title,
                         'host': st.session_state.podcast_host,
@@ -1,12 +1,10 @@
 import os
-# Set environment variables to resolve OpenMP duplicate loading issue
-os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
-os.environ['OMP_NUM_THREADS'] = '1'
+import sys
+# Plan CPU threads (and OpenMP settings) before torch/ctranslate2 are loaded
+from resources import configure_threads
+configure_threads('ui', verbose=True)
 
 import streamlit as st
-import torch
-from pydub import AudioSegment
-torch.classes.__path__ = []
 
 # Set page configuration to use wide mode
 st.set_page_config(
@@ -18,8 +16,17 @@ from download_ui import render_download_section
 from transcribe_ui import render_transcribe_section
 from analyze import render_analysis_section
 from file_manager_ui import render_file_manager_section
+from search_ui import render_search_section
+from jobs_ui import render_job_queue
+from job_runner import get_job_runner
 from state_manager import init_session_state
 from utils import format_duration
+from transcribe import get_audio_duration
+
+@st.cache_data(show_spinner=False)
+def audio_duration(path, mtime):
+    """Duration in seconds via ffprobe, cached per file version instead of decoding the audio every rerun"""
+    return get_audio_duration(path)
 
 # Set page title
 st.title("Xiaoyuzhou -> Notion")
@@ -44,14 +51,16 @@ with col1:
             st.subheader("Downloaded Audio")
             st.write(f"**Title**: {st.session_state.podcast_title}")
             
-            # Get audio information
-            audio = AudioSegment.from_file(st.session_state.audio_path)
-            duration = audio.duration_seconds
-            readable_duration = format_duration(duration)
-            file_size = os.path.getsize(st.session_state.audio_path) / 1024 / 1024
-            
-            # Display audio information in horizontal layout
-            st.write(f"**Duration**: {readable_duration} | **File Size**: {file_size:.2f} MB")
+            # Get audio information (the file may have been evicted once transcribed)
+            if os.path.exists(st.session_state.audio_path):
+                duration = audio_duration(st.session_state.audio_path, os.path.getmtime(st.session_state.audio_path))
+                readable_duration = format_duration(duration)
+                file_size = os.path.getsize(st.session_state.audio_path) / 1024 / 1024
+                
+                # Display audio information in horizontal layout
+                st.write(f"**Duration**: {readable_duration} | **File Size**: {file_size:.2f} MB")
+            else:
+                st.caption("Audio removed by the storage budget; the transcript is kept")
             
             # Display shownotes if available
             if hasattr(st.session_state, 'shownotes') and st.session_state.shownotes:
@@ -95,6 +104,14 @@ with col4:
     with analysis_expander:
         render_analysis_section(st)
 
+# Full width: background jobs of every session
+with st.expander("Job Queue", expanded=any(job.active for job in get_job_runner().jobs())):
+    render_job_queue(st)
+
+# Full width: search across every transcript
+with st.expander("Search Transcripts", expanded=False):
+    render_search_section(st)
+
 # ================= Style Adjustments =================
 st.markdown("""
 <style>
@@ -175,4 +192,9 @@ st.markdown("""
         border: 1px solid #1f77b4;
     }
 </style>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+# torch is not imported by the app itself. If a dependency loaded it during this run,
+# keep Streamlit's file watcher (which scans sys.modules after the run) off torch.classes
+if "torch" in sys.modules:
+    sys.modules["torch"].classes.__path__ = []
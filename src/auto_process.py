@@ -1,18 +1,33 @@
 import os
-# Set environment variables to resolve OpenMP duplicate loading issue
-os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
-os.environ['OMP_NUM_THREADS'] = '1'
+from dotenv import load_dotenv
+# Load .env before importing modules that read their settings at import time
+load_dotenv()
+# Plan CPU threads (and OpenMP settings) before torch/ctranslate2 are loaded
+from resources import configure_threads, get_thread_plan, print_thread_plan
+configure_threads('batch')
 
-import time
+import threading
 from pathlib import Path
-from dotenv import load_dotenv
-from download import fetch_audio_file
-from transcribe import transcribe_audio
-from analyze import analyze_podcast_content, DEFAULT_SYSTEM_PROMPT
+from download import fetch_episode
+from transcribe import transcribe_segments, save_transcript, get_whisper_model
+from analyze import (
+    analyze_podcast_content, analyze_many, create_limiter, select_templates,
+    DEFAULT_SYSTEM_PROMPT, ANALYSIS_TEMPLATE_TITLES
+)
 from notion_utils import upload_to_notion
+from notion_scheduler import get_scheduler
+from notion_session import get_session
+from job_ledger import JobLedger, tracked_stage
+from metrics import METRICS_ENABLED, get_recorder, format_metrics_summary
+from watcher import run_daemon
+from search import index_transcript
+from storage import cached_audio, transcript_exists, read_transcript, get_storage
+from stages import Episode, EpisodeMeta, AudioArtifact, Transcript, Analysis, persist, flush_persistence
+from pipeline import Stage, run_pipeline, format_pipeline_stats
+from admission import get_admission, MB
+from profiler import PROFILE, start_profiling, stop_profiling
 from tqdm import tqdm
-import psutil
-import signal
+import argparse
 
 def read_podcast_urls():
     urls = []
@@ -23,7 +38,82 @@ def read_podcast_urls():
                 urls.append(line)
     return urls
 
-def process_podcast(url):
+def download_podcast(url, progress_callback=None):
+    """
+    Download one podcast's audio and episode info
+    
+    Returns:
+        Episode: Episode with metadata and audio, or None on failure
+    """
+    result = fetch_episode(url, progress_callback=progress_callback)
+    if not result:
+        print(f"{url} failed to download")
+        return None
+    
+    meta, audio = result
+    print(f"{meta.title} downloaded")
+    return Episode(url, meta, audio)
+
+def transcript_path(episode):
+    """
+    Transcript file of an episode (same filename format as the UI version)
+    """
+    return os.path.join('transcript_files', f"{episode.meta.title}.{os.getenv('OUTPUT_FORMAT', 'txt')}")
+
+def load_transcript(episode):
+    """
+    Attach the episode's saved transcript file, or return None if it is missing
+    """
+    path = transcript_path(episode)
+    if not transcript_exists(path):
+        return None
+    episode.transcript = Transcript.from_text(read_transcript(path), path)
+    return episode
+
+def store_transcript(transcript, audio_path, output_format):
+    """
+    Write and index the transcript file, then let the storage manager transcode/evict audio
+    """
+    save_transcript(transcript, transcript.path, output_format)
+    index_transcript(transcript.path, transcript)
+    get_storage().after_transcription(audio_path, transcript.path)
+
+def transcribe_podcast(episode, progress_callback=None):
+    """
+    Transcribe a downloaded podcast in memory, reusing an existing transcript file
+    
+    The transcript file is written in the background (transcript.saved); later
+    stages use the in-memory segments.
+    
+    Returns:
+        Episode: The episode with its transcript attached
+    """
+    if load_transcript(episode):
+        print(f"Using existing transcript: {episode.transcript.path}")
+        return episode
+    
+    output_format = os.getenv('OUTPUT_FORMAT', 'txt')
+    transcript = transcribe_segments(
+        episode.audio.path,
+        device_option=os.getenv('DEVICE_OPTION', 'cpu'),
+        mode=os.getenv('TRANSCRIBE_MODE', 'local'),
+        api_url=os.getenv('TRANSCRIBE_API_URL'),
+        output_format=output_format,
+        progress_callback=progress_callback
+    )
+    transcript.path = transcript_path(episode)
+    transcript.saved = persist(store_transcript, transcript, episode.audio.path, output_format)
+    print(f"{episode.meta.title} transcribed")
+    episode.transcript = transcript
+    return episode
+
+def prepare_podcast(url):
+    """
+    Download and transcribe one podcast
+    
+    Returns:
+        Episode: Episode with its transcript, or None on failure
+    """
     try:
         print(f"\nStart processing {url}")
         
@@ -34,88 +124,192 @@ def process_podcast(url):
             progress_bar.n = int(progress * 100)
             progress_bar.refresh()
         
-        # Use requests method for background processing
-        result = fetch_audio_file(url, progress_callback=lambda p: update_progress(p * 0.3, "Downloading audio"))
-        if not result:
-            print(f"{url} failed to download")
-            return False
-            
-        audio_path, podcast_title, host_name, publish_date, podcast_url, shownotes = result
-        print(f"{podcast_title} downloaded")
-        
-        # Use the same filename format as UI version
-        output_format = os.getenv('OUTPUT_FORMAT', 'txt')
-        output_file = f"{podcast_title}.{output_format}"
-        
-        # First get transcription info
-        result = transcribe_audio(
-            audio_path,
-            output_file,
-            output_format=output_format,
-            device_option=os.getenv('DEVICE_OPTION', 'cpu'),
-            mode=os.getenv('TRANSCRIBE_MODE', 'local'),
-            progress_callback=None  # No progress callback, just get info
-        )
-        
-        # If result is a tuple, file doesn't exist, need to perform actual transcription
-        if isinstance(result, tuple):
-            transcribe_audio(
-                audio_path,
-                output_file,
-                output_format=output_format,
-                device_option=os.getenv('DEVICE_OPTION', 'cpu'),
-                mode=os.getenv('TRANSCRIBE_MODE', 'local'),
-                progress_callback=lambda p, m: update_progress(0.3 + p * 0.4, m)
-            )
-            print(f"{output_file} transcribed")
-        else:
-            print(f"Using existing transcript: {output_file}")
-            transcript = result
-            update_progress(0.7, "Using existing transcript")
-        
-        update_progress(0.7, "Analyzing content")
-        with open(os.path.join('transcript_files', output_file), 'r', encoding='utf-8') as f:
-            transcript = f.read()
-            
+        episode = download_podcast(url, progress_callback=lambda p: update_progress(p * 0.3, "Downloading audio"))
+        if not episode:
+            return None
+        episode = transcribe_podcast(episode, progress_callback=lambda p, m: update_progress(0.3 + p * 0.4, m))
+        update_progress(0.7, "Transcribed")
+        return episode
+    except Exception as e:
+        print(f"Processing failed: {str(e)}")
+        return None
+    finally:
+        progress_bar.close()
+
+def publish_podcast(podcast_info, analysis):
+    """
+    Upload one analysis result to Notion
+    """
+    if upload_to_notion(
+        analysis,
+        podcast_info,
+        os.getenv('NOTION_TOKEN'),
+        os.getenv('NOTION_DATABASE_ID')
+    ):
+        print(f"{podcast_info['title']} uploaded to Notion successfully")
+        return True
+    print(f"Upload to Notion failed: {podcast_info['title']}")
+    return False
+
+def collect_template_results(title, results):
+    """
+    Turn per-template results into Notion sections, dropping failed templates
+    
+    Returns:
+        dict: Section title -> analysis text, or an exception if every template failed
+    """
+    sections = {}
+    for name, result in results.items():
+        if isinstance(result, Exception):
+            print(f"Template {name} failed for {title}: {str(result)}")
+            continue
+        sections[ANALYSIS_TEMPLATE_TITLES.get(name, name)] = result
+    return sections or RuntimeError("all analysis templates failed")
+
+def process_podcast(url):
+    """
+    Run download, transcription, analysis and upload for a single podcast
+    """
+    episode = prepare_podcast(url)
+    if not episode:
+        return False
+    try:
         analysis = analyze_podcast_content(
-            transcript=transcript,
+            transcript=episode.transcript.text,
             api_key=os.getenv('OPENROUTER_API_KEY'),
             system_prompt=DEFAULT_SYSTEM_PROMPT,  # Use default system prompt template
-            shownotes=shownotes,
+            shownotes=episode.meta.shownotes,
             temperature=0.7  # Use default temperature value
         )
         print("Content analyzed")
-        
-        update_progress(0.8, "Uploading to Notion")
-        podcast_info = {
-            'title': podcast_title,
-            'host': host_name,
-            'date': publish_date,
-            'url': podcast_url
-        }
-        
-        if upload_to_notion(
-            analysis,
-            podcast_info,
-            os.getenv('NOTION_TOKEN'),
-            os.getenv('NOTION_DATABASE_ID')
-        ):
-            update_progress(1.0, "Uploaded to Notion successfully")
-            return True
-        else:
-            print("Upload to Notion failed")
-            return False
-            
+        return publish_podcast(episode.meta.podcast_info(), analysis)
     except Exception as e:
         print(f"Processing failed: {str(e)}")
         return False
-    finally:
-        progress_bar.close()
-        # Add a delay before processing the next podcast
-        time.sleep(2)
+
+def build_stages(ledger):
+    """
+    Pipeline stages for batch processing, each recorded in the job ledger
+    
+    Args:
+        ledger: JobLedger used to skip completed stages and retry failed ones
+    
+    Returns:
+        list: Stages for run_pipeline (download, transcribe, analyze, upload)
+    """
+    templates = select_templates(os.getenv('ANALYSIS_TEMPLATES', ''))
+    queue_size = int(os.getenv('PIPELINE_QUEUE_SIZE', '2'))
+    plan = get_thread_plan()
+    # One limiter for the whole run: ANALYSIS_MAX_IN_FLIGHT and the request rate apply across episodes
+    limiter = create_limiter()
+    
+    def analyze_stage(episode):
+        title = episode.meta.title
+        analysis = analyze_many(
+            [{"transcript": episode.transcript.text, "shownotes": episode.meta.shownotes}],
+            api_key=os.getenv('OPENROUTER_API_KEY'),
+            system_prompt=DEFAULT_SYSTEM_PROMPT,
+            temperature=0.7,
+            templates=templates,
+            limiter=limiter
+        )[0]
+        if isinstance(analysis, dict):
+            analysis = collect_template_results(title, analysis)
+        if isinstance(analysis, Exception):
+            # Raised so the ledger records the error and schedules a retry
+            raise analysis
+        print(f"{title} analyzed")
+        episode.analysis = Analysis(analysis)
+        return episode
+    
+    def upload_stage(episode):
+        return episode if publish_podcast(episode.meta.podcast_info(), episode.analysis.content) else None
+    
+    def restore_download(url, artifact):
+        if 'meta' not in artifact:
+            return None  # recorded by an older version
+        episode = Episode(url, EpisodeMeta(**artifact['meta']), AudioArtifact(**artifact['audio']))
+        # Audio is only needed until the transcript file exists (and may have been transcoded)
+        audio_path = cached_audio(episode.audio.path)
+        if audio_path:
+            episode.audio.path = audio_path
+            return episode
+        return episode if transcript_exists(transcript_path(episode)) else None
+    
+    def restore_analysis(episode, artifact):
+        episode.analysis = Analysis(artifact.get('content', artifact.get('analysis')))
+        return episode
+    
+    # Network-bound stages (download, LLM, Notion) overlap with CPU-bound transcription;
+    # bounded queues keep downloaded audio and transcripts in memory limited.
+    # Episodes are handed between stages in memory; the ledger only records what a restart needs.
+    return [
+        Stage("download", tracked_stage(
+            ledger, "download", download_podcast, lambda episode: episode.to_dict('meta', 'audio'), restore_download
+        ), plan['io_workers'], queue_size),
+        Stage("transcribe", tracked_stage(
+            ledger, "transcribe", transcribe_podcast, lambda episode: {'path': episode.transcript.path},
+            lambda episode, artifact: load_transcript(episode),
+            # Recorded as done only once the transcript file is on disk
+            pending=lambda episode: episode.transcript.saved
+        ), plan['transcribe_workers'], queue_size),
+        Stage("analyze", tracked_stage(
+            ledger, "analyze", analyze_stage, lambda episode: {'content': episode.analysis.content}, restore_analysis
+        ), int(os.getenv('ANALYSIS_MAX_IN_FLIGHT', '4')), queue_size),
+        Stage("upload", tracked_stage(
+            ledger, "upload", upload_stage
+        ), int(os.getenv('NOTION_UPLOAD_WORKERS', '3')), queue_size)
+    ]
+
+def warm_up():
+    """
+    Load the Whisper model and Notion schema once, before the first episode arrives
+    """
+    if os.getenv('TRANSCRIBE_MODE', 'local') == 'local':
+        device = os.getenv('DEVICE_OPTION', 'cpu')
+        get_whisper_model(device, "float16" if device == "cuda" else "int8")
+    try:
+        get_session(os.getenv('NOTION_TOKEN')).ensure_schema(os.getenv('NOTION_DATABASE_ID'))
+    except Exception as e:
+        print(f"Notion warm-up failed: {str(e)}")
+
+def report(stats):
+    """
+    Wait for background writes, then print pipeline, Notion and metrics summaries
+    """
+    flush_persistence()
+    print("\n" + format_pipeline_stats(stats))
+    notion_stats = get_scheduler().stats()
+    print(
+        f"Notion requests: {notion_stats['requests']} "
+        f"({notion_stats['rate_limited']} rate limited, {notion_stats['failed']} failed), "
+        f"{notion_stats['throughput']:.2f} req/s"
+    )
+    admission = get_admission()
+    if admission and admission.stats["admitted"]:
+        s = admission.stats
+        print(
+            f"Admission: {s['admitted']} transcriptions, {s['queued']} queued, {s['deferred']} deferred, "
+            f"{s['wait_seconds']:.1f}s waiting; peak committed {s['peak_committed'] / MB:.0f} "
+            f"of {admission.ceiling / MB:.0f} MB"
+        )
+    if METRICS_ENABLED:
+        get_recorder().close()
+        print(format_metrics_summary())
+    stop_profiling()
 
 def main():
-    load_dotenv()
+    parser = argparse.ArgumentParser(description="Batch podcast processing")
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="Run as a service: watch podcast_urls.txt and show feeds, process new episodes, drain on SIGTERM"
+    )
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="Sample all threads and write per-episode profiles and a hot-path summary (same as PROFILE=1)"
+    )
+    args = parser.parse_args()
+    print_thread_plan()
     
     # Check required environment variables
     required_vars = ['OPENROUTER_API_KEY', 'NOTION_TOKEN', 'NOTION_DATABASE_ID']
@@ -124,26 +318,38 @@ def main():
         print(f"Error: Missing required environment variables: {', '.join(missing_vars)}")
         return
     
+    if not args.watch:
+        urls = read_podcast_urls()
+        if not urls:
+            print("Error: podcast_urls.txt has no valid URLs")
+            return
+    
+    # Completed stages are recorded, so a restarted run resumes where it stopped
+    ledger = JobLedger()
+    stages = build_stages(ledger)
+    # Sampling starts only once there is work, since report() is what stops it
+    if METRICS_ENABLED:
+        get_recorder().start_sampling()
+    start_profiling(args.profile or PROFILE)
     
-    urls = read_podcast_urls()
-    if not urls:
-        print("Error: podcast_urls.txt has no valid URLs")
+    if args.watch:
+        print("Watching podcast_urls.txt and show feeds (SIGTERM to drain and stop)...")
+        warm_up()
+        report(run_daemon(ledger, stages))
+        ledger.close()
         return
     
-    success_count = 0
     total_count = len(urls)
-    
+    ledger.add(urls)
+    # Load the model and Notion schema while the first episodes download
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
     print(f"\nProcessing {total_count} podcasts...")
-    for i, url in enumerate(urls, 1):
-        print(f"\nProcessing podcast {i}/{total_count}")
-        if process_podcast(url):
-            success_count += 1
-        # Add a delay between podcasts
-        if i < total_count:
-            print("Waiting before processing next podcast...")
-            time.sleep(3)
+    results, stats = run_pipeline(urls, stages)
+    success_count = sum(result is not None for result in results)
     
+    report(stats)
     print(f"\nProcessing completed! Success: {success_count}/{total_count}")
+    ledger.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,295 @@
+import os
+import re
+
+# Token estimation (DeepSeek/OpenAI BPE averages, good enough for budgeting)
+CJK_TOKENS_PER_CHAR = 0.6
+LATIN_TOKENS_PER_WORD = 1.3
+
+# Default token budget for the transcript sent to the LLM (0 = no trimming)
+DEFAULT_TOKEN_BUDGET = int(os.getenv('ANALYSIS_TOKEN_BUDGET', '0'))
+
+# Paragraph size when merging one-line-per-segment Whisper output
+PARAGRAPH_CHARS = 300
+
+# Standalone fillers (Chinese and English) dropped from the transcript
+FILLER_PATTERN = re.compile(
+    r'(?:(?<=^)|(?<=[\s，。！？、,.!?]))'
+    r'(?:嗯+|呃+|额+|啊+|哦+|唉+|诶+|um+|uh+|erm|hmm+|you know|i mean)'
+    r'(?=$|[\s，。！？、,.!?])[，、,]?\s*',
+    re.IGNORECASE
+)
+CJK = r'\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+# Immediately repeated phrases: "就是就是" -> "就是", "我我我" -> "我", "I I think" -> "I think"
+REPEAT_PHRASE_PATTERN = re.compile(f'([{CJK}]{{2,4}})\\1+')
+REPEAT_CHAR_PATTERN = re.compile(f'([{CJK}])\\1{{2,}}')
+REPEAT_WORD_PATTERN = re.compile(r'\b([A-Za-z]+)(?:\s+\1\b)+', re.IGNORECASE)
+CJK_CHAR_PATTERN = re.compile(f'[{CJK}]')
+LATIN_WORD_PATTERN = re.compile(r'[A-Za-z0-9]+')
+SPACE_BETWEEN_CJK = re.compile(f'(?<=[{CJK}，。！？、；：])\\s+(?=[{CJK}，。！？、；：])')
+HALF_TO_FULL_PUNCT = {',': '，', '?': '？', '!': '！', ';': '；', ':': '：'}
+HALF_PUNCT_AFTER_CJK = re.compile(f'(?<=[{CJK}])([,?!;:])')
+SRT_TIME_PATTERN = re.compile(r'(\d+):(\d{2}):(\d{2})[,.](\d{3})\s*-->')
+SRT_END_PATTERN = re.compile(r'-->\s*(\d+):(\d{2}):(\d{2})[,.](\d{3})')
+# Search/retrieval terms: CJK runs and latin words
+TOKEN_PATTERN = re.compile(f'[{CJK}]+|[A-Za-z0-9]+')
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the LLM token count of mixed Chinese/English text
+
+    Args:
+        text: Input text
+
+    Returns:
+        int: Estimated token count
+    """
+    cjk_chars = len(CJK_CHAR_PATTERN.findall(text))
+    latin_words = len(LATIN_WORD_PATTERN.findall(text))
+    return int(cjk_chars * CJK_TOKENS_PER_CHAR + latin_words * LATIN_TOKENS_PER_WORD + 0.5)
+
+def tokenize(text: str) -> list:
+    """
+    Tokenize mixed text: CJK runs become character bigrams, latin words are lowercased
+    """
+    tokens = []
+    for run in TOKEN_PATTERN.findall(text):
+        if run[0].isascii():
+            tokens.append(run.lower())
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+def parse_transcript(transcript: str) -> list:
+    """
+    Split a txt or srt transcript into (start_seconds, text) segments
+
+    Start times are None for plain text transcripts.
+    """
+    segments = []
+    lines = transcript.splitlines()
+    if not any(SRT_TIME_PATTERN.match(line.strip()) for line in lines[:5]):
+        return [(None, line.strip()) for line in lines if line.strip()]
+
+    start = None
+    for line in lines:
+        line = line.strip()
+        match = SRT_TIME_PATTERN.match(line)
+        if match:
+            h, m, s, ms = (int(g) for g in match.groups())
+            start = h * 3600 + m * 60 + s + ms / 1000
+        elif line and not line.isdigit() and start is not None:
+            segments.append((start, line))
+    return segments
+
+def _srt_seconds(match) -> float:
+    h, m, s, ms = (int(g) for g in match.groups())
+    return h * 3600 + m * 60 + s + ms / 1000
+
+def parse_timed_transcript(transcript: str) -> list:
+    """
+    Split a txt or srt transcript into (start_seconds, end_seconds, text) segments
+
+    Both times are None for plain text transcripts; srt cues keep their own end time.
+    """
+    lines = transcript.splitlines()
+    if not any(SRT_TIME_PATTERN.match(line.strip()) for line in lines[:5]):
+        return [(None, None, line.strip()) for line in lines if line.strip()]
+
+    segments = []
+    start = end = None
+    for line in lines:
+        line = line.strip()
+        match = SRT_TIME_PATTERN.match(line)
+        if match:
+            start = _srt_seconds(match)
+            end_match = SRT_END_PATTERN.search(line)
+            end = _srt_seconds(end_match) if end_match else None
+        elif line and not line.isdigit() and start is not None:
+            segments.append((start, end, line))
+    return segments
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize whitespace and punctuation for Chinese text
+    """
+    text = re.sub(r'\s+', ' ', text).strip()
+    text = re.sub(r'\s+(?=[,.?!;:，。！？、；：])', '', text)
+    text = HALF_PUNCT_AFTER_CJK.sub(lambda m: HALF_TO_FULL_PUNCT[m.group(1)], text)
+    text = SPACE_BETWEEN_CJK.sub('', text)
+    # Collapse runs of punctuation left behind by dropped fillers
+    text = re.sub(r'([，、])[，、\s]+', r'\1', text)
+    text = re.sub(r'^[，、,\s]+', '', text)
+    return text
+
+def remove_disfluencies(text: str) -> str:
+    """
+    Drop filler words and immediately repeated words/phrases
+    """
+    text = FILLER_PATTERN.sub('', text)
+    text = REPEAT_PHRASE_PATTERN.sub(r'\1', text)
+    text = REPEAT_CHAR_PATTERN.sub(r'\1', text)
+    return REPEAT_WORD_PATTERN.sub(r'\1', text)
+
+def _bigrams(text: str) -> set:
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+def _is_near_duplicate(bigrams: set, recent: list, threshold: float = 0.8) -> bool:
+    for other in recent:
+        union = len(bigrams | other)
+        if union and len(bigrams & other) / union >= threshold:
+            return True
+    return False
+
+def clean_segments(segments: list) -> list:
+    """
+    Drop disfluencies, empty lines and near-duplicate repeats from segments
+
+    Args:
+        segments: List of (start_seconds, text) tuples
+
+    Returns:
+        list: Cleaned (start_seconds, text) tuples
+    """
+    cleaned = []
+    recent = []
+    for start, text in segments:
+        text = normalize_text(remove_disfluencies(text))
+        if len(text) < 2:
+            continue
+        # Whisper often repeats the same sentence in consecutive segments
+        grams = _bigrams(text)
+        if _is_near_duplicate(grams, recent):
+            continue
+        recent = (recent + [grams])[-3:]
+        cleaned.append((start, text))
+    return cleaned
+
+def trim_to_budget(segments: list, token_budget: int, buckets: int = 20) -> list:
+    """
+    Trim segments to a token budget while keeping coverage of the whole timeline
+
+    The transcript is split into equal buckets along the timeline and each bucket
+    gets an equal share of the budget. Inside a bucket the most information-dense
+    segments (distinct bigrams per token) are kept, in their original order.
+
+    Args:
+        segments: (start_seconds, text) tuples in timeline order
+        token_budget: Maximum estimated tokens to keep
+        buckets: Number of timeline buckets
+
+    Returns:
+        list: Indices of the kept segments, in timeline order
+    """
+    costs = [estimate_tokens(text) for _, text in segments]
+    if not token_budget or sum(costs) <= token_budget:
+        return list(range(len(segments)))
+
+    buckets = max(1, min(buckets, len(segments)))
+    bounds = [round(i * len(segments) / buckets) for i in range(buckets + 1)]
+    per_bucket = token_budget / buckets
+    keep = []
+    carry = 0.0
+
+    for b in range(buckets):
+        allowance = per_bucket + carry
+        ranked = sorted(
+            range(bounds[b], bounds[b + 1]),
+            key=lambda i: len(_bigrams(segments[i][1])) / max(costs[i], 1),
+            reverse=True
+        )
+        for i in ranked:
+            if costs[i] <= allowance:
+                keep.append(i)
+                allowance -= costs[i]
+        # Unused budget rolls over to the next part of the timeline
+        carry = allowance
+
+    return sorted(keep)
+
+def merge_segments(segments: list, kept: list = None, paragraph_chars: int = PARAGRAPH_CHARS) -> list:
+    """
+    Merge consecutive segments into paragraphs
+
+    A new paragraph starts when the current one reaches paragraph_chars or when
+    segments were trimmed away in between.
+
+    Args:
+        segments: List of (start_seconds, text) tuples
+        kept: Indices of segments to keep (default: all)
+        paragraph_chars: Target paragraph length in characters
+
+    Returns:
+        list: (start_seconds, paragraph_text) tuples
+    """
+    if kept is None:
+        kept = range(len(segments))
+
+    paragraphs = []
+    current, current_start, current_len = [], None, 0
+    previous = None
+
+    for i in kept:
+        start, text = segments[i]
+        if current and (current_len >= paragraph_chars or i != previous + 1):
+            paragraphs.append((current_start, _join_sentences(current)))
+            current, current_len = [], 0
+        if not current:
+            current_start = start
+        current.append(text)
+        current_len += len(text)
+        previous = i
+
+    if current:
+        paragraphs.append((current_start, _join_sentences(current)))
+    return paragraphs
+
+def _join_sentences(parts: list) -> str:
+    """Join segment texts, adding a Chinese comma where a segment has no closing punctuation"""
+    joined = []
+    for part in parts:
+        if joined and not re.search(r'[，。！？；：,.!?;:]$', joined[-1]):
+            joined[-1] += '，' if CJK_CHAR_PATTERN.search(part[:1] + joined[-1][-1:]) else ' '
+        joined.append(part)
+    return normalize_text(''.join(joined))
+
+def format_paragraphs(paragraphs: list) -> str:
+    """
+    Render paragraphs, prefixing a [mm:ss] marker when start times are known
+    """
+    lines = []
+    for start, text in paragraphs:
+        if start is None:
+            lines.append(text)
+        else:
+            minutes, seconds = divmod(int(start), 60)
+            lines.append(f"[{minutes:02d}:{seconds:02d}] {text}")
+    return "\n\n".join(lines)
+
+def compact_transcript(transcript: str, token_budget: int = None) -> tuple:
+    """
+    Compact a Whisper transcript before sending it to the LLM
+
+    Args:
+        transcript: Raw txt/srt transcript
+        token_budget: Target token count (None uses ANALYSIS_TOKEN_BUDGET, 0 disables trimming)
+
+    Returns:
+        tuple: (compacted_text, stats) where stats has input_tokens, output_tokens and ratio
+    """
+    if token_budget is None:
+        token_budget = DEFAULT_TOKEN_BUDGET
+
+    segments = clean_segments(parse_transcript(transcript))
+    kept = trim_to_budget(segments, token_budget)
+    compacted = format_paragraphs(merge_segments(segments, kept))
+
+    input_tokens = estimate_tokens(transcript)
+    output_tokens = estimate_tokens(compacted)
+    stats = {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "ratio": output_tokens / input_tokens if input_tokens else 1.0
+    }
+    return compacted, stats
@@ -1,14 +1,38 @@
 import time
-import requests
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
 import os
 from tqdm import tqdm
 from datetime import datetime
 import json
+from metrics import span
+from stages import EpisodeMeta, AudioArtifact
+from storage import cached_audio, get_storage
 
 def fetch_audio_file(url, progress_callback=None):
+    """
+    Download an episode's audio
+
+    Returns:
+        tuple: (audio_path, title, host, publish_date, url, shownotes), or None on failure
+    """
+    result = fetch_episode(url, progress_callback)
+    if not result:
+        return None
+    meta, audio = result
+    return audio.path, meta.title, meta.host, meta.date, meta.url, meta.shownotes
+
+def fetch_episode(url, progress_callback=None):
+    """
+    Scrape episode metadata and download its audio
+
+    Returns:
+        tuple: (EpisodeMeta, AudioArtifact), or None on failure
+    """
+    # Selenium and requests are only loaded when an episode is actually downloaded
+    import requests
+    from selenium import webdriver
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.chrome.options import Options
+
     # Define paths before initializing browser driver to avoid repeated creation
     chrome_options = Options()
     chrome_options.add_argument("--headless")
@@ -21,35 +45,40 @@ def fetch_audio_file(url, progress_callback=None):
     audio_path = None  # Define audio_path at the beginning of the function
 
     try:
-        driver.get(url)
-        
-        # Get podcast title
-        title_element = driver.find_element(By.XPATH, "//h1[contains(@class,'title')]")
-        podcast_title = title_element.text.strip()  # Clean whitespace
-        
-        # Get host information
-        host_element = driver.find_element(By.XPATH, "//a[contains(@class,'name')]")
-        host_name = host_element.text.strip()
-        
-        # Get publish date
-        date_element = driver.find_element(By.XPATH, "//time[contains(@class,'jsx-399326063')]")
-        publish_date = date_element.get_attribute("datetime")  # Get ISO format datetime
-        
-        # Get podcast description
-        script_element = driver.find_element(By.XPATH, "//script[@name='schema:podcast-show']")
-        script_content = script_element.get_attribute("textContent")
-        podcast_data = json.loads(script_content)
-        shownotes = podcast_data.get("description", "")
+        with span("download.metadata", url=url):
+            driver.get(url)
+            
+            # Get podcast title
+            title_element = driver.find_element(By.XPATH, "//h1[contains(@class,'title')]")
+            podcast_title = title_element.text.strip()  # Clean whitespace
+            
+            # Get host information
+            host_element = driver.find_element(By.XPATH, "//a[contains(@class,'name')]")
+            host_name = host_element.text.strip()
+            
+            # Get publish date
+            date_element = driver.find_element(By.XPATH, "//time[contains(@class,'jsx-399326063')]")
+            publish_date = date_element.get_attribute("datetime")  # Get ISO format datetime
+            
+            # Get podcast description
+            script_element = driver.find_element(By.XPATH, "//script[@name='schema:podcast-show']")
+            script_content = script_element.get_attribute("textContent")
+            podcast_data = json.loads(script_content)
+            shownotes = podcast_data.get("description", "")
         
         # Build save path
         os.makedirs("audio_files", exist_ok=True)
         audio_filename = f"{podcast_title}-episode_audio.mp3"
         audio_path = os.path.join("audio_files", audio_filename)
         
-        # 检查音频文件是否已存在
-        if os.path.exists(audio_path):
-            print(f"音频文件已存在: {audio_path}")
-            return audio_path, podcast_title, host_name, publish_date, url, shownotes
+        meta = EpisodeMeta(podcast_title, host_name, publish_date, url, shownotes)
+        
+        # 检查音频文件是否已存在（包括转码后的 Opus 版本）
+        cached_path = cached_audio(audio_path)
+        if cached_path:
+            print(f"音频文件已存在: {cached_path}")
+            get_storage().touch(cached_path)
+            return meta, AudioArtifact(cached_path, os.path.getsize(cached_path), cached=True)
         
         # Continue download process if file doesn't exist
         audio_element = driver.find_element(By.TAG_NAME, "audio")
@@ -59,22 +88,27 @@ def fetch_audio_file(url, progress_callback=None):
             return None
 
         # Download file (with timeout and retry mechanism)
-        response = requests.get(audio_url, stream=True, verify=False, timeout=30)
-        response.raise_for_status()  # Check HTTP status code
-        
-        # Use efficient download method
-        total_size = int(response.headers.get('content-length', 0))
-        with open(audio_path, 'wb') as f, tqdm(
-            total=total_size, unit='iB', unit_scale=True, desc=audio_filename
-        ) as bar:
-            for chunk in response.iter_content(chunk_size=1024):
-                if chunk:
-                    f.write(chunk)
-                    bar.update(len(chunk))
-                    if progress_callback:
-                        progress_callback(bar.n / total_size)
+        with span("download.audio", url=url) as download_span:
+            start_time = time.perf_counter()
+            response = requests.get(audio_url, stream=True, verify=False, timeout=30)
+            response.raise_for_status()  # Check HTTP status code
+            
+            # Use efficient download method
+            total_size = int(response.headers.get('content-length', 0))
+            with open(audio_path, 'wb') as f, tqdm(
+                total=total_size, unit='iB', unit_scale=True, desc=audio_filename
+            ) as bar:
+                for chunk in response.iter_content(chunk_size=1024):
+                    if chunk:
+                        f.write(chunk)
+                        bar.update(len(chunk))
+                        if progress_callback:
+                            progress_callback(bar.n / total_size)
+            elapsed = time.perf_counter() - start_time
+            download_span.set(bytes=bar.n, bytes_per_second=bar.n / elapsed if elapsed else 0.0)
+        get_storage().register(audio_path, "audio")
         
-        return audio_path, podcast_title, host_name, publish_date, url, shownotes
+        return meta, AudioArtifact(audio_path, bar.n)
 
     except Exception as e:
         print(f"Operation failed: {str(e)}")
@@ -1,59 +1,48 @@
 import streamlit as st
 import os
-from download import fetch_audio_file
+from job_runner import get_job_runner
+from jobs_ui import render_job_progress
+from state_manager import current_job, open_job
 
 def render_download_section(st):
     """
     Render the download section of the Streamlit interface
-    
+
+    Episodes are queued as background jobs, so several can be submitted at once
+    and keep running across reruns and page reloads.
+
     Args:
         st: Streamlit object
     """
-    url = st.text_input("Enter Xiaoyuzhou podcast URL:")
+    urls = st.text_area(
+        "Enter Xiaoyuzhou podcast URLs (one per line):",
+        height=100,
+        help="Each episode becomes a job in the queue below"
+    )
+    transcribe_after = st.checkbox(
+        "Transcribe after download",
+        help="Uses TRANSCRIBE_MODE / TRANSCRIBE_API_URL from the environment (local model by default)"
+    )
 
     if st.button("Start Download"):
-        if not url:
+        url_list = list(dict.fromkeys(line.strip() for line in urls.splitlines() if line.strip()))
+        if not url_list:
             st.warning("Please enter a valid podcast URL")
             return
-            
-        try:
-            # Generate filename from URL
-            result = fetch_audio_file(url, None)  # Only get title without actual download
-            if result is None:
-                st.error("Unable to get podcast information, please check the URL")
-                return
-                
-            audio_path, podcast_title, host_name, publish_date, podcast_url, shownotes = result
-
-            # Execute actual download
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-
-            def update_progress(progress):
-                progress_bar.progress(progress)
-                status_text.text(f"Download progress: {int(progress * 100)}%")
 
-            result = fetch_audio_file(url, update_progress)
-            if result is None:
-                st.error("Download failed, please try again")
-                return
-                
-            audio_path, podcast_title, host_name, publish_date, podcast_url, shownotes = result
-            
-            st.session_state.update({
-                "audio_path": audio_path,
-                "podcast_title": podcast_title,
-                "podcast_host": host_name,
-                "publish_date": publish_date,
-                "podcast_url": podcast_url,
-                "shownotes": shownotes,
-                "download_completed": True
-            })
-            
-            status_text.text("Download completed!")
-            st.success(f"Successfully downloaded podcast: {podcast_title}")
+        steps = [("download", {})]
+        if transcribe_after:
+            steps.append(("transcribe", {
+                "format": "txt",
+                "mode": os.getenv('TRANSCRIBE_MODE', 'local'),
+                "api_url": os.getenv('TRANSCRIBE_API_URL')
+            }))
+        runner = get_job_runner()
+        jobs = [runner.submit(url, steps) for url in url_list]
+        # Follow the first new episode unless this session is already watching a running job
+        job = current_job()
+        if job is None or not job.active or len(url_list) == 1:
+            open_job(jobs[0])
+        st.success(f"Queued {len(jobs)} episode(s)")
 
-        except Exception as e:
-            st.error(f"Operation failed: {str(e)}")
-            if hasattr(e, '__cause__') and e.__cause__:
-                st.error(f"Detailed error: {str(e.__cause__)}") 
\ No newline at end of file
+    render_job_progress(st, "download")
@@ -1,6 +1,38 @@
 import streamlit as st
-import os
 import time
+from storage import get_storage, format_bytes
+from state_manager import current_job
+from job_runner import get_job_runner
+
+def render_storage_usage(st):
+    """
+    Show disk usage of audio and transcripts from the storage index (no directory walk)
+    
+    Args:
+        st: Streamlit object
+    """
+    storage = get_storage()
+    usage = storage.usage()
+    audio, transcripts = usage["audio"], usage["transcript"]
+    used = audio["bytes"] + transcripts["bytes"]
+    saved = audio["original_bytes"] + transcripts["original_bytes"] - used
+    
+    st.write("**Storage**")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Audio", format_bytes(audio["bytes"]), f"{audio['files']} files", delta_color="off")
+    col2.metric("Transcripts", format_bytes(transcripts["bytes"]), f"{transcripts['files']} files", delta_color="off")
+    col3.metric("Reclaimable", format_bytes(usage["reclaimable_bytes"]), help="Audio whose transcript is saved")
+    if usage["budget_bytes"]:
+        st.progress(min(used / usage["budget_bytes"], 1.0), text=f"{format_bytes(used)} of {format_bytes(usage['budget_bytes'])} budget")
+    if saved > 0:
+        st.caption(f"Transcoding and compression saved {format_bytes(saved)}")
+    
+    if usage["reclaimable_bytes"] and st.button("🧹 Free Transcribed Audio"):
+        # A one-byte budget evicts every audio file whose transcript is saved,
+        # except audio that running jobs may still read
+        in_use = {job.audio_path for job in get_job_runner().jobs() if job.active and job.audio_path}
+        evicted = storage.enforce_budget(1, keep=in_use)
+        st.success(f"Removed {len(evicted)} audio file(s)")
 
 def render_file_manager_section(st):
     """
@@ -9,6 +41,7 @@ def render_file_manager_section(st):
     Args:
         st: Streamlit object
     """
+    render_storage_usage(st)
     if not st.session_state.download_completed:
         return
         
@@ -20,20 +53,20 @@ def render_file_manager_section(st):
 
     # Delete functionality
     st.write("**Danger Zone**")
-    if st.button("🗑️ Delete Audio File", type="primary"):
+    # The audio may still be in use by the job transcribing it
+    job = current_job()
+    if st.button("🗑️ Delete Audio File", type="primary", disabled=bool(job and job.active)):
         try:
             deleted_files = []
             # Delete audio file
-            if os.path.exists(st.session_state.audio_path):
-                os.remove(st.session_state.audio_path)
+            if get_storage().remove(st.session_state.audio_path):
                 deleted_files.append(f"Audio file: {st.session_state.audio_path}")
             
             # Reset state
             st.session_state.update({
                 "download_completed": False,
                 "audio_path": None,
-                "podcast_title": None,
-                "is_transcribing": False
+                "podcast_title": None
             })
             
             # Display results
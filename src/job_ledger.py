@@ -0,0 +1,399 @@
+import argparse
+import json
+import sqlite3
+import threading
+import time
+import os
+from pipeline import RetryLater
+
+# SQLite file recording per-episode, per-stage progress of batch runs
+JOB_LEDGER_PATH = os.getenv('JOB_LEDGER_PATH', 'jobs.db')
+# Attempts per stage before it is left for a manual retry
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+# First retry delay in seconds; doubles with each failed attempt
+JOB_RETRY_BASE_SECONDS = float(os.getenv('JOB_RETRY_BASE_SECONDS', '10'))
+JOB_RETRY_MAX_SECONDS = 3600.0
+# WAL is fastest on local disks; use DELETE when the ledger sits on a network share
+JOB_LEDGER_JOURNAL = os.getenv('JOB_LEDGER_JOURNAL', 'WAL')
+
+STAGES = ("download", "transcribe", "analyze", "upload")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS episodes (
+    url TEXT PRIMARY KEY,
+    added_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stages (
+    url TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,          -- running / done / failed
+    artifact TEXT,                 -- JSON written by the stage
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    started_at REAL,
+    finished_at REAL,
+    duration REAL,
+    next_attempt_at REAL,
+    PRIMARY KEY (url, stage)
+);
+CREATE TABLE IF NOT EXISTS leases (
+    url TEXT PRIMARY KEY,
+    status TEXT NOT NULL,          -- queued / leased / done / failed
+    owner TEXT,
+    expires_at REAL,
+    claims INTEGER NOT NULL DEFAULT 0,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS leases_status ON leases (status, expires_at);
+"""
+
+def retry_delay(attempts: int) -> float:
+    """
+    Exponential backoff after the given number of failed attempts
+    """
+    return min(JOB_RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1), JOB_RETRY_MAX_SECONDS)
+
+class JobLedger:
+    """
+    Durable record of batch progress: one row per (episode URL, stage)
+
+    Completed stages keep their artifact (file paths, analysis text, ...) so a
+    restarted run can resume each episode from its first unfinished stage with
+    a primary-key lookup.
+    """
+
+    def __init__(self, path: str = JOB_LEDGER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute(f"PRAGMA journal_mode={JOB_LEDGER_JOURNAL}")
+        self._conn.executescript(SCHEMA)
+
+    def _execute(self, sql: str, params: tuple = ()) -> list:
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).fetchall()
+
+    def add(self, urls: list) -> None:
+        """Register episodes; already known URLs keep their progress"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO episodes (url, added_at) VALUES (?, ?)",
+                [(url, now) for url in urls]
+            )
+
+    def enqueue(self, urls: list) -> None:
+        """Register episodes and queue them for workers; known URLs are left as they are"""
+        self.add(urls)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO leases (url, status) VALUES (?, 'queued')",
+                [(url,) for url in urls]
+            )
+
+    def claim(self, owner: str, ttl: float) -> str:
+        """
+        Lease the next queued episode, or one whose lease expired (its worker died)
+
+        Returns:
+            str: Episode URL, or None if nothing is claimable right now
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            # Take the write lock up front so two workers cannot pick the same row
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute(
+                """SELECT url FROM leases WHERE status = 'queued' OR (status = 'leased' AND expires_at < ?)
+                   ORDER BY status = 'leased', rowid LIMIT 1""",
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                """UPDATE leases SET status = 'leased', owner = ?, expires_at = ?, claims = claims + 1
+                   WHERE url = ?""",
+                (owner, now + ttl, row[0])
+            )
+            return row[0]
+
+    def renew(self, owner: str, urls: list, ttl: float) -> set:
+        """
+        Extend the owner's leases
+
+        Returns:
+            set: URLs whose lease the owner no longer holds
+        """
+        if not urls:
+            return set()
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"""UPDATE leases SET expires_at = ? WHERE owner = ? AND status = 'leased'
+                    AND url IN ({','.join('?' * len(urls))})""",
+                (time.time() + ttl, owner, *urls)
+            )
+            held = {row[0] for row in self._conn.execute(
+                f"""SELECT url FROM leases WHERE owner = ? AND status = 'leased'
+                    AND url IN ({','.join('?' * len(urls))})""",
+                (owner, *urls)
+            )}
+        return set(urls) - held
+
+    def holds(self, owner: str, url: str) -> bool:
+        """Whether the owner still holds the lease on url"""
+        return bool(self._execute(
+            "SELECT 1 FROM leases WHERE url = ? AND owner = ? AND status = 'leased'", (url, owner)
+        ))
+
+    def release(self, owner: str, url: str, done: bool) -> bool:
+        """
+        Finish a lease as done or failed, only if the owner still holds it
+
+        Returns:
+            bool: False if the lease had already moved to another worker
+        """
+        with self._lock, self._conn:
+            return self._conn.execute(
+                """UPDATE leases SET status = ?, expires_at = NULL, finished_at = ?
+                   WHERE url = ? AND owner = ? AND status = 'leased'""",
+                ('done' if done else 'failed', time.time(), url, owner)
+            ).rowcount == 1
+
+    def queue_counts(self) -> dict:
+        """Lease status counts plus the number of workers holding live leases"""
+        counts = {"queued": 0, "leased": 0, "done": 0, "failed": 0}
+        for row in self._execute("SELECT status, COUNT(*) FROM leases GROUP BY status"):
+            counts[row[0]] = row[1]
+        counts["workers"] = self._execute(
+            "SELECT COUNT(DISTINCT owner) FROM leases WHERE status = 'leased' AND expires_at >= ?", (time.time(),)
+        )[0][0]
+        return counts
+
+    def get(self, url: str, stage: str) -> dict:
+        """Stage record with a decoded artifact, or None"""
+        rows = self._execute("SELECT * FROM stages WHERE url = ? AND stage = ?", (url, stage))
+        if not rows:
+            return None
+        record = dict(rows[0])
+        record["artifact"] = json.loads(record["artifact"]) if record["artifact"] else None
+        return record
+
+    def start(self, url: str, stage: str) -> None:
+        self._execute(
+            """INSERT INTO stages (url, stage, status, started_at) VALUES (?, ?, 'running', ?)
+               ON CONFLICT (url, stage) DO UPDATE SET status = 'running', started_at = excluded.started_at""",
+            (url, stage, time.time())
+        )
+
+    def complete(self, url: str, stage: str, artifact: dict = None) -> None:
+        now = time.time()
+        self._execute(
+            """UPDATE stages SET status = 'done', artifact = ?, finished_at = ?, duration = ? - started_at,
+               last_error = NULL, next_attempt_at = NULL WHERE url = ? AND stage = ?""",
+            (json.dumps(artifact or {}, ensure_ascii=False), now, now, url, stage)
+        )
+
+    def fail(self, url: str, stage: str, error: str) -> int:
+        """
+        Record a failed attempt and schedule the next one
+
+        Returns:
+            int: Attempts made so far
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            attempts = self._conn.execute(
+                "SELECT attempts FROM stages WHERE url = ? AND stage = ?", (url, stage)
+            ).fetchone()[0] + 1
+            self._conn.execute(
+                """UPDATE stages SET status = 'failed', attempts = ?, last_error = ?, finished_at = ?,
+                   duration = ? - started_at, next_attempt_at = ? WHERE url = ? AND stage = ?""",
+                (attempts, error[:2000], now, now, now + retry_delay(attempts), url, stage)
+            )
+        return attempts
+
+    def retry(self, url: str = None) -> int:
+        """
+        Make failed stages (of one episode, or all) eligible to run again
+
+        Failed worker leases are queued again as well.
+
+        Returns:
+            int: Number of stages reset
+        """
+        where, params = ("AND url = ?", (url,)) if url else ("", ())
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE leases SET status = 'queued', owner = NULL WHERE status = 'failed' {where}", params)
+            return self._conn.execute(
+                f"UPDATE stages SET attempts = 0, next_attempt_at = NULL WHERE status = 'failed' {where}", params
+            ).rowcount
+
+    def reset(self, url: str, stage: str = None) -> int:
+        """
+        Forget progress of an episode from a stage onwards (all stages by default)
+        """
+        stages = STAGES[STAGES.index(stage):] if stage else STAGES
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE leases SET status = 'queued', owner = NULL WHERE url = ?", (url,))
+            return self._conn.execute(
+                f"DELETE FROM stages WHERE url = ? AND stage IN ({','.join('?' * len(stages))})",
+                (url, *stages)
+            ).rowcount
+
+    def summary(self) -> dict:
+        """
+        Per-stage status counts, attempts and average duration, plus episode totals
+        """
+        rows = self._execute(
+            """SELECT stage, status, COUNT(*) AS count, SUM(attempts) AS attempts, AVG(duration) AS duration
+               FROM stages GROUP BY stage, status"""
+        )
+        stages = {stage: {"done": 0, "running": 0, "failed": 0, "errors": 0, "avg_seconds": None} for stage in STAGES}
+        for row in rows:
+            entry = stages.setdefault(row["stage"], {"done": 0, "running": 0, "failed": 0, "errors": 0, "avg_seconds": None})
+            entry[row["status"]] = row["count"]
+            entry["errors"] += row["attempts"] or 0
+            if row["status"] == "done":
+                entry["avg_seconds"] = row["duration"]
+        total = self._execute("SELECT COUNT(*) FROM episodes")[0][0]
+        complete = self._execute(
+            "SELECT COUNT(*) FROM stages WHERE stage = ? AND status = 'done'", (STAGES[-1],)
+        )[0][0]
+        return {"episodes": total, "complete": complete, "backlog": total - complete, "stages": stages}
+
+    def failures(self) -> list:
+        """Failed stages with their error and next attempt time"""
+        return [dict(row) for row in self._execute(
+            """SELECT url, stage, attempts, last_error, next_attempt_at FROM stages
+               WHERE status = 'failed' ORDER BY url, stage"""
+        )]
+
+    def close(self) -> None:
+        self._conn.close()
+
+def item_url(item) -> str:
+    """
+    Episode URL of a pipeline item: the URL itself, an Episode, or a dict with "source_url"
+    """
+    if isinstance(item, str):
+        return item
+    return item["source_url"] if isinstance(item, dict) else item.source_url
+
+def tracked_stage(ledger: JobLedger, stage: str, func, dump=None, load=None, pending=None):
+    """
+    Wrap a pipeline stage so it is recorded in the ledger and skipped once done
+
+    A failed attempt raises RetryLater with the backoff delay, so run_pipeline
+    requeues the episode without holding a worker; the last allowed attempt
+    raises the stage's own error.
+
+    Args:
+        ledger: Job ledger
+        stage: Stage name
+        func: Stage function (item -> item or None)
+        dump: Optional callable(output) -> JSON-serializable artifact to record
+        load: Optional callable(item, artifact) -> output rebuilt from a recorded
+              artifact, or None if it is no longer usable (the stage then runs again)
+        pending: Optional callable(output) -> Future of a background write the
+                 result depends on (or None); the stage is recorded as done only
+                 once it succeeds, and as failed if it raises
+
+    Returns:
+        callable: Stage function for run_pipeline
+    """
+    # Episodes requeued by this run after a failure: their backoff has already been waited out
+    retrying = set()
+    retrying_lock = threading.Lock()
+
+    def run(item):
+        url = item_url(item)
+        with retrying_lock:
+            retried = url in retrying
+            retrying.discard(url)
+        record = ledger.get(url, stage)
+        if record and record["status"] == "done":
+            restored = load(item, record["artifact"]) if load else item
+            if restored is not None:
+                return restored
+            print(f"Recorded {stage} result for {url} is gone, running it again")
+
+        attempts = record["attempts"] if record else 0
+        if record and record["status"] == "failed" and not retried:
+            if attempts >= JOB_MAX_ATTEMPTS:
+                print(f"Skipping {stage} for {url}: failed {attempts} times (use job_ledger.py retry)")
+                return None
+            wait = (record["next_attempt_at"] or 0) - time.time()
+            if wait > 0:
+                print(f"Skipping {stage} for {url}: next retry in {wait:.0f}s")
+                return None
+
+        ledger.start(url, stage)
+        try:
+            output = func(item)
+            if output is None:
+                raise RuntimeError(f"{stage} returned no result")
+        except Exception as e:
+            attempts = ledger.fail(url, stage, str(e))
+            if attempts >= JOB_MAX_ATTEMPTS:
+                raise
+            delay = retry_delay(attempts)
+            print(f"{stage} failed for {url} ({str(e)}), retrying in {delay:.0f}s")
+            with retrying_lock:
+                retrying.add(url)
+            # Requeued by the pipeline after the delay instead of blocking this worker
+            raise RetryLater(delay, str(e)) from e
+        artifact = dump(output) if dump else None
+        future = pending(output) if pending else None
+        if future is None:
+            ledger.complete(url, stage, artifact)
+        else:
+            # The item moves on in memory; a restart redoes the stage unless the write landed
+            def finish(done):
+                error = done.exception()
+                if error is None:
+                    ledger.complete(url, stage, artifact)
+                else:
+                    ledger.fail(url, stage, f"write failed: {str(error)}")
+            future.add_done_callback(finish)
+        return output
+
+    return run
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch job ledger")
+    parser.add_argument("--db", default=JOB_LEDGER_PATH, help="Ledger file")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("status", help="Per-stage backlog status (default)")
+    commands.add_parser("failed", help="List failed stages")
+    retry = commands.add_parser("retry", help="Retry failed stages on the next run")
+    retry.add_argument("url", nargs="?", help="Only this episode")
+    reset = commands.add_parser("reset", help="Redo an episode from a stage")
+    reset.add_argument("url")
+    reset.add_argument("--stage", choices=STAGES, help="First stage to redo (default: all)")
+    args = parser.parse_args()
+
+    ledger = JobLedger(args.db)
+    if args.command == "failed":
+        for row in ledger.failures():
+            print(f"{row['stage']:<10} {row['attempts']:>2}x  {row['url']}\n    {row['last_error']}")
+    elif args.command == "retry":
+        print(f"{ledger.retry(args.url)} failed stage(s) will be retried")
+    elif args.command == "reset":
+        print(f"{ledger.reset(args.url, args.stage)} stage record(s) removed")
+    else:
+        summary = ledger.summary()
+        print(f"Episodes: {summary['episodes']}  complete: {summary['complete']}  backlog: {summary['backlog']}")
+        queue = ledger.queue_counts()
+        if any(queue.values()):
+            print(
+                f"Worker queue: {queue['queued']} queued, {queue['leased']} leased, {queue['done']} done, "
+                f"{queue['failed']} failed ({queue['workers']} active worker(s))"
+            )
+        print(f"{'stage':<12} {'done':>5} {'running':>7} {'failed':>6} {'errors':>6} {'avg s':>8}")
+        for stage, s in summary["stages"].items():
+            avg = f"{s['avg_seconds']:.1f}" if s["avg_seconds"] is not None else "-"
+            print(f"{stage:<12} {s['done']:>5} {s['running']:>7} {s['failed']:>6} {s['errors']:>6} {avg:>8}")
+    ledger.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+import argparse
+import json
+import sqlite3
+import threading
+import time
+import uuid
+import os
+from concurrent.futures import ThreadPoolExecutor
+from metrics import span
+from resources import get_thread_plan
+
+# SQLite file keeping Streamlit jobs and their results across reloads and restarts
+UI_JOBS_PATH = os.getenv('UI_JOBS_PATH', 'ui_jobs.db')
+# Jobs run at the same time (transcriptions are further limited by the CPU plan)
+UI_JOB_WORKERS = int(os.getenv('UI_JOB_WORKERS', '3'))
+# Finished jobs loaded back at startup
+UI_JOB_HISTORY = int(os.getenv('UI_JOB_HISTORY', '200'))
+
+STEPS = ("download", "transcribe", "analyze")
+ACTIVE = ("queued", "running")
+# Seconds between cancel checks while a job waits for a transcription slot
+JOB_CANCEL_POLL_SECONDS = 0.5
+# Step options that are only kept in memory
+SECRET_OPTIONS = ("api_key",)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL,          -- queued / running / done / failed / cancelled
+    stage TEXT,
+    steps TEXT,                    -- JSON list of pending [step, options]
+    meta TEXT,                     -- JSON EpisodeMeta
+    audio_path TEXT,
+    transcript_path TEXT,
+    analysis TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_url ON jobs (url);
+"""
+
+class JobCancelled(Exception):
+    """Raised inside a running step once its job is cancelled"""
+
+class Job:
+    """
+    One episode and the steps requested for it; fields are read directly by the UI
+
+    `version` changes whenever a step starts, finishes or fails, so sessions can
+    tell when to refresh; `progress`/`message` (and `partial` while analyzing)
+    change continuously and are only kept in memory.
+    """
+
+    def __init__(self, url: str, job_id: str = None):
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.url = url
+        self.status = "queued"
+        self.stage = None
+        self.steps = []
+        self.meta = None
+        self.audio_path = None
+        self.transcript_path = None
+        self.analysis = None
+        self.analysis_stats = {}
+        self.error = None
+        self.progress = 0.0
+        self.message = ""
+        self.partial = []
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.version = 0
+        self.scheduled = False
+        self.cancel_event = threading.Event()
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE
+
+    @property
+    def title(self) -> str:
+        return self.meta["title"] if self.meta else self.url
+
+    def pending(self, step: str) -> bool:
+        """Whether the step is running or waiting to run"""
+        return (self.status == "running" and self.stage == step) or any(name == step for name, _ in self.steps)
+
+class JobRunner:
+    """
+    Background execution of download / transcribe / analyze steps for the Streamlit app
+
+    One runner is shared by every session of the server process. Each episode
+    URL maps to one job; submitting more steps for a URL extends its job. Jobs
+    and their results are stored in SQLite so a reloaded page (or a restarted
+    server) can reopen them; jobs cut off by a restart are marked failed.
+    """
+
+    def __init__(self, path: str = UI_JOBS_PATH, workers: int = UI_JOB_WORKERS):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ui-job")
+        # One transcription at a time by default: the UI thread plan gives it every core
+        self._transcribe_slots = threading.Semaphore(get_thread_plan()['transcribe_workers'])
+        self._jobs = {}
+        self._load()
+
+    def _execute(self, sql: str, params: tuple = ()) -> list:
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _load(self) -> None:
+        rows = self._execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (UI_JOB_HISTORY,))
+        for row in reversed(rows):
+            job = Job(row["url"], row["id"])
+            job.status, job.stage, job.error = row["status"], row["stage"], row["error"]
+            job.meta = json.loads(row["meta"]) if row["meta"] else None
+            job.audio_path, job.transcript_path, job.analysis = row["audio_path"], row["transcript_path"], row["analysis"]
+            job.created_at, job.updated_at = row["created_at"], row["updated_at"]
+            if job.active:
+                job.status, job.error = "failed", "Interrupted by a server restart"
+                self._save(job)
+            self._jobs[job.id] = job
+
+    def _save(self, job: Job) -> None:
+        steps = [[name, {k: v for k, v in options.items() if k not in SECRET_OPTIONS}] for name, options in job.steps]
+        self._execute(
+            """INSERT OR REPLACE INTO jobs (id, url, status, stage, steps, meta, audio_path, transcript_path,
+               analysis, error, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (job.id, job.url, job.status, job.stage, json.dumps(steps, ensure_ascii=False),
+             json.dumps(job.meta, ensure_ascii=False) if job.meta else None, job.audio_path,
+             job.transcript_path, job.analysis, job.error, job.created_at, job.updated_at)
+        )
+
+    def _changed(self, job: Job, **fields) -> None:
+        """Apply a state transition, bump the version and persist it"""
+        for key, value in fields.items():
+            setattr(job, key, value)
+        job.updated_at = time.time()
+        job.version += 1
+        self._save(job)
+
+    def submit(self, url: str, steps: list) -> Job:
+        """
+        Queue steps for an episode, reusing its existing job
+
+        Args:
+            url: Episode URL
+            steps: List of (step, options) with step in STEPS
+
+        Returns:
+            Job: The episode's job
+        """
+        url = url.strip()
+        with self._lock:
+            job = next((j for j in reversed(self._jobs.values()) if j.url == url), None)
+            if job is None:
+                job = Job(url)
+                self._jobs[job.id] = job
+            names = [name for name, _ in steps]
+            # Transcription needs the audio, which an earlier eviction or failure may have lost
+            if "transcribe" in names and "download" not in names and not job.pending("download") \
+                    and not (job.meta and job.audio_path and os.path.exists(job.audio_path)):
+                steps = [("download", {})] + list(steps)
+            job.steps.extend((name, dict(options)) for name, options in steps)
+            job.cancel_event.clear()
+            start = not job.scheduled
+            job.scheduled = True
+        if start:
+            self._changed(job, status="queued", error=None)
+            self._executor.submit(self._run, job)
+        else:
+            self._changed(job)
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """Drop a job's pending steps and interrupt the running one"""
+        job = self._jobs.get(job_id)
+        if job is None or not job.active:
+            return False
+        with self._lock:
+            job.steps.clear()
+            job.cancel_event.set()
+        return True
+
+    def get(self, job_id: str) -> Job:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> list:
+        """All known jobs, newest first"""
+        return sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    def clear_finished(self) -> int:
+        """Forget jobs that are no longer running (their files are kept)"""
+        with self._lock:
+            finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+            for job_id in finished:
+                del self._jobs[job_id]
+        for job_id in finished:
+            self._execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        return len(finished)
+
+    def _run(self, job: Job) -> None:
+        while True:
+            with self._lock:
+                if not job.steps:
+                    job.scheduled = False
+                    break
+                name, options = job.steps.pop(0)
+            self._changed(job, status="running", stage=name, progress=0.0, message="Starting...", error=None)
+            try:
+                if job.cancel_event.is_set():
+                    raise JobCancelled()
+                with span(f"ui.{name}"):
+                    getattr(self, f"_{name}")(job, options)
+            except JobCancelled:
+                with self._lock:
+                    job.steps.clear()
+                    job.scheduled = False
+                self._changed(job, status="cancelled", message=f"{name.title()} cancelled")
+                return
+            except Exception as e:
+                print(f"Job {job.id} {name} failed for {job.url}: {str(e)}")
+                with self._lock:
+                    job.steps.clear()
+                    job.scheduled = False
+                self._changed(job, status="failed", error=str(e))
+                return
+        if job.cancel_event.is_set():
+            # Cancelled while still queued
+            self._changed(job, status="cancelled", message="Cancelled")
+        else:
+            self._changed(job, status="done", progress=1.0, message="Completed")
+
+    def _progress(self, job: Job, progress: float, message: str) -> None:
+        if job.cancel_event.is_set():
+            raise JobCancelled()
+        job.progress, job.message = progress, message
+
+    def _download(self, job: Job, options: dict) -> None:
+        from download import fetch_episode
+        result = fetch_episode(
+            job.url, lambda progress: self._progress(job, progress, f"Download progress: {int(progress * 100)}%")
+        )
+        if result is None:
+            # fetch_episode turns every error into None, including JobCancelled from the progress callback
+            if job.cancel_event.is_set():
+                raise JobCancelled()
+            raise RuntimeError("Unable to get podcast information, please check the URL")
+        meta, audio = result
+        self._changed(job, meta={"title": meta.title, "host": meta.host, "date": meta.date,
+                                 "url": meta.url, "shownotes": meta.shownotes}, audio_path=audio.path)
+
+    def _transcribe(self, job: Job, options: dict) -> None:
+        from transcribe import transcribe_audio
+        from storage import get_storage
+        output_format = options.get("format", "txt")
+        transcript_file = f"{job.meta['title']}.{output_format}"
+        self._progress(job, 0.0, "Waiting for a free transcriber...")
+        # Poll the slot so a cancel takes effect while waiting
+        while not self._transcribe_slots.acquire(timeout=JOB_CANCEL_POLL_SECONDS):
+            self._progress(job, 0.0, "Waiting for a free transcriber...")
+        try:
+            transcribe_audio(
+                audio_path=job.audio_path,
+                output_file=transcript_file,
+                output_format=output_format,
+                device_option="cpu",
+                mode=options.get("mode", "local"),
+                api_url=options.get("api_url"),
+                progress_callback=lambda progress, message: self._progress(job, progress, message)
+            )
+        finally:
+            self._transcribe_slots.release()
+        transcript_path = os.path.join("transcript_files", transcript_file)
+        # Link the transcript to its audio; the audio may be transcoded or evicted from now on
+        audio_path = get_storage().after_transcription(job.audio_path, transcript_path)
+        self._changed(job, transcript_path=transcript_path, audio_path=audio_path)
+
+    def _analyze(self, job: Job, options: dict) -> None:
+        from analyze import stream_podcast_analysis
+        from storage import read_transcript
+        if not job.transcript_path:
+            raise RuntimeError("Please complete transcription first")
+        job.partial, job.analysis_stats = [], {}
+        stats = {}
+        started = time.perf_counter()
+        deltas = stream_podcast_analysis(
+            read_transcript(job.transcript_path),
+            options["api_key"],
+            options["system_prompt"],
+            job.meta.get("shownotes") or "",
+            options.get("temperature", 0.7),
+            compact=options.get("compact", True),
+            token_budget=options.get("token_budget"),
+            stats=stats,
+            retrieval=options.get("retrieval")
+        )
+        try:
+            for delta in deltas:
+                if job.cancel_event.is_set():
+                    raise JobCancelled()
+                if delta:
+                    job.partial.append(delta)
+                else:
+                    job.message = f"Waiting for the model... ({int(time.perf_counter() - started)}s)"
+        finally:
+            # Closing the stream aborts the request when cancelled
+            deltas.close()
+        job.analysis_stats = stats
+        self._changed(job, analysis="".join(job.partial))
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._conn.close()
+
+_runner = None
+_runner_lock = threading.Lock()
+
+def get_job_runner() -> JobRunner:
+    """
+    Return the process-wide job runner (shared by all Streamlit sessions)
+    """
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
+
+def main():
+    parser = argparse.ArgumentParser(description="Streamlit background jobs")
+    parser.add_argument("--db", default=UI_JOBS_PATH, help="Jobs file")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("list", help="List recorded jobs (default)")
+    commands.add_parser("clear", help="Forget finished jobs")
+    args = parser.parse_args()
+
+    runner = JobRunner(args.db, workers=1)
+    if args.command == "clear":
+        print(f"Removed {runner.clear_finished()} finished job(s)")
+    else:
+        for job in runner.jobs():
+            done = [name for name, value in (("audio", job.audio_path), ("transcript", job.transcript_path),
+                                              ("analysis", job.analysis)) if value]
+            print(f"{job.id}  {job.status:<9} {job.stage or '-':<10} {job.title}  [{', '.join(done)}]")
+            if job.error:
+                print(f"    {job.error}")
+    runner.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import streamlit as st
+import os
+from job_runner import get_job_runner
+from state_manager import current_job, open_job
+
+# Seconds between progress refreshes while jobs are running
+JOB_POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', '1'))
+# Jobs listed in the queue panel
+JOB_QUEUE_ROWS = 50
+
+STATUS_ICONS = {"queued": "⏳", "running": "🔄", "done": "✅", "failed": "❌", "cancelled": "⏹"}
+
+def render_job_progress(st, step):
+    """
+    Show live progress while this session's job runs a step, or why the step stopped
+
+    Args:
+        st: Streamlit object
+        step: "download", "transcribe" or "analyze"
+    """
+    job = current_job()
+    if job is None:
+        return
+    if job.active and job.pending(step):
+        _poll_job(job.id, step)
+    elif job.stage == step and job.status == "failed":
+        st.error(f"{step.title()} failed: {job.error}", icon="❌")
+    elif job.stage == step and job.status == "cancelled":
+        st.warning(f"{step.title()} cancelled")
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def _poll_job(job_id, step):
+    job = get_job_runner().get(job_id)
+    # A step started, finished or failed: rerun the whole page so every panel picks it up
+    if job is None or job.version != st.session_state.job_version:
+        st.rerun()
+
+    if job.stage != step or job.status == "queued":
+        st.caption(f"⏳ Queued{f' after {job.stage}' if job.status == 'running' else ''}...")
+    elif step == "analyze":
+        if job.partial:
+            st.markdown("".join(job.partial) + "▌")
+        else:
+            st.caption(job.message)
+    else:
+        st.progress(min(max(job.progress, 0.0), 1.0), text=job.message)
+    if st.button(f"⏹ Cancel {step.title()}", key=f"cancel_{step}_{job_id}"):
+        get_job_runner().cancel(job_id)
+
+def _render_jobs(jobs):
+    runner = get_job_runner()
+    active_id = st.session_state.get("job_id")
+    for job in jobs[:JOB_QUEUE_ROWS]:
+        col1, col2, col3 = st.columns([5, 3, 2])
+        with col1:
+            marker = "▶ " if job.id == active_id else ""
+            st.markdown(f"{marker}**{job.title}**")
+            if job.meta:
+                st.caption(job.url)
+        with col2:
+            label = f"{STATUS_ICONS.get(job.status, '')} {job.status}"
+            if job.stage and job.status != "done":
+                label += f" · {job.stage}"
+            if job.status == "running" and job.stage != "analyze":
+                st.progress(min(max(job.progress, 0.0), 1.0), text=label)
+            else:
+                st.write(label)
+            if job.error:
+                st.caption(job.error)
+        with col3:
+            if job.id != active_id and st.button("Open", key=f"open_{job.id}"):
+                open_job(job)
+                st.rerun()
+            if job.active and st.button("Cancel", key=f"cancel_{job.id}"):
+                runner.cancel(job.id)
+    if len(jobs) > JOB_QUEUE_ROWS:
+        st.caption(f"{len(jobs) - JOB_QUEUE_ROWS} older job(s) not shown")
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def _poll_queue():
+    jobs = get_job_runner().jobs()
+    job = current_job()
+    # Stop polling once everything has finished, and refresh the page when the opened job moved on
+    if not any(j.active for j in jobs) or (job and job.version != st.session_state.job_version):
+        st.rerun()
+    _render_jobs(jobs)
+
+def render_job_queue(st):
+    """
+    Render the job queue shared by all sessions: status, progress and results of every episode
+
+    Args:
+        st: Streamlit object
+    """
+    runner = get_job_runner()
+    jobs = runner.jobs()
+    if not jobs:
+        st.caption("No jobs yet: queue episode URLs in Step 1")
+        return
+
+    counts = {}
+    for job in jobs:
+        counts[job.status] = counts.get(job.status, 0) + 1
+    col1, col2 = st.columns([4, 1])
+    col1.caption(" · ".join(f"{STATUS_ICONS[status]} {count} {status}" for status, count in counts.items()))
+    if col2.button("Clear Finished", disabled=all(job.active for job in jobs)):
+        runner.clear_finished()
+        st.rerun()
+
+    if any(job.active for job in jobs):
+        _poll_queue()
+    else:
+        _render_jobs(jobs)
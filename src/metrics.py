@@ -0,0 +1,231 @@
+import atexit
+import json
+import threading
+import time
+import os
+
+# Append one JSON object per span/sample to this file (empty = off)
+METRICS_JSONL = os.getenv('METRICS_JSONL', '')
+# Prometheus textfile (node_exporter textfile collector) rewritten on every flush (empty = off)
+METRICS_PROM = os.getenv('METRICS_PROM', '')
+# Seconds between RSS/CPU samples and metric file flushes
+METRICS_SAMPLE_SECONDS = float(os.getenv('METRICS_SAMPLE_SECONDS', '5'))
+# Instrumentation is a no-op unless an export target is configured
+METRICS_ENABLED = bool(METRICS_JSONL or METRICS_PROM)
+# Span fields that are per-span ratios rather than additive amounts
+RATIO_SUFFIXES = ("_per_second", "rtf")
+
+class _NullSpan:
+    """Shared do-nothing span returned while metrics are disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **fields):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class Span:
+    """
+    Timed section of work; numeric fields (bytes, tokens, ...) are aggregated per span name
+    """
+    __slots__ = ("name", "fields", "start")
+
+    def __init__(self, name: str, fields: dict):
+        self.name = name
+        self.fields = fields
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        status = "error" if exc_type else self.fields.pop("status", "ok")
+        get_recorder().record(self.name, time.perf_counter() - self.start, status, self.fields)
+        return False
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class MetricsRecorder:
+    """
+    Collects spans and process samples, writing JSON lines and a Prometheus textfile
+    """
+
+    def __init__(self, jsonl_path: str = METRICS_JSONL, prom_path: str = METRICS_PROM,
+                 sample_seconds: float = METRICS_SAMPLE_SECONDS):
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self.sample_seconds = sample_seconds
+        self._lock = threading.Lock()
+        self._lines = []
+        self._spans = {}    # (name, status) -> {"count", "sum", "max"}
+        self._fields = {}   # (name, field) -> total
+        self._process = {"rss_bytes": 0, "peak_rss_bytes": 0, "cpu_percent": 0.0}
+        self._sampler = None
+        self._stop = threading.Event()
+
+    def record(self, name: str, seconds: float, status: str = "ok", fields: dict = None) -> None:
+        """Record one finished span"""
+        fields = fields or {}
+        with self._lock:
+            aggregate = self._spans.setdefault((name, status), {"count": 0, "sum": 0.0, "max": 0.0})
+            aggregate["count"] += 1
+            aggregate["sum"] += seconds
+            aggregate["max"] = max(aggregate["max"], seconds)
+            for key, value in fields.items():
+                # Ratios (bytes_per_second, rtf) are kept in the JSON lines only; totals would be meaningless
+                if key.endswith(RATIO_SUFFIXES):
+                    continue
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    self._fields[(name, key)] = self._fields.get((name, key), 0) + value
+            if self.jsonl_path:
+                self._lines.append(json.dumps(
+                    {"ts": time.time(), "span": name, "seconds": round(seconds, 6), "status": status, **fields},
+                    ensure_ascii=False, default=str
+                ))
+        if self._sampler is None:
+            self.start_sampling()
+
+    def start_sampling(self) -> None:
+        """Start the background RSS/CPU sampler (also flushes periodically)"""
+        with self._lock:
+            if self._sampler is not None:
+                return
+            self._sampler = threading.Thread(target=self._sample_loop, name="metrics-sampler", daemon=True)
+        self._sampler.start()
+
+    def _sample_loop(self) -> None:
+        import psutil
+        process = psutil.Process()
+        process.cpu_percent(None)
+        while not self._stop.wait(self.sample_seconds):
+            self.sample(process)
+            self.flush()
+
+    def sample(self, process=None) -> None:
+        """Take one RSS/CPU sample of this process"""
+        import psutil
+        process = process or psutil.Process()
+        rss = process.memory_info().rss
+        cpu = process.cpu_percent(None)
+        with self._lock:
+            self._process["rss_bytes"] = rss
+            self._process["peak_rss_bytes"] = max(self._process["peak_rss_bytes"], rss)
+            self._process["cpu_percent"] = cpu
+            if self.jsonl_path:
+                self._lines.append(json.dumps({"ts": time.time(), "span": "process", "rss_bytes": rss, "cpu_percent": cpu}))
+
+    def flush(self) -> None:
+        """Append buffered JSON lines and rewrite the Prometheus textfile"""
+        with self._lock:
+            lines, self._lines = self._lines, []
+            prom = self._prometheus() if self.prom_path else None
+        if lines:
+            with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        if prom is not None:
+            # Atomic replace so the collector never reads a partial file
+            tmp_path = f"{self.prom_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(prom)
+            os.replace(tmp_path, self.prom_path)
+
+    def _prometheus(self) -> str:
+        lines = [
+            "# HELP podcast_span_seconds Time spent in instrumented stages and sub-steps",
+            "# TYPE podcast_span_seconds summary"
+        ]
+        for (name, status), aggregate in sorted(self._spans.items()):
+            labels = f'span="{_label(name)}",status="{_label(status)}"'
+            lines.append(f"podcast_span_seconds_sum{{{labels}}} {aggregate['sum']:.6f}")
+            lines.append(f"podcast_span_seconds_count{{{labels}}} {aggregate['count']}")
+        lines += ["# HELP podcast_span_seconds_max Longest single span", "# TYPE podcast_span_seconds_max gauge"]
+        for (name, status), aggregate in sorted(self._spans.items()):
+            lines.append(f'podcast_span_seconds_max{{span="{_label(name)}",status="{_label(status)}"}} {aggregate["max"]:.6f}')
+        lines += ["# HELP podcast_span_field_total Sum of numeric span fields (bytes, tokens, ...)",
+                  "# TYPE podcast_span_field_total counter"]
+        for (name, field), total in sorted(self._fields.items()):
+            lines.append(f'podcast_span_field_total{{span="{_label(name)}",field="{_label(field)}"}} {total}')
+        for key, value in self._process.items():
+            lines += [f"# TYPE podcast_process_{key} gauge", f"podcast_process_{key} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> dict:
+        """
+        Aggregates per span name: count, total and max seconds, numeric field totals, plus process peaks
+        """
+        with self._lock:
+            spans = {}
+            for (name, status), aggregate in self._spans.items():
+                entry = spans.setdefault(name, {"count": 0, "errors": 0, "seconds": 0.0, "max": 0.0})
+                entry["count"] += aggregate["count"]
+                entry["errors"] += aggregate["count"] if status == "error" else 0
+                entry["seconds"] += aggregate["sum"]
+                entry["max"] = max(entry["max"], aggregate["max"])
+            for (name, field), total in self._fields.items():
+                spans.setdefault(name, {"count": 0, "errors": 0, "seconds": 0.0, "max": 0.0})[field] = total
+            return {"spans": spans, "process": dict(self._process)}
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._sampler is not None:
+            try:
+                self.sample()
+            except Exception:
+                pass
+        self.flush()
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+def get_recorder() -> MetricsRecorder:
+    """
+    Return the process-wide recorder (flushed at exit)
+    """
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = MetricsRecorder()
+            atexit.register(_recorder.close)
+        return _recorder
+
+def span(name: str, **fields):
+    """
+    Time a block of work: `with span("download.audio", url=url) as s: ...; s.set(bytes=n)`
+
+    Returns a shared no-op object when metrics are disabled.
+    """
+    return Span(name, fields) if METRICS_ENABLED else _NULL_SPAN
+
+def record(name: str, seconds: float, status: str = "ok", **fields) -> None:
+    """
+    Record an already-timed operation (no-op when metrics are disabled)
+    """
+    if METRICS_ENABLED:
+        get_recorder().record(name, seconds, status, fields)
+
+def format_metrics_summary() -> str:
+    """
+    Render the recorder summary as a small table (empty when disabled)
+    """
+    if not METRICS_ENABLED:
+        return ""
+    summary = get_recorder().summary()
+    lines = [f"{'span':<24} {'count':>6} {'errors':>6} {'total s':>9} {'max s':>8}  fields"]
+    for name, s in sorted(summary["spans"].items()):
+        extra = ", ".join(
+            f"{key}={value:.0f}" for key, value in s.items() if key not in ("count", "errors", "seconds", "max")
+        )
+        lines.append(f"{name:<24} {s['count']:>6} {s['errors']:>6} {s['seconds']:>9.2f} {s['max']:>8.2f}  {extra}")
+    process = summary["process"]
+    lines.append(f"Peak RSS {process['peak_rss_bytes'] / 2**20:.0f} MiB, last CPU {process['cpu_percent']:.0f}%")
+    return "\n".join(lines)
@@ -0,0 +1,134 @@
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import os
+from notion_session import notion_call
+
+# Notion API limits
+NOTION_MAX_CHILDREN = 100       # children per append request
+NOTION_MAX_TEXT_LENGTH = 2000   # characters per rich text item
+NOTION_MAX_RICH_TEXT_ITEMS = 100  # rich text items per block
+# Parallel appends into different parent blocks
+NOTION_APPEND_WORKERS = int(os.getenv('NOTION_APPEND_WORKERS', '3'))
+
+def split_rich_text(rich_text: list) -> list:
+    """
+    Split rich text items longer than NOTION_MAX_TEXT_LENGTH, keeping their annotations
+    """
+    result = []
+    for item in rich_text:
+        content = item.get("text", {}).get("content", "")
+        if len(content) <= NOTION_MAX_TEXT_LENGTH:
+            result.append(item)
+            continue
+        for start in range(0, len(content), NOTION_MAX_TEXT_LENGTH):
+            piece = copy.deepcopy(item)
+            piece["text"]["content"] = content[start:start + NOTION_MAX_TEXT_LENGTH]
+            result.append(piece)
+    return result
+
+def enforce_block_limits(blocks: list) -> list:
+    """
+    Make blocks comply with Notion rich text limits
+    
+    Oversized text runs are split into several items; a block with more than
+    NOTION_MAX_RICH_TEXT_ITEMS items is continued in further blocks of the same type.
+    
+    Args:
+        blocks: Notion block array
+    
+    Returns:
+        list: Limit-compliant block array
+    """
+    result = []
+    for block in blocks:
+        body = block.get(block["type"], {})
+        if "children" in body:
+            body = dict(body, children=enforce_block_limits(body["children"]))
+        if "rich_text" not in body:
+            result.append(dict(block, **{block["type"]: body}) if body else block)
+            continue
+        rich_text = split_rich_text(body["rich_text"])
+        for start in range(0, max(len(rich_text), 1), NOTION_MAX_RICH_TEXT_ITEMS):
+            part_body = dict(body, rich_text=rich_text[start:start + NOTION_MAX_RICH_TEXT_ITEMS])
+            if start:
+                # Nested children stay with the first block
+                part_body.pop("children", None)
+            result.append(dict(block, **{block["type"]: part_body}))
+    return result
+
+def batch_blocks(blocks: list, size: int = NOTION_MAX_CHILDREN) -> list:
+    """
+    Split blocks into append batches of at most size children
+    """
+    return [blocks[i:i + size] for i in range(0, len(blocks), size)]
+
+def _append_children(notion, parent_id: str, blocks: list, after: str = None, position: dict = None,
+                     on_batch=None) -> tuple:
+    """
+    Append blocks to one parent in order, batch by batch
+    
+    Nested children are detached and returned as (block_id, children) follow-up
+    work, since they may exceed the per-request limits themselves.
+    
+    Args:
+        after: Insert after this child block instead of at the end
+        position: Notion position object (e.g. {"type": "start"}) when there is no anchor
+        on_batch: Optional callable(ids) run with the block IDs of each appended batch
+    
+    Returns:
+        tuple: ((block_id, children) pairs still to append, created top-level block IDs)
+    """
+    follow_up = []
+    created = []
+    for batch in batch_blocks(blocks):
+        nested = []
+        request = []
+        for block in batch:
+            body = block.get(block["type"], {})
+            if body.get("children"):
+                block = dict(block, **{block["type"]: {k: v for k, v in body.items() if k != "children"}})
+                nested.append((len(request), body["children"]))
+            request.append(block)
+        placement = {"after": after} if after else ({"position": position} if position else {})
+        response = notion_call(notion.blocks.children.append, block_id=parent_id, children=request, **placement)
+        results = response["results"]
+        for index, children in nested:
+            follow_up.append((results[index]["id"], children))
+        created.extend(result["id"] for result in results)
+        if on_batch:
+            on_batch([result["id"] for result in results])
+        if placement:
+            # Later batches go right after this one
+            after = created[-1]
+    return follow_up, created
+
+def append_blocks(notion, parent_id: str, blocks: list, max_workers: int = NOTION_APPEND_WORKERS,
+                  after: str = None, position: dict = None, on_batch=None) -> list:
+    """
+    Append any number of blocks to a page or block within Notion API limits
+    
+    Blocks under one parent are appended sequentially to keep their order.
+    Children of different parents do not depend on each other and are appended
+    concurrently, up to max_workers at a time.
+    
+    Args:
+        notion: Notion client
+        parent_id: Page or block ID
+        blocks: Notion block array (may contain nested children)
+        max_workers: Concurrent appends into different parents
+        after: Insert the top-level blocks after this child block
+        position: Notion position object used when there is no anchor block
+        on_batch: Optional callable(ids) run with the IDs of each appended batch of
+                  top-level blocks (their nested children may still be missing)
+    
+    Returns:
+        list: IDs of the created top-level blocks, in order
+    """
+    follow_up, created = _append_children(
+        notion, parent_id, enforce_block_limits(blocks), after, position, on_batch
+    )
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        while follow_up:
+            levels = pool.map(lambda work: _append_children(notion, *work)[0], follow_up)
+            follow_up = [item for level in levels for item in level]
+    return created
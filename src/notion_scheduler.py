@@ -0,0 +1,160 @@
+from collections import deque
+from concurrent.futures import Future
+import random
+import threading
+import time
+import os
+from metrics import record
+
+# Notion allows about 3 requests/second per integration
+NOTION_REQUESTS_PER_SECOND = float(os.getenv('NOTION_REQUESTS_PER_SECOND', '3'))
+NOTION_BURST = int(os.getenv('NOTION_BURST', '3'))
+NOTION_MAX_RETRIES = 5
+# Window used for the throughput figure
+THROUGHPUT_WINDOW = 60.0
+
+def _method_name(func) -> str:
+    """e.g. BlocksChildrenEndpoint.append -> blocks_children.append"""
+    owner = type(getattr(func, "__self__", None)).__name__.replace("Endpoint", "")
+    owner = "".join(f"_{c.lower()}" if c.isupper() else c for c in owner).lstrip("_")
+    return f"{owner}.{getattr(func, '__name__', 'call')}"
+
+class NotionScheduler:
+    """
+    Process-wide pacing queue for Notion API calls
+
+    Every call reserves a start slot from a token bucket (FIFO by reservation),
+    so any number of worker threads together stay at the integration's rate
+    limit. 429 responses push the whole queue back by Retry-After; 429 and 5xx
+    responses are retried with jittered exponential backoff. Concurrent
+    identical lookups can be coalesced into one request.
+    """
+
+    def __init__(self, rate: float = NOTION_REQUESTS_PER_SECOND, burst: int = NOTION_BURST,
+                 max_retries: int = NOTION_MAX_RETRIES):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.burst = max(1, burst)
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+        self._waiting = 0
+        self._in_flight = 0
+        self._completed = deque()
+        self._counters = {"requests": 0, "succeeded": 0, "rate_limited": 0, "server_errors": 0, "failed": 0}
+        self._coalesced = {}
+
+    def _reserve(self) -> float:
+        """Reserve the next start slot and return how long to wait for it"""
+        with self._lock:
+            now = time.monotonic()
+            # Idle time refills up to `burst` slots
+            slot = max(now - (self.burst - 1) * self.interval, self._next_slot)
+            self._next_slot = slot + self.interval
+            self._waiting += 1
+            return max(0.0, slot - now)
+
+    def _pause(self, seconds: float) -> None:
+        """Hold back every queued caller, e.g. after a 429"""
+        with self._lock:
+            self._next_slot = max(self._next_slot, time.monotonic() + seconds)
+
+    def call(self, func, **kwargs):
+        """
+        Run a Notion API method at the scheduled pace, retrying 429 and 5xx
+
+        Args:
+            func: Bound client method, e.g. notion.pages.create
+            **kwargs: Method arguments
+
+        Returns:
+            dict: API response
+        """
+        for attempt in range(self.max_retries + 1):
+            time.sleep(self._reserve())
+            with self._lock:
+                self._waiting -= 1
+                self._in_flight += 1
+                self._counters["requests"] += 1
+            start = time.perf_counter()
+            try:
+                result = func(**kwargs)
+            except Exception as e:
+                status = getattr(e, "status", None)
+                record("notion.call", time.perf_counter() - start, "error", method=_method_name(func), http_status=str(status))
+                retryable = status == 429 or (status or 0) >= 500
+                with self._lock:
+                    if status == 429:
+                        self._counters["rate_limited"] += 1
+                    elif retryable:
+                        self._counters["server_errors"] += 1
+                    if not retryable or attempt == self.max_retries:
+                        self._counters["failed"] += 1
+                if not retryable or attempt == self.max_retries:
+                    raise
+                headers = getattr(e, "headers", None) or {}
+                retry_after = headers.get("retry-after") if status == 429 else None
+                # Full jitter keeps retrying workers from stampeding together
+                delay = float(retry_after) if retry_after else min(2 ** attempt, 30) * random.uniform(0.5, 1.0)
+                if status == 429:
+                    self._pause(delay)
+                print(f"Notion API returned {status}, retrying in {delay:.1f}s")
+                time.sleep(delay * random.uniform(0.0, 0.2) if status == 429 else delay)
+                continue
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+            record("notion.call", time.perf_counter() - start, method=_method_name(func))
+            with self._lock:
+                self._counters["succeeded"] += 1
+                self._completed.append(time.monotonic())
+            return result
+
+    def coalesce(self, key, func, **kwargs):
+        """
+        Like call(), but concurrent calls with the same key share one request
+        """
+        with self._lock:
+            future = self._coalesced.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._coalesced[key] = future
+        if not owner:
+            return future.result()
+        try:
+            future.set_result(self.call(func, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._coalesced.pop(key, None)
+        return future.result()
+
+    def stats(self) -> dict:
+        """
+        Queue depth, in-flight calls, counters and recent throughput (requests/second)
+        """
+        with self._lock:
+            now = time.monotonic()
+            while self._completed and now - self._completed[0] > THROUGHPUT_WINDOW:
+                self._completed.popleft()
+            window = min(THROUGHPUT_WINDOW, now - self._completed[0]) if self._completed else 0.0
+            return dict(
+                self._counters,
+                queue_depth=self._waiting,
+                in_flight=self._in_flight,
+                throughput=len(self._completed) / window if window > 0 else 0.0
+            )
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> NotionScheduler:
+    """
+    Return the process-wide Notion scheduler
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = NotionScheduler()
+        return _scheduler
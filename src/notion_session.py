@@ -0,0 +1,124 @@
+from notion_client import Client
+from notion_client.client import ClientOptions
+import threading
+import time
+import os
+from notion_scheduler import get_scheduler
+
+# Seconds a cached database schema stays valid
+NOTION_SCHEMA_TTL = float(os.getenv('NOTION_SCHEMA_TTL', '600'))
+
+# Properties the uploader writes that may need to be created on the database
+REQUIRED_PROPERTIES = {
+    "Host": {"select": {"options": []}}
+}
+
+def notion_client_options() -> dict:
+    """
+    Client options from the environment (NOTION_BASE_URL points at a stand-in server)
+    """
+    options = {}
+    base_url = os.getenv('NOTION_BASE_URL')
+    if base_url:
+        options["base_url"] = base_url
+    # Retries are handled by the shared scheduler so that 429s pause every worker
+    if "retry" in getattr(ClientOptions, "__dataclass_fields__", {}):
+        options["retry"] = False
+    return options
+
+def notion_call(func, **kwargs):
+    """
+    Call a Notion API method through the shared request scheduler
+
+    Args:
+        func: Bound client method, e.g. notion.blocks.children.append
+        **kwargs: Method arguments
+
+    Returns:
+        dict: API response
+    """
+    return get_scheduler().call(func, **kwargs)
+
+class NotionSession:
+    """
+    One Notion client per integration token, with a per-database schema cache
+    """
+
+    def __init__(self, token: str, schema_ttl: float = NOTION_SCHEMA_TTL):
+        self.client = Client(auth=token, **notion_client_options())
+        self.schema_ttl = schema_ttl
+        self._schemas = {}      # db_id -> (fetched_at, database)
+        self._migrated = set()  # db_ids whose schema migration has run
+        self._lock = threading.Lock()
+        self._migration_lock = threading.Lock()
+
+    def get_schema(self, db_id: str) -> dict:
+        """
+        Return the database object, fetching it when missing or older than the TTL
+        """
+        with self._lock:
+            cached = self._schemas.get(db_id)
+            if cached and time.monotonic() - cached[0] < self.schema_ttl:
+                return cached[1]
+        # Concurrent uploads to the same database share one request
+        database = get_scheduler().coalesce(
+            ("schema", id(self), db_id), self.client.databases.retrieve, database_id=db_id
+        )
+        with self._lock:
+            self._schemas[db_id] = (time.monotonic(), database)
+        return database
+
+    def invalidate(self, db_id: str = None) -> None:
+        """
+        Drop cached schemas (one database, or all when db_id is None)
+
+        The migration is re-checked on the next ensure_schema call.
+        """
+        with self._lock:
+            if db_id is None:
+                self._schemas.clear()
+                self._migrated.clear()
+            else:
+                self._schemas.pop(db_id, None)
+                self._migrated.discard(db_id)
+
+    def ensure_schema(self, db_id: str) -> dict:
+        """
+        Create missing REQUIRED_PROPERTIES on the database, once per run
+
+        Returns:
+            dict: The (possibly updated) database object
+        """
+        if db_id in self._migrated:
+            return self.get_schema(db_id)
+
+        # Concurrent uploads must not race the migration
+        with self._migration_lock:
+            database = self.get_schema(db_id)
+            if db_id in self._migrated:
+                return database
+            properties = database.get("properties", {})
+            missing = {
+                name: spec for name, spec in REQUIRED_PROPERTIES.items()
+                if properties.get(name, {}).get("type") != next(iter(spec))
+            }
+            if missing:
+                database = notion_call(self.client.databases.update, database_id=db_id, properties=missing)
+                with self._lock:
+                    self._schemas[db_id] = (time.monotonic(), database)
+            self._migrated.add(db_id)
+            return database
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def get_session(token: str) -> NotionSession:
+    """
+    Return the shared NotionSession for an integration token
+    """
+    with _sessions_lock:
+        session = _sessions.get(token)
+        if session is None:
+            session = NotionSession(token)
+            _sessions[token] = session
+        return session
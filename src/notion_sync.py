@@ -0,0 +1,303 @@
+from difflib import SequenceMatcher
+import hashlib
+import json
+import threading
+import os
+from notion_session import notion_call
+from notion_blocks import append_blocks, enforce_block_limits
+
+# Local index of uploaded pages: URL -> page ID and the hashes of its blocks
+NOTION_INDEX_PATH = os.getenv('NOTION_INDEX_PATH', 'notion_index.json')
+# Update existing pages instead of creating duplicates
+DEFAULT_UPSERT = os.getenv('NOTION_UPSERT', '1') == '1'
+
+def block_hash(block: dict) -> str:
+    """
+    Content hash of a block, including its nested children
+    """
+    payload = json.dumps(block, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+class PageIndex:
+    """
+    JSON file mapping (database, episode URL) to the uploaded page and its blocks
+
+    Each entry stores the page ID, a hash of the page properties and one
+    {"id", "hash", "type", "has_children"} record per top-level block, so a
+    re-upload can be diffed without querying Notion.
+    """
+
+    def __init__(self, path: str = NOTION_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pages = None
+
+    def _load(self) -> dict:
+        if self._pages is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._pages = json.load(f)
+            except FileNotFoundError:
+                self._pages = {}
+        return self._pages
+
+    def _save(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._pages, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def get(self, db_id: str, url: str) -> dict:
+        with self._lock:
+            return self._load().get(f"{db_id}:{url}")
+
+    def put(self, db_id: str, url: str, entry: dict) -> None:
+        with self._lock:
+            self._load()[f"{db_id}:{url}"] = entry
+            self._save()
+
+    def remove(self, db_id: str, url: str) -> None:
+        with self._lock:
+            if self._load().pop(f"{db_id}:{url}", None) is not None:
+                self._save()
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_page_index() -> PageIndex:
+    """
+    Return the shared page index
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = PageIndex()
+        return _index
+
+def _block_entry(block_id: str, block: dict, digest: str) -> dict:
+    body = block.get(block["type"], {})
+    return {"id": block_id, "hash": digest, "type": block["type"], "has_children": bool(body.get("children"))}
+
+def _partial_entries(ids: list, blocks: list, digests: list) -> list:
+    """
+    Block records for the first batches of an append that did not finish
+
+    A block with nested children gets no hash, since its children may be missing;
+    the next sync then replaces it.
+    """
+    return [
+        _block_entry(block_id, block, None if block.get(block["type"], {}).get("children") else digest)
+        for block_id, block, digest in zip(ids, blocks, digests)
+    ]
+
+def page_exists(notion, page_id: str) -> bool:
+    """
+    Whether a page is still live in Notion (not deleted, archived or in the trash)
+    """
+    try:
+        page = notion_call(notion.pages.retrieve, page_id=page_id)
+    except Exception as e:
+        if getattr(e, "status", None) == 404:
+            return False
+        raise
+    return not page.get("archived") and not page.get("in_trash")
+
+def list_child_ids(notion, block_id: str) -> list:
+    """
+    IDs of all top-level children of a page or block (follows pagination)
+    """
+    ids, cursor = [], None
+    while True:
+        kwargs = {"block_id": block_id, "page_size": 100}
+        if cursor:
+            kwargs["start_cursor"] = cursor
+        response = notion_call(notion.blocks.children.list, **kwargs)
+        ids.extend(block["id"] for block in response["results"])
+        if not response.get("has_more"):
+            return ids
+        cursor = response["next_cursor"]
+
+def sync_blocks(notion, page_id: str, old_entries: list, blocks: list, stats: dict, progress: dict = None) -> list:
+    """
+    Bring a page's top-level blocks from old_entries to blocks with minimal API calls
+
+    Unchanged blocks are kept, changed blocks of the same type are updated in
+    place, and the rest are deleted or inserted at their position.
+
+    Args:
+        notion: Notion client
+        page_id: Page ID
+        old_entries: Block records from the page index
+        blocks: New limit-compliant top-level blocks
+        stats: Dict counting kept/updated/deleted/inserted blocks
+        progress: Optional dict whose "blocks" is set to the page's block records, also when a call fails midway
+
+    Returns:
+        list: Block records for the new page content
+    """
+    digests = [block_hash(block) for block in blocks]
+    matcher = SequenceMatcher(a=[e["hash"] for e in old_entries], b=digests, autojunk=False)
+    entries = []
+    # Old blocks already kept, updated or deleted; the rest are still on the page after entries
+    consumed = 0
+
+    try:
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                entries.extend(old_entries[i1:i2])
+                consumed = i2
+                stats["kept"] += i2 - i1
+                continue
+
+            old_part = old_entries[i1:i2]
+            updated = 0
+            # Pairwise in-place updates where the block type is unchanged
+            while updated < min(len(old_part), j2 - j1):
+                old, block = old_part[updated], blocks[j1 + updated]
+                if old["type"] != block["type"] or old["has_children"] or block[block["type"]].get("children"):
+                    break
+                notion_call(notion.blocks.update, block_id=old["id"], **{block["type"]: block[block["type"]]})
+                entries.append(_block_entry(old["id"], block, digests[j1 + updated]))
+                consumed += 1
+                updated += 1
+                stats["updated"] += 1
+
+            for old in old_part[updated:]:
+                notion_call(notion.blocks.delete, block_id=old["id"])
+                consumed += 1
+                stats["deleted"] += 1
+
+            new_part = blocks[j1 + updated:j2]
+            if new_part:
+                anchor = entries[-1]["id"] if entries else None
+                # Without an anchor, insert at the top unless nothing follows
+                position = {"type": "start"} if not anchor and i2 < len(old_entries) else None
+                ids = []
+                try:
+                    append_blocks(notion, page_id, new_part, after=anchor, position=position, on_batch=ids.extend)
+                except Exception:
+                    # Batches appended before the failure are on the page too
+                    entries.extend(_partial_entries(ids, new_part, digests[j1 + updated:j2]))
+                    raise
+                entries.extend(
+                    _block_entry(block_id, block, digest)
+                    for block_id, block, digest in zip(ids, new_part, digests[j1 + updated:j2])
+                )
+                stats["inserted"] += len(new_part)
+    finally:
+        if progress is not None:
+            progress["blocks"] = entries + old_entries[consumed:]
+
+    return entries
+
+def rewrite_blocks(notion, page_id: str, blocks: list, stats: dict, progress: dict = None) -> list:
+    """
+    Replace all top-level blocks of a page, whatever the index says is on it
+
+    Args:
+        notion: Notion client
+        page_id: Page ID
+        blocks: New limit-compliant top-level blocks
+        stats: Dict counting deleted/inserted blocks
+        progress: Optional dict whose "blocks" is set to the page's block records
+
+    Returns:
+        list: Block records for the new page content
+    """
+    for block_id in list_child_ids(notion, page_id):
+        notion_call(notion.blocks.delete, block_id=block_id)
+        stats["deleted"] += 1
+    digests = [block_hash(block) for block in blocks]
+    ids = []
+
+    def record_batch(batch_ids):
+        ids.extend(batch_ids)
+        if progress is not None:
+            progress["blocks"] = _partial_entries(ids, blocks, digests)
+
+    if progress is not None:
+        progress["blocks"] = []
+    append_blocks(notion, page_id, blocks, on_batch=record_batch)
+    entries = [_block_entry(block_id, block, digest) for block_id, block, digest in zip(ids, blocks, digests)]
+    stats["inserted"] += len(blocks)
+    if progress is not None:
+        progress["blocks"] = entries
+    return entries
+
+def _update_page(notion, state: dict, properties: dict, properties_hash: str, blocks: list, stats: dict) -> None:
+    """Sync an indexed page in place, recording what reached Notion in state"""
+    if state["properties_hash"] != properties_hash:
+        notion_call(notion.pages.update, page_id=state["page_id"], properties=properties)
+        state["properties_hash"] = properties_hash
+    try:
+        sync_blocks(notion, state["page_id"], state["blocks"], blocks, stats, state)
+    except Exception as e:
+        if getattr(e, "status", None) != 404 or not page_exists(notion, state["page_id"]):
+            raise
+        # A block is gone (deleted by hand, or a stale ID from an interrupted sync): rewrite the page body
+        print(f"Notion page {state['page_id']} no longer matches the index, rewriting its content")
+        rewrite_blocks(notion, state["page_id"], blocks, stats, state)
+
+def upsert_page(notion, db_id: str, url: str, properties: dict, blocks: list, index: PageIndex = None) -> dict:
+    """
+    Create or incrementally update the page for an episode URL
+
+    The page is found through the local index (no database query). Only
+    changed properties and blocks are sent; an unchanged episode makes no API calls.
+    A new page is created only when the indexed one no longer exists.
+
+    Args:
+        notion: Notion client
+        db_id: Notion database ID
+        url: Episode URL (the page key)
+        properties: Page properties
+        blocks: Notion block array
+        index: Page index (defaults to the shared one)
+
+    Returns:
+        dict: Sync statistics (page_id, created, kept/updated/deleted/inserted counts)
+    """
+    index = index or get_page_index()
+    blocks = enforce_block_limits(blocks)
+    properties_hash = block_hash(properties)
+    stats = {"created": False, "kept": 0, "updated": 0, "deleted": 0, "inserted": 0}
+    entry = index.get(db_id, url)
+
+    if entry:
+        state = dict(entry)
+        try:
+            _update_page(notion, state, properties, properties_hash, blocks, stats)
+        except Exception as e:
+            if getattr(e, "status", None) != 404 or page_exists(notion, state["page_id"]):
+                raise
+            # Page was deleted in Notion: forget it and create a new one
+            print(f"Indexed Notion page {state['page_id']} no longer exists, recreating")
+            state = None
+            stats = {key: 0 for key in stats}
+        finally:
+            # Keep whatever was synced, so the next run diffs against the page's real content
+            if state is None:
+                index.remove(db_id, url)
+            else:
+                index.put(db_id, url, state)
+        if state is not None:
+            stats["page_id"] = state["page_id"]
+            return stats
+
+    page = notion_call(notion.pages.create, parent={"database_id": db_id}, properties=properties)
+    # Indexed before any content, so a failed append is resumed on this page instead of creating another
+    state = {"page_id": page["id"], "properties_hash": properties_hash, "blocks": []}
+    index.put(db_id, url, state)
+    digests = [block_hash(block) for block in blocks]
+    ids = []
+
+    def record_batch(batch_ids):
+        ids.extend(batch_ids)
+        state["blocks"] = _partial_entries(ids, blocks, digests)
+        index.put(db_id, url, state)
+
+    append_blocks(notion, page["id"], blocks, on_batch=record_batch)
+    state["blocks"] = [_block_entry(block_id, block, digest) for block_id, block, digest in zip(ids, blocks, digests)]
+    index.put(db_id, url, state)
+    stats.update(created=True, inserted=len(blocks), page_id=page["id"])
+    return stats
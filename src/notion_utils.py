@@ -1,82 +1,249 @@
-from notion_client import Client
-import streamlit as st
+import re
+from notion_session import get_session, notion_call
+from notion_blocks import append_blocks
+from notion_sync import upsert_page, DEFAULT_UPSERT
+
+# Inline Markdown tokens: escapes, code spans, emphasis markers, link open/close
+INLINE_TOKEN = re.compile(r'\\([\\`*\[\]()#>_-])|(`+)|(\*+)|(\[)|(\]\(([^()\s]*)\))')
+HEADING_PATTERN = re.compile(r'^(#{1,6})\s+(.*)$')
+BULLET_PATTERN = re.compile(r'^[-*+]\s+(.*)$')
+NUMBERED_PATTERN = re.compile(r'^\d+[.)]\s+(.*)$')
+DIVIDER_PATTERN = re.compile(r'^(?:-{3,}|\*{3,}|_{3,})$')
+FENCE_PATTERN = re.compile(r'^(`{3,}|~{3,})\s*([\w+#-]*)')
+# Languages accepted by Notion code blocks (subset); others become "plain text"
+NOTION_CODE_LANGUAGES = {
+    "bash", "c", "c++", "c#", "css", "go", "html", "java", "javascript", "json",
+    "kotlin", "markdown", "python", "ruby", "rust", "shell", "sql", "swift",
+    "typescript", "yaml", "plain text"
+}
+CODE_LANGUAGE_ALIASES = {"py": "python", "js": "javascript", "ts": "typescript", "sh": "shell", "yml": "yaml", "md": "markdown"}
+
+def _tokenize_inline(text: str) -> list:
+    """
+    Split text into literal runs and marker tokens in one left-to-right scan
+    
+    Returns:
+        list: [kind, value] items; kind is "text", "code", "[" or "]" (value is the URL
+            for "]"), or "*" for a run of asterisks: ["*", length, can_open, can_close]
+    """
+    tokens = []
+    pos = 0
+    # Backtick run lengths known to have no closing run further on
+    unclosed = set()
+    for match in INLINE_TOKEN.finditer(text):
+        start = match.start()
+        if start < pos:
+            continue  # inside a code span consumed below
+        if start > pos:
+            tokens.append(["text", text[pos:start]])
+        escaped, ticks, emphasis, link_open, link_close, url = match.groups()
+        pos = match.end()
+        if escaped:
+            tokens.append(["text", escaped])
+        elif ticks:
+            close = -1 if len(ticks) in unclosed else text.find(ticks, pos)
+            if close == -1:
+                unclosed.add(len(ticks))
+                tokens.append(["text", ticks])
+            else:
+                tokens.append(["code", text[pos:close]])
+                pos = close + len(ticks)
+        elif emphasis:
+            # Flanking: a run followed by whitespace cannot open, one preceded by whitespace cannot close.
+            # CommonMark's punctuation clause is left out so "**重点：**内容" still closes.
+            before = text[start - 1] if start > 0 else " "
+            after = text[pos] if pos < len(text) else " "
+            tokens.append(["*", len(emphasis), not after.isspace(), not before.isspace()])
+        elif link_open:
+            tokens.append(["[", "["])
+        else:
+            tokens.append(["]", url, link_close])
+    if pos < len(text):
+        tokens.append(["text", text[pos:]])
+    return tokens
+
+def _match_delimiters(tokens: list) -> list:
+    """
+    Pair emphasis runs and link brackets with a delimiter stack (CommonMark's algorithm)
+    
+    A closing run takes two asterisks (bold) from the nearest opener when both
+    have two left, else one (italic); asterisks left over stay literal, and
+    emphasis does not cross link brackets. Matched markers get kind
+    "open"/"close"; unmatched ones turn into literal text. Failed searches
+    raise a lower bound per closer type, so each token is pushed and popped
+    at most once and this stays linear.
+    
+    Returns:
+        list: Tokens with runs expanded into open/close markers and literal text
+    """
+    # Token indices of open "[" and of runs with asterisks left that may open
+    stack = []
+    # Stack positions of the "[" entries
+    links = []
+    # (closer can open, closer length % 3) -> stack position below which no opener matches
+    bottom = {}
+    # Token index -> [asterisks left, opened styles (outermost first), closed styles (innermost first)]
+    runs = {}
+
+    def truncate(depth):
+        # Openers above depth can no longer match: their asterisks stay literal
+        del stack[depth:]
+        while links and links[-1] >= depth:
+            links.pop()
+        for key in bottom:
+            bottom[key] = min(bottom[key], depth)
+
+    for index, token in enumerate(tokens):
+        kind = token[0]
+        if kind == "[":
+            links.append(len(stack))
+            stack.append(index)
+        elif kind == "]":
+            if links:
+                depth = links[-1]
+                tokens[stack[depth]][:] = ["open", "link", token[1]]
+                token[:] = ["close", "link"]
+                truncate(depth)
+            else:
+                token[:] = ["text", token[2]]
+        elif kind == "*":
+            _, length, can_open, can_close = token
+            run = runs[index] = [length, [], []]
+            key = (can_open, length % 3)
+            floor = max(bottom.get(key, 0), links[-1] + 1 if links else 0)
+            while can_close and run[0]:
+                depth = len(stack) - 1
+                while depth >= floor:
+                    _, opener_length, _, opener_can_close = tokens[stack[depth]]
+                    # Rule of 3: a run that can both open and close pairs only if the lengths allow it
+                    if not ((opener_can_close or can_open) and (opener_length + length) % 3 == 0
+                            and (opener_length % 3 or length % 3)):
+                        break
+                    depth -= 1
+                if depth < floor:
+                    bottom[key] = len(stack)
+                    break
+                opener = runs[stack[depth]]
+                used = 2 if run[0] >= 2 and opener[0] >= 2 else 1
+                style = "bold" if used == 2 else "italic"
+                opener[1].insert(0, style)
+                run[2].append(style)
+                opener[0] -= used
+                run[0] -= used
+                truncate(depth + 1 if opener[0] else depth)
+            if run[0] and can_open:
+                stack.append(index)
+
+    result = []
+    for index, token in enumerate(tokens):
+        if index in runs:
+            left, opened, closed = runs[index]
+            result.extend(["close", style] for style in closed)
+            if left:
+                result.append(["text", "*" * left])
+            result.extend(["open", style, None] for style in opened)
+        elif token[0] == "[":
+            result.append(["text", "["])
+        else:
+            result.append(token)
+    return result
+
+def _rich_text_item(content: str, bold: int, italic: int, code: bool, link: str) -> dict:
+    item = {"type": "text", "text": {"content": content}}
+    if link:
+        item["text"]["link"] = {"url": link}
+    annotations = {}
+    if bold:
+        annotations["bold"] = True
+    if italic:
+        annotations["italic"] = True
+    if code:
+        annotations["code"] = True
+    if annotations:
+        item["annotations"] = annotations
+    return item
 
 def parse_markdown_text(text: str) -> list:
     """
     Parse Markdown text into Notion rich text format
     
+    Supports **bold**, *italic*, `code`, [links](url) and backslash escapes,
+    including nesting. Unmatched markers are kept as literal text. Runs in
+    linear time: one tokenizing scan plus one delimiter-matching pass.
+    
     Args:
         text: Markdown formatted text
     
     Returns:
         list: Notion rich text array
     """
+    tokens = _match_delimiters(_tokenize_inline(text))
+    
     rich_text = []
-    current_pos = 0
+    bold = italic = 0
+    links = []
+    pending = []
     
-    while current_pos < len(text):
-        # Find next special marker
-        next_bold = text.find('**', current_pos)
-        next_italic = text.find('*', current_pos)
-        next_code = text.find('`', current_pos)
-        
-        # Find the nearest marker
-        next_pos = min(
-            pos for pos in [next_bold, next_italic, next_code] 
-            if pos != -1
-        ) if any(pos != -1 for pos in [next_bold, next_italic, next_code]) else len(text)
-        
-        # Add plain text
-        if next_pos > current_pos:
-            rich_text.append({
-                "type": "text",
-                "text": {"content": text[current_pos:next_pos]}
-            })
-        
-        # Process special markers
-        if next_pos < len(text):
-            if text[next_pos:next_pos+2] == '**':
-                # Bold text
-                end_pos = text.find('**', next_pos + 2)
-                if end_pos != -1:
-                    rich_text.append({
-                        "type": "text",
-                        "text": {"content": text[next_pos+2:end_pos]},
-                        "annotations": {"bold": True}
-                    })
-                    current_pos = end_pos + 2
-                    continue
-            elif text[next_pos] == '*':
-                # Italic text
-                end_pos = text.find('*', next_pos + 1)
-                if end_pos != -1:
-                    rich_text.append({
-                        "type": "text",
-                        "text": {"content": text[next_pos+1:end_pos]},
-                        "annotations": {"italic": True}
-                    })
-                    current_pos = end_pos + 1
-                    continue
-            elif text[next_pos] == '`':
-                # Code text
-                end_pos = text.find('`', next_pos + 1)
-                if end_pos != -1:
-                    rich_text.append({
-                        "type": "text",
-                        "text": {"content": text[next_pos+1:end_pos]},
-                        "annotations": {"code": True}
-                    })
-                    current_pos = end_pos + 1
-                    continue
-        
-        current_pos = next_pos + 1
+    def flush():
+        if pending:
+            rich_text.append(_rich_text_item("".join(pending), bold, italic, False, links[-1] if links else None))
+            pending.clear()
     
+    for token in tokens:
+        kind = token[0]
+        if kind == "text":
+            pending.append(token[1])
+            continue
+        flush()
+        if kind == "code":
+            rich_text.append(_rich_text_item(token[1], bold, italic, True, links[-1] if links else None))
+        elif token[1] == "link":
+            if kind == "open":
+                links.append(token[2])
+            else:
+                links.pop()
+        elif token[1] == "bold":
+            bold += 1 if kind == "open" else -1
+        else:
+            italic += 1 if kind == "open" else -1
+    flush()
     return rich_text
 
+def _text_block(block_type: str, text: str) -> dict:
+    return {
+        "object": "block",
+        "type": block_type,
+        block_type: {
+            "rich_text": parse_markdown_text(text)
+        }
+    }
+
+def _indent_width(line: str) -> int:
+    stripped = line.lstrip(" \t")
+    return len(line[:len(line) - len(stripped)].replace("\t", "    "))
+
+def _code_language(tag: str) -> str:
+    tag = CODE_LANGUAGE_ALIASES.get(tag.lower(), tag.lower())
+    return tag if tag in NOTION_CODE_LANGUAGES else "plain text"
+
+def _code_block(lines: list, language: str) -> dict:
+    return {
+        "object": "block",
+        "type": "code",
+        "code": {
+            "rich_text": [{"type": "text", "text": {"content": "\n".join(lines)}}],
+            "language": language
+        }
+    }
+
 def convert_markdown_to_notion_blocks(analysis: str) -> list:
     """
     Convert Markdown text to Notion block format
     
+    Single pass over the lines. Supports headings, paragraphs, dividers,
+    bulleted and numbered lists (nested by indentation), quotes and fenced
+    code blocks.
+    
     Args:
         analysis: Markdown formatted analysis text
     
@@ -84,163 +251,137 @@ def convert_markdown_to_notion_blocks(analysis: str) -> list:
         list: Notion block array
     """
     blocks = []
-    current_list_items = []
+    # Open list items as (indent, block), innermost last
+    list_stack = []
+    # Pending quote as (indent, lines) and open code fence as (marker, indent, language, lines)
+    quote = None
+    fence = None
     
-    for line in analysis.split('\n'):
-        line = line.strip()
+    def add(block, indent):
+        # Indented content nests under the innermost shallower list item
+        while list_stack and list_stack[-1][0] >= indent:
+            list_stack.pop()
+        if list_stack:
+            parent = list_stack[-1][1]
+            parent[parent["type"]].setdefault("children", []).append(block)
+        else:
+            blocks.append(block)
+    
+    for raw_line in analysis.split('\n'):
+        line = raw_line.strip()
+        
+        # Fenced code blocks are copied verbatim
+        if fence:
+            if line.startswith(fence[0]):
+                add(_code_block(fence[3], fence[2]), fence[1])
+                fence = None
+            else:
+                fence[3].append(raw_line)
+            continue
+        
+        indent = _indent_width(raw_line)
+        
+        # Consecutive quote lines form one quote block
+        if line.startswith('>'):
+            if quote:
+                quote[1].append(line[1:].lstrip())
+            else:
+                quote = (indent, [line[1:].lstrip()])
+            continue
+        if quote:
+            add(_text_block("quote", "\n".join(quote[1])), quote[0])
+            quote = None
+        
         if not line:
-            if current_list_items:
-                # Process accumulated list items
-                blocks.append({
-                    "object": "block",
-                    "type": "bulleted_list_item",
-                    "bulleted_list_item": {
-                        "rich_text": parse_markdown_text(current_list_items[0])
-                    }
-                })
-                for item in current_list_items[1:]:
-                    blocks.append({
-                        "object": "block",
-                        "type": "bulleted_list_item",
-                        "bulleted_list_item": {
-                            "rich_text": parse_markdown_text(item)
-                        }
-                    })
-                current_list_items = []
             continue
-            
-        # Process headings
-        if line.startswith('# '):
-            blocks.append({
-                "object": "block",
-                "type": "heading_1",
-                "heading_1": {
-                    "rich_text": parse_markdown_text(line[2:])
-                }
-            })
-        elif line.startswith('## '):
-            blocks.append({
-                "object": "block",
-                "type": "heading_2",
-                "heading_2": {
-                    "rich_text": parse_markdown_text(line[3:])
-                }
-            })
-        elif line.startswith('### '):
-            blocks.append({
-                "object": "block",
-                "type": "heading_3",
-                "heading_3": {
-                    "rich_text": parse_markdown_text(line[4:])
-                }
-            })
-        # Process divider
-        elif line.strip() == '---':
-            blocks.append({
+        
+        match = FENCE_PATTERN.match(line)
+        if match:
+            fence = (match.group(1), indent, _code_language(match.group(2)), [])
+            continue
+        
+        if DIVIDER_PATTERN.match(line):
+            add({
                 "object": "block",
                 "type": "divider",
                 "divider": {}
-            })
-        # Process list items
-        elif line.startswith('- '):
-            current_list_items.append(line[2:])
-        elif line.startswith('1. '):
-            blocks.append({
-                "object": "block",
-                "type": "numbered_list_item",
-                "numbered_list_item": {
-                    "rich_text": parse_markdown_text(line[3:])
-                }
-            })
-        else:
-            # Process regular paragraphs
-            if current_list_items:
-                # Process any remaining list items first
-                blocks.append({
-                    "object": "block",
-                    "type": "bulleted_list_item",
-                    "bulleted_list_item": {
-                        "rich_text": parse_markdown_text(current_list_items[0])
-                    }
-                })
-                for item in current_list_items[1:]:
-                    blocks.append({
-                        "object": "block",
-                        "type": "bulleted_list_item",
-                        "bulleted_list_item": {
-                            "rich_text": parse_markdown_text(item)
-                        }
-                    })
-                current_list_items = []
-            
+            }, indent)
+            continue
+        
+        match = HEADING_PATTERN.match(line)
+        if match:
+            level = min(len(match.group(1)), 3)
+            add(_text_block(f"heading_{level}", match.group(2)), indent)
+            continue
+        
+        match = BULLET_PATTERN.match(line)
+        list_type = "bulleted_list_item"
+        if not match:
+            match = NUMBERED_PATTERN.match(line)
+            list_type = "numbered_list_item"
+        if match:
+            block = _text_block(list_type, match.group(1))
+            add(block, indent)
+            list_stack.append((indent, block))
+            continue
+        
+        add(_text_block("paragraph", line), indent)
+    
+    # Close a trailing quote or unterminated code fence
+    if quote:
+        add(_text_block("quote", "\n".join(quote[1])), quote[0])
+    if fence:
+        add(_code_block(fence[3], fence[2]), fence[1])
+    
+    return blocks
+
+def convert_sections_to_notion_blocks(sections: dict) -> list:
+    """
+    Convert several named Markdown analyses to Notion blocks, one section each
+    
+    Args:
+        sections: Dict of section title -> Markdown text
+    
+    Returns:
+        list: Notion block array
+    """
+    blocks = []
+    for title, text in sections.items():
+        if blocks:
             blocks.append({
                 "object": "block",
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": parse_markdown_text(line)
-                }
+                "type": "divider",
+                "divider": {}
             })
-    
-    # Process any remaining list items
-    if current_list_items:
         blocks.append({
             "object": "block",
-            "type": "bulleted_list_item",
-            "bulleted_list_item": {
-                "rich_text": parse_markdown_text(current_list_items[0])
+            "type": "heading_1",
+            "heading_1": {
+                "rich_text": [{"type": "text", "text": {"content": title}}]
             }
         })
-        for item in current_list_items[1:]:
-            blocks.append({
-                "object": "block",
-                "type": "bulleted_list_item",
-                "bulleted_list_item": {
-                    "rich_text": parse_markdown_text(item)
-                }
-            })
-    
+        blocks.extend(convert_markdown_to_notion_blocks(text))
     return blocks
 
-def upload_to_notion(analysis: str, podcast_info: dict, notion_token: str, db_id: str) -> bool:
+def upload_to_notion(analysis, podcast_info: dict, notion_token: str, db_id: str, upsert: bool = None) -> bool:
     """
     使用新版 Notion API 上传分析结果
     
     Args:
-        analysis: 分析结果文本（Markdown格式）
+        analysis: 分析结果文本（Markdown格式），或 {章节标题: Markdown文本} 字典
         podcast_info: 播客信息字典，包含 title, host, date, url
         notion_token: Notion API 密钥（以 secret_ 开头）
         db_id: Notion 数据库ID
+        upsert: 按 URL 更新已上传的页面，只同步变化的区块（默认读取 NOTION_UPSERT）
     
     Returns:
         bool: 是否上传成功
     """
     try:
-        # 初始化客户端
-        notion = Client(auth=notion_token)
-        
-        # 获取数据库信息
-        database = notion.databases.retrieve(database_id=db_id)
-        
-        # 检查 Host 字段是否存在
-        host_field = None
-        for prop_name, prop in database["properties"].items():
-            if prop_name == "Host" and prop["type"] == "select":
-                host_field = prop
-                break
-        
-        # 如果 Host 字段不存在，创建它
-        if not host_field:
-            # 更新数据库属性
-            notion.databases.update(
-                database_id=db_id,
-                properties={
-                    "Host": {
-                        "select": {
-                            "options": []
-                        }
-                    }
-                }
-            )
+        # 复用客户端与数据库结构缓存（Host 字段迁移每次运行只执行一次）
+        session = get_session(notion_token)
+        notion = session.client
+        session.ensure_schema(db_id)
         
         # 创建页面属性
         properties = {
@@ -266,23 +407,37 @@ def upload_to_notion(analysis: str, podcast_info: dict, notion_token: str, db_id
             }
         }
         
+        # 转换Markdown为Notion区块
+        if isinstance(analysis, dict):
+            blocks = convert_sections_to_notion_blocks(analysis)
+        else:
+            blocks = convert_markdown_to_notion_blocks(analysis)
+        
+        if DEFAULT_UPSERT if upsert is None else upsert:
+            # 通过本地索引找到已有页面，只追加/更新/删除变化的区块
+            stats = upsert_page(notion, db_id, podcast_info['url'], properties, blocks)
+            print(
+                f"Notion sync {'created' if stats['created'] else 'updated'} page: "
+                f"{stats['kept']} kept, {stats['updated']} updated, "
+                f"{stats['deleted']} deleted, {stats['inserted']} inserted"
+            )
+            return True
+        
         # 创建基础页面
-        new_page = notion.pages.create(
+        new_page = notion_call(
+            notion.pages.create,
             parent={"database_id": db_id},
             properties=properties
         )
         
-        # 转换Markdown为Notion区块
-        blocks = convert_markdown_to_notion_blocks(analysis)
-        
-        # 批量添加内容区块
-        notion.blocks.children.append(
-            block_id=new_page["id"],
-            children=blocks
-        )
+        # 分批添加内容区块（每次最多 100 个）
+        append_blocks(notion, new_page["id"], blocks)
         
         return True
     except Exception as e:
+        # 数据库结构可能已在别处修改，下次上传时重新获取
+        get_session(notion_token).invalidate(db_id)
         error_detail = getattr(e, "body", str(e))
+        import streamlit as st
         st.error(f"Notion 上传失败：{error_detail}")
         return False 
\ No newline at end of file
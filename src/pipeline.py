@@ -0,0 +1,192 @@
+from queue import Queue
+import threading
+import time
+from metrics import span
+from profiler import profiled
+
+# Marks the end of a stage's input
+_DONE = object()
+
+class RetryLater(Exception):
+    """
+    Raised by a stage function to run the same item through the stage again after delay seconds
+
+    The item is requeued from a timer, so no worker thread is held during the backoff.
+    """
+
+    def __init__(self, delay: float, message: str = ""):
+        super().__init__(message)
+        self.delay = delay
+
+class Stage:
+    """
+    One pipeline stage: a function run by a fixed number of worker threads
+
+    Args:
+        name: Stage name used in reports
+        func: Called with the item from the previous stage; returns the item
+              for the next stage, or None to drop it
+        workers: Number of worker threads
+        queue_size: Capacity of this stage's input queue (defaults to workers).
+                    A full queue blocks the previous stage (backpressure).
+    """
+
+    def __init__(self, name: str, func, workers: int = 1, queue_size: int = None):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size or self.workers)
+
+def run_pipeline(items, stages: list, on_result=None) -> tuple:
+    """
+    Push items through the stages, each stage running concurrently with the others
+
+    Items flow through bounded queues, so while episode N is transcribed,
+    N+1 can download and N-1 can be analyzed and uploaded, and no stage gets
+    more than its queue size ahead of the next one. An item whose stage raises
+    RetryLater re-enters that stage after the delay; the stage keeps running
+    until all such items have finished.
+
+    Args:
+        items: Pipeline inputs (any iterable; it is consumed only as the first stage has room)
+        stages: List of Stage, in order
+        on_result: Optional callable(index, output) run when an item leaves the
+                   pipeline, with output None if it was dropped or failed. Outputs
+                   are then not kept, so long-running feeds use constant memory.
+
+    Returns:
+        tuple: (results in input order with None for dropped/failed items, or an
+               empty list when on_result is given; stats dict)
+    """
+    queues = [Queue(maxsize=stage.queue_size) for stage in stages]
+    results = {}
+    completed = 0
+    lock = threading.Lock()
+    stats = {
+        stage.name: {
+            "workers": stage.workers, "processed": 0, "dropped": 0, "failed": 0, "retried": 0,
+            "busy": 0.0, "blocked": 0.0
+        }
+        for stage in stages
+    }
+    remaining = [stage.workers for stage in stages]
+    # Per stage: whether the previous stage has finished, and items handed to it
+    # (queued, running or waiting for a retry) that have no final outcome yet
+    upstream_done = [False] * len(stages)
+    in_flight = [0] * len(stages)
+    closed = [False] * len(stages)
+
+    def send(i, index, item):
+        # Counted before the put, so the stage cannot close while the item is on its way
+        with lock:
+            in_flight[i] += 1
+        queues[i].put((index, item))
+
+    def close_input(i):
+        # A stage's input ends once the previous stage is done and every item it was handed has finished
+        with lock:
+            if closed[i] or not upstream_done[i] or in_flight[i]:
+                return
+            closed[i] = True
+        for _ in range(stages[i].workers):
+            queues[i].put(_DONE)
+
+    def worker(i):
+        nonlocal completed
+        stage, stage_stats = stages[i], stats[stages[i].name]
+        next_queue = queues[i + 1] if i + 1 < len(stages) else None
+        while True:
+            entry = queues[i].get()
+            if entry is _DONE:
+                break
+            index, item = entry
+            start = time.perf_counter()
+            try:
+                with span(f"stage.{stage.name}"), profiled(stage.name, item):
+                    output = stage.func(item)
+            except RetryLater as e:
+                with lock:
+                    stage_stats["retried"] += 1
+                    stage_stats["busy"] += time.perf_counter() - start
+                # The item stays in flight, so the stage stays open until the retry has run
+                timer = threading.Timer(e.delay, queues[i].put, args=((index, item),))
+                timer.daemon = True
+                timer.start()
+                continue
+            except Exception as e:
+                print(f"Stage {stage.name} failed: {str(e)}")
+                output, outcome = None, "failed"
+            else:
+                outcome = "processed" if output is not None else "dropped"
+            busy = time.perf_counter() - start
+            with lock:
+                stage_stats[outcome] += 1
+                stage_stats["busy"] += busy
+            if output is None or next_queue is None:
+                if output is not None:
+                    with lock:
+                        completed += 1
+                        if not on_result:
+                            results[index] = output
+                if on_result:
+                    on_result(index, output)
+            else:
+                start = time.perf_counter()
+                send(i + 1, index, output)
+                with lock:
+                    stage_stats["blocked"] += time.perf_counter() - start
+            with lock:
+                in_flight[i] -= 1
+            close_input(i)
+        # The last worker of a stage closes the next stage's input
+        with lock:
+            remaining[i] -= 1
+            last = remaining[i] == 0
+        if last and next_queue is not None:
+            with lock:
+                upstream_done[i + 1] = True
+            close_input(i + 1)
+
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=worker, args=(i,), name=f"pipeline-{stage.name}-{n}", daemon=True)
+        for i, stage in enumerate(stages)
+        for n in range(stage.workers)
+    ]
+    for thread in threads:
+        thread.start()
+    count = 0
+    for index, item in enumerate(items):
+        send(0, index, item)
+        count += 1
+    with lock:
+        upstream_done[0] = True
+    close_input(0)
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    results = [] if on_result else [results.get(index) for index in range(count)]
+    for stage_stats in stats.values():
+        stage_stats["utilization"] = stage_stats["busy"] / (stage_stats["workers"] * elapsed) if elapsed else 0.0
+    return results, {
+        "stages": stats,
+        "elapsed": elapsed,
+        "completed": completed,
+        "per_hour": completed * 3600 / elapsed if elapsed else 0.0
+    }
+
+def format_pipeline_stats(stats: dict) -> str:
+    """
+    Render run_pipeline stats as a small table
+    """
+    lines = [f"{'stage':<12} {'workers':>7} {'done':>5} {'failed':>6} {'busy s':>8} {'blocked s':>9} {'util':>6}"]
+    for name, s in stats["stages"].items():
+        lines.append(
+            f"{name:<12} {s['workers']:>7} {s['processed']:>5} {s['failed'] + s['dropped']:>6} "
+            f"{s['busy']:>8.1f} {s['blocked']:>9.1f} {s['utilization']:>6.0%}"
+        )
+    lines.append(
+        f"{stats['completed']} episodes in {stats['elapsed']:.1f}s ({stats['per_hour']:.1f} episodes/hour)"
+    )
+    return "\n".join(lines)
@@ -0,0 +1,334 @@
+import json
+import re
+import subprocess
+import sys
+import threading
+import time
+import os
+from collections import Counter
+try:
+    import resource
+except ImportError:
+    # Windows: child process CPU time is not reported
+    resource = None
+
+# Sample every thread's stack during batch runs and CLI transcriptions (1 = on; or pass --profile)
+PROFILE = os.getenv('PROFILE', '0') == '1'
+# Per-run output directory (collapsed stacks per episode, speedscope file, summary) is created here
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+# Milliseconds between samples
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '10'))
+# Hot functions listed per stage in the summary
+PROFILE_TOP = int(os.getenv('PROFILE_TOP', '8'))
+
+# Frames from this directory are the repo's own code
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+UNATTRIBUTED = "(unattributed)"
+
+class _NullContext:
+    """Shared do-nothing context returned while profiling is off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_CONTEXT = _NullContext()
+
+class _Context:
+    __slots__ = ("profiler", "stage", "episode", "previous")
+
+    def __init__(self, profiler, stage: str, episode: str):
+        self.profiler = profiler
+        self.stage = stage
+        self.episode = episode
+        self.previous = None
+
+    def __enter__(self):
+        ident = threading.get_ident()
+        self.previous = self.profiler._contexts.get(ident)
+        self.profiler._contexts[ident] = (self.stage, self.episode)
+        return self
+
+    def __exit__(self, *exc):
+        ident = threading.get_ident()
+        if self.previous is None:
+            self.profiler._contexts.pop(ident, None)
+        else:
+            self.profiler._contexts[ident] = self.previous
+        return False
+
+class _TimedPopen(subprocess.Popen):
+    """Popen that reports each child's wall time to the profiler, attributed to the caller's stage"""
+
+    def __init__(self, *args, **kwargs):
+        command = args[0] if args else kwargs.get("args")
+        if isinstance(command, (list, tuple)):
+            command = command[0] if command else ""
+        self._profile_command = os.path.basename(str(command).split()[0]) if command else "?"
+        self._profile_context = _profiler._contexts.get(threading.get_ident()) if _profiler else None
+        self._profile_started = time.perf_counter()
+        self._profile_recorded = False
+        super().__init__(*args, **kwargs)
+
+    def _profile_finished(self):
+        if not self._profile_recorded and _profiler is not None:
+            self._profile_recorded = True
+            _profiler.record_subprocess(
+                self._profile_command, self._profile_context, time.perf_counter() - self._profile_started
+            )
+
+    def wait(self, timeout=None):
+        returncode = super().wait(timeout)
+        self._profile_finished()
+        return returncode
+
+    def poll(self):
+        returncode = super().poll()
+        if returncode is not None:
+            self._profile_finished()
+        return returncode
+
+def _children_cpu_seconds() -> float:
+    """CPU time used so far by finished child processes (0 where it is not available)"""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def _thread_label(name: str) -> str:
+    """Thread name without its worker number (pipeline-transcribe-1 -> pipeline-transcribe)"""
+    return re.sub(r"[-_]\d+(_\d+)?$", "", name) or name
+
+def _slug(episode: str) -> str:
+    tail = episode.rstrip("/").rsplit("/", 1)[-1] or episode
+    return re.sub(r"[^\w.-]+", "_", tail)[:80]
+
+class SamplingProfiler:
+    """
+    Wall-clock sampler of every thread's Python stack, attributed to stage and episode
+
+    Pipeline workers tag their thread with (stage, episode) while they run an
+    item, so samples of a thread waiting on Selenium, a socket, a subprocess or
+    the CTranslate2 decoder (which releases the GIL) are charged to that
+    episode's stage. Untagged threads (event loop, schedulers, idle workers)
+    are kept under "(unattributed)" by thread name. Child processes started
+    through subprocess are timed per command and stage.
+    """
+
+    def __init__(self, output_dir: str = PROFILE_DIR, interval: float = PROFILE_INTERVAL_MS / 1000):
+        self.output_dir = output_dir
+        self.interval = interval
+        self._contexts = {}
+        self._lock = threading.Lock()
+        # episode -> Counter of (thread/stage label, stage, frame keys) -> samples
+        self._stacks = {}
+        self._frames = {}
+        self._subprocesses = Counter()
+        self._subprocess_seconds = Counter()
+        self._samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = 0.0
+        self._elapsed = 0.0
+        self._children_cpu = 0.0
+        self._original_popen = None
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        self._children_cpu = _children_cpu_seconds()
+        self._original_popen = subprocess.Popen
+        subprocess.Popen = _TimedPopen
+        self._thread = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+        self._thread.start()
+
+    def context(self, stage: str, item) -> _Context:
+        """Tag the calling thread with a stage and episode (URL, Episode or file path)"""
+        episode = item if isinstance(item, str) else getattr(item, "source_url", None) or str(item)
+        return _Context(self, stage, episode)
+
+    def record_subprocess(self, command: str, context: tuple, seconds: float) -> None:
+        stage = context[0] if context else UNATTRIBUTED
+        with self._lock:
+            self._subprocesses[(stage, command)] += 1
+            self._subprocess_seconds[(stage, command)] += seconds
+
+    def _frame_key(self, code) -> tuple:
+        key = self._frames.get(code)
+        if key is None:
+            key = (code.co_name, code.co_filename, code.co_firstlineno)
+            self._frames[code] = key
+        return key
+
+    def _sample_loop(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            frames = sys._current_frames()
+            sample = []
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_key(frame.f_code))
+                    frame = frame.f_back
+                stack.reverse()
+                context = self._contexts.get(ident)
+                if context:
+                    stage, episode = context
+                    label = stage
+                else:
+                    stage, episode = None, UNATTRIBUTED
+                    label = _thread_label(names.get(ident, str(ident)))
+                sample.append((episode, (label, stage, tuple(stack))))
+            with self._lock:
+                self._samples += 1
+                for episode, key in sample:
+                    self._stacks.setdefault(episode, Counter())[key] += 1
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        subprocess.Popen = self._original_popen
+        self._elapsed = time.perf_counter() - self._started
+        self._children_cpu = _children_cpu_seconds() - self._children_cpu
+
+    @property
+    def sample_seconds(self) -> float:
+        """Wall time one sample stands for (the sampler falls behind its interval under load)"""
+        return self._elapsed / self._samples if self._samples else self.interval
+
+    @staticmethod
+    def _label(frame: tuple) -> str:
+        name, filename, line = frame
+        return f"{name} ({os.path.basename(filename)}:{line})"
+
+    def hot_functions(self) -> dict:
+        """
+        Per stage: samples, and the top functions by self time with their nearest repo caller
+
+        Returns:
+            dict: stage -> {"seconds", "functions": [(label, via, seconds, share)]}
+        """
+        per_stage = {}
+        with self._lock:
+            for counter in self._stacks.values():
+                for (label, stage, stack), count in counter.items():
+                    if stage is None or not stack:
+                        continue
+                    entry = per_stage.setdefault(stage, {"samples": 0, "self": Counter()})
+                    entry["samples"] += count
+                    via = next((f for f in reversed(stack[:-1]) if f[1].startswith(SRC_DIR) and f[1] != __file__), None)
+                    entry["self"][(stack[-1], via)] += count
+        result = {}
+        for stage, entry in per_stage.items():
+            result[stage] = {
+                "seconds": entry["samples"] * self.sample_seconds,
+                "functions": [
+                    (self._label(leaf), self._label(via) if via and via != leaf else "",
+                     count * self.sample_seconds, count / entry["samples"])
+                    for (leaf, via), count in entry["self"].most_common(PROFILE_TOP)
+                ]
+            }
+        return result
+
+    def summary(self) -> str:
+        """Hot functions per stage and subprocess time, as text"""
+        lines = [f"Profile: {self._samples} samples over {self._elapsed:.1f}s "
+                 f"({self.sample_seconds * 1000:.1f} ms/sample)"
+                 + (f", child CPU {self._children_cpu:.1f}s" if resource is not None else "")]
+        for stage, entry in sorted(self.hot_functions().items(), key=lambda item: -item[1]["seconds"]):
+            lines.append(f"\n[{stage}] {entry['seconds']:.1f} thread-seconds")
+            for label, via, seconds, share in entry["functions"]:
+                lines.append(f"  {share:>5.1%} {seconds:>8.2f}s  {label}" + (f"  via {via}" if via else ""))
+        if self._subprocesses:
+            lines.append(f"\n{'subprocess':<28} {'stage':<14} {'count':>5} {'wall s':>8}")
+            for (stage, command), count in sorted(self._subprocesses.items(), key=lambda item: -self._subprocess_seconds[item[0]]):
+                lines.append(f"{command:<28} {stage:<14} {count:>5} {self._subprocess_seconds[(stage, command)]:>8.2f}")
+        return "\n".join(lines)
+
+    def write(self) -> str:
+        """
+        Write collapsed stacks per episode, one speedscope file and the summary
+
+        Returns:
+            str: Output directory
+        """
+        run_dir = os.path.join(self.output_dir, time.strftime("%Y%m%d-%H%M%S"))
+        os.makedirs(run_dir, exist_ok=True)
+        frame_index, frames, profiles, used = {}, [], [], set()
+        weight = self.sample_seconds * 1000
+        with self._lock:
+            stacks = {episode: dict(counter) for episode, counter in self._stacks.items()}
+        for episode, counter in sorted(stacks.items(), key=lambda item: item[0] == UNATTRIBUTED):
+            slug = _slug(episode)
+            while slug in used:
+                slug += "_"
+            used.add(slug)
+            # Collapsed stacks (flamegraph.pl / speedscope / inferno): root frame is the stage or thread
+            with open(os.path.join(run_dir, f"{slug}.collapsed"), "w", encoding="utf-8") as f:
+                for (label, stage, stack), count in sorted(counter.items(), key=lambda item: -item[1]):
+                    f.write(";".join([label] + [self._label(frame) for frame in stack]) + f" {count}\n")
+            samples, weights = [], []
+            for (label, stage, stack), count in counter.items():
+                indices = []
+                for frame in ((label, "", 0),) + stack:
+                    if frame not in frame_index:
+                        frame_index[frame] = len(frames)
+                        frames.append({"name": frame[0], "file": frame[1], "line": frame[2]} if frame[1] else {"name": frame[0]})
+                    indices.append(frame_index[frame])
+                samples.append(indices)
+                weights.append(count * weight)
+            profiles.append({
+                "type": "sampled", "name": episode, "unit": "milliseconds",
+                "startValue": 0, "endValue": sum(weights), "samples": samples, "weights": weights
+            })
+        with open(os.path.join(run_dir, "profile.speedscope.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "$schema": "https://www.speedscope.app/file-format-schema.json",
+                "shared": {"frames": frames}, "profiles": profiles,
+                "name": f"auto_process {time.strftime('%Y-%m-%d %H:%M:%S')}", "exporter": "profiler.py"
+            }, f)
+        with open(os.path.join(run_dir, "summary.txt"), "w", encoding="utf-8") as f:
+            f.write(self.summary() + "\n")
+        return run_dir
+
+_profiler = None
+
+def start_profiling(enabled: bool = PROFILE) -> SamplingProfiler:
+    """
+    Start the process-wide sampler if enabled (flag or PROFILE=1)
+
+    Returns:
+        SamplingProfiler: The running profiler, or None when profiling is off
+    """
+    global _profiler
+    if enabled and _profiler is None:
+        _profiler = SamplingProfiler()
+        _profiler.start()
+        print(f"Profiling every {_profiler.interval * 1000:.0f} ms into {_profiler.output_dir}/")
+    return _profiler
+
+def stop_profiling() -> None:
+    """Stop the sampler, write its output and print the hot-path summary (no-op when off)"""
+    global _profiler
+    if _profiler is None:
+        return
+    profiler, _profiler = _profiler, None
+    profiler.stop()
+    run_dir = profiler.write()
+    print("\n" + profiler.summary())
+    print(f"Profiles written to {run_dir} (open profile.speedscope.json at https://www.speedscope.app)")
+
+def profiled(stage: str, item):
+    """
+    Attribute the calling thread's samples to a stage and episode while in the with block
+
+    Returns a shared no-op object while profiling is off.
+    """
+    return _profiler.context(stage, item) if _profiler is not None else _NULL_CONTEXT
@@ -0,0 +1,115 @@
+import math
+import os
+
+# Intra-op threads per Whisper model beyond which extra cores help little
+WHISPER_THREADS_PER_WORKER = int(os.getenv('WHISPER_THREADS_PER_WORKER', '4'))
+
+def _cgroup_cpu_limit() -> float:
+    """
+    CPU quota from cgroup v2 (cpu.max) or v1 (cfs quota/period), or None if unlimited
+    """
+    try:
+        with open('/sys/fs/cgroup/cpu.max', 'r') as f:
+            quota, period = f.read().split()[:2]
+        return None if quota == 'max' else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us', 'r') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us', 'r') as f:
+            period = int(f.read())
+        return None if quota <= 0 else quota / period
+    except (OSError, ValueError):
+        return None
+
+def available_cpus() -> int:
+    """
+    Cores this process may actually use: CPU affinity capped by the cgroup quota
+
+    CPU_BUDGET overrides the detected value.
+    """
+    if os.getenv('CPU_BUDGET'):
+        return max(1, int(os.getenv('CPU_BUDGET')))
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit()
+    if limit:
+        cpus = min(cpus, max(1, math.ceil(limit)))
+    return max(1, cpus)
+
+def plan_threads(mode: str = 'batch', cpus: int = None) -> dict:
+    """
+    Split the CPU budget between Whisper threads, transcription workers and I/O stages
+
+    Args:
+        mode: 'batch' (auto_process pipeline), 'ui' (Streamlit) or 'cli' (one file)
+        cpus: Core budget (defaults to available_cpus())
+
+    Returns:
+        dict: cpus, transcribe_workers, cpu_threads (per model) and io_workers.
+              WHISPER_CPU_THREADS, PIPELINE_TRANSCRIBE_WORKERS and
+              PIPELINE_DOWNLOAD_WORKERS override the computed values.
+    """
+    cpus = cpus or available_cpus()
+    if mode == 'batch':
+        # Keep a core for download/analysis/upload threads once there are enough of them
+        usable = cpus - 1 if cpus >= 4 else cpus
+        workers = max(1, round(usable / WHISPER_THREADS_PER_WORKER))
+        io_workers = 2
+    else:
+        # One transcription at a time gets every core
+        usable, workers, io_workers = cpus, 1, 1
+
+    workers = int(os.getenv('PIPELINE_TRANSCRIBE_WORKERS') or workers)
+    return {
+        'mode': mode,
+        'cpus': cpus,
+        'transcribe_workers': workers,
+        'cpu_threads': int(os.getenv('WHISPER_CPU_THREADS') or max(1, usable // workers)),
+        'io_workers': int(os.getenv('PIPELINE_DOWNLOAD_WORKERS') or io_workers)
+    }
+
+_plan = None
+
+def configure_threads(mode: str = 'batch', verbose: bool = False) -> dict:
+    """
+    Compute the thread plan once and export it to OpenMP/BLAS
+
+    Must run before torch/ctranslate2 are imported. An explicit OMP_NUM_THREADS
+    in the environment is left untouched. Silent by default, since it runs on import.
+
+    Args:
+        mode: See plan_threads
+        verbose: Print the plan when it is computed by this call
+
+    Returns:
+        dict: The thread plan
+    """
+    global _plan
+    if _plan is None:
+        _plan = plan_threads(mode)
+        # Resolve OpenMP duplicate loading issue
+        os.environ.setdefault('KMP_DUPLICATE_LIB_OK', 'TRUE')
+        os.environ.setdefault('OMP_NUM_THREADS', str(_plan['cpu_threads']))
+        if verbose:
+            print_thread_plan()
+    return _plan
+
+def print_thread_plan() -> None:
+    """
+    Log the active thread plan (from entry points, not on import)
+    """
+    plan = get_thread_plan()
+    print(
+        f"CPU plan ({plan['mode']}): {plan['cpus']} cores -> {plan['transcribe_workers']} transcription "
+        f"worker(s) x {plan['cpu_threads']} threads, {plan['io_workers']} I/O worker(s)"
+    )
+
+def get_thread_plan() -> dict:
+    """
+    Return the active thread plan, configuring a single-job plan if none was set
+    """
+    return _plan or configure_threads('cli')
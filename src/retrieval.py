@@ -0,0 +1,146 @@
+import os
+import re
+import time
+
+import numpy as np
+
+from compact import (
+    clean_segments, estimate_tokens, format_paragraphs, merge_segments, parse_transcript, tokenize
+)
+
+# Transcript chunking for the index
+CHUNK_CHARS = int(os.getenv('RETRIEVAL_CHUNK_CHARS', '400'))
+# Passages kept per shownotes section
+TOP_K = int(os.getenv('RETRIEVAL_TOP_K', '3'))
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Shownotes decorations: timestamps, bullets, numbering, markdown heading marks
+SECTION_PREFIX = re.compile(r'^\s*(?:#+\s*|[-*•·]\s*|\d+[.、)]\s*|\(?\d{1,2}:\d{2}(?::\d{2})?\)?\s*)+')
+URL_PATTERN = re.compile(r'https?://\S+')
+
+class BM25Index:
+    """
+    In-memory BM25 index over transcript chunks, stored as sorted postings arrays
+    """
+
+    def __init__(self, documents: list):
+        vocabulary = {}
+        doc_ids, term_ids = [], []
+        lengths = np.zeros(len(documents), dtype=np.float32)
+
+        for doc_id, text in enumerate(documents):
+            tokens = tokenize(text)
+            lengths[doc_id] = len(tokens)
+            for token in tokens:
+                doc_ids.append(doc_id)
+                term_ids.append(vocabulary.setdefault(token, len(vocabulary)))
+
+        self.vocabulary = vocabulary
+        self.num_docs = len(documents)
+
+        # Collapse (term, doc) pairs into postings with term frequencies
+        pairs = np.array(term_ids, dtype=np.int64) * max(self.num_docs, 1) + np.array(doc_ids, dtype=np.int64)
+        pairs, tf = np.unique(pairs, return_counts=True)
+        self.post_terms = pairs // max(self.num_docs, 1)
+        self.post_docs = pairs % max(self.num_docs, 1)
+
+        df = np.bincount(self.post_terms, minlength=len(vocabulary)).astype(np.float32)
+        self.idf = np.log1p((self.num_docs - df + 0.5) / (df + 0.5))
+
+        avg_length = lengths.mean() if self.num_docs else 1.0
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(avg_length, 1e-6))
+        tf = tf.astype(np.float32)
+        self.post_weights = tf * (BM25_K1 + 1) / (tf + norm[self.post_docs])
+
+    def search(self, query: str, top_k: int = TOP_K) -> list:
+        """
+        Return up to top_k (doc_id, score) pairs for the query, best first
+        """
+        term_ids = np.array(
+            sorted({self.vocabulary[t] for t in tokenize(query) if t in self.vocabulary}),
+            dtype=np.int64
+        )
+        if not len(term_ids) or not self.num_docs:
+            return []
+
+        starts = np.searchsorted(self.post_terms, term_ids, side='left')
+        ends = np.searchsorted(self.post_terms, term_ids, side='right')
+        positions = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        np.add.at(scores, self.post_docs[positions], self.post_weights[positions] * self.idf[self.post_terms[positions]])
+
+        top = np.argsort(-scores)[:top_k]
+        return [(int(i), float(scores[i])) for i in top if scores[i] > 0]
+
+def extract_sections(shownotes: str) -> list:
+    """
+    Extract section headings from shownotes
+
+    Each non-trivial line is treated as a heading after stripping timestamps,
+    bullets and numbering; URLs and very short lines are skipped.
+    """
+    sections = []
+    for line in shownotes.splitlines():
+        line = SECTION_PREFIX.sub('', URL_PATTERN.sub('', line)).strip()
+        if len(tokenize(line)) >= 2 and line not in sections:
+            sections.append(line)
+    return sections
+
+def chunk_segments(segments: list, chunk_chars: int = CHUNK_CHARS) -> list:
+    """
+    Group cleaned segments into chunks of about chunk_chars characters
+
+    Returns:
+        list: Lists of segment indices, one per chunk
+    """
+    chunks, current, length = [], [], 0
+    for i, (_, text) in enumerate(segments):
+        current.append(i)
+        length += len(text)
+        if length >= chunk_chars:
+            chunks.append(current)
+            current, length = [], 0
+    if current:
+        chunks.append(current)
+    return chunks
+
+def build_section_context(transcript: str, shownotes: str, top_k: int = TOP_K) -> tuple:
+    """
+    Build a per-section transcript context from the passages most relevant to each shownotes heading
+
+    Args:
+        transcript: Raw txt/srt transcript
+        shownotes: Podcast shownotes
+        top_k: Passages kept per section
+
+    Returns:
+        tuple: (context_text, stats), or (None, stats) when shownotes have no usable sections
+    """
+    start_time = time.perf_counter()
+    sections = extract_sections(shownotes or "")
+    stats = {"input_tokens": estimate_tokens(transcript), "sections": len(sections)}
+    if not sections:
+        return None, stats
+
+    segments = clean_segments(parse_transcript(transcript))
+    chunks = chunk_segments(segments)
+    index = BM25Index(['\n'.join(segments[i][1] for i in chunk) for chunk in chunks])
+
+    parts = []
+    for section in sections:
+        hits = sorted(doc_id for doc_id, _ in index.search(section, top_k))
+        if not hits:
+            continue
+        kept = [i for doc_id in hits for i in chunks[doc_id]]
+        parts.append(f"## {section}\n{format_paragraphs(merge_segments(segments, kept))}")
+
+    context = "\n\n".join(parts)
+    stats.update({
+        "output_tokens": estimate_tokens(context),
+        "retrieval_seconds": time.perf_counter() - start_time
+    })
+    stats["ratio"] = stats["output_tokens"] / stats["input_tokens"] if stats["input_tokens"] else 1.0
+    return (context or None), stats
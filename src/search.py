@@ -0,0 +1,320 @@
+import argparse
+import re
+import sqlite3
+import threading
+import time
+import os
+from compact import parse_timed_transcript, tokenize
+from storage import TRANSCRIPT_DIR, read_transcript
+from word_timestamps import WordTimestamps, words_path
+
+# SQLite FTS5 index of transcript segments (rebuilt incrementally from transcript_files)
+SEARCH_INDEX_PATH = os.getenv('SEARCH_INDEX_PATH', 'search.db')
+SEARCH_LIMIT = int(os.getenv('SEARCH_LIMIT', '20'))
+
+TRANSCRIPT_EXTENSIONS = (".txt", ".srt")
+
+# Segments carry their CJK bigram / latin word tokens in the FTS table; the
+# original text and timestamps live in a plain table joined on rowid.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS episodes (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,     -- transcript path without .gz
+    title TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    segments INTEGER NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    episode_id INTEGER NOT NULL,
+    start REAL,                    -- NULL for plain text transcripts
+    end REAL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segments_episode ON segments (episode_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(tokens, tokenize = 'unicode61');
+"""
+
+def build_match_query(query: str) -> str:
+    """
+    FTS5 MATCH expression: every whitespace-separated term must occur as a phrase of its tokens
+
+    A single CJK character matches bigrams starting with it.
+    """
+    phrases = []
+    for term in query.split():
+        tokens = tokenize(term)
+        if not tokens:
+            continue
+        if len(tokens) == 1 and not tokens[0].isascii() and len(tokens[0]) == 1:
+            phrases.append(f'"{tokens[0]}"*')
+        else:
+            phrases.append('"' + " ".join(tokens) + '"')
+    return " AND ".join(phrases)
+
+def highlight(text: str, query: str, before: str = "**", after: str = "**") -> str:
+    """Wrap occurrences of the query terms in text"""
+    terms = sorted({term for term in query.split() if tokenize(term)}, key=len, reverse=True)
+    if not terms:
+        return text
+    # Adjacent matches are wrapped as one run
+    pattern = re.compile("(?:" + "|".join(re.escape(term) for term in terms) + ")+", re.IGNORECASE)
+    return pattern.sub(lambda m: f"{before}{m.group(0)}{after}", text)
+
+def format_offset(seconds: float) -> str:
+    """Seconds as H:MM:SS (or "-" for untimed segments)"""
+    if seconds is None:
+        return "-"
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+def transcript_segments(transcript) -> list:
+    """(start, end, text) rows from a stages.Transcript or txt/srt text"""
+    if isinstance(transcript, str):
+        return parse_timed_transcript(transcript)
+    return [(segment.start, segment.end, segment.text.strip()) for segment in transcript.segments]
+
+def file_segments(path: str, content: str) -> list:
+    """
+    (start, end, text) rows of a transcript file
+
+    Plain text files carry no times; they are taken from the transcript's
+    .words sidecar when there is one that matches it line for line.
+    """
+    rows = transcript_segments(content)
+    sidecar = words_path(path)
+    if not rows or rows[0][0] is not None or not os.path.exists(sidecar):
+        return rows
+    # txt output has one line per recognized segment, the sidecar one word range per segment
+    lines = content.split("\n")
+    try:
+        with WordTimestamps(sidecar) as words:
+            if words.segment_count != len(lines):
+                return rows
+            timed = []
+            for i, line in enumerate(lines):
+                if not line.strip():
+                    continue
+                first, last = words.segment_words(i)
+                if first < last:
+                    timed.append((words.word(first).start, words.word(last - 1).end, line.strip()))
+                else:
+                    timed.append((None, None, line.strip()))
+            return timed
+    except (OSError, ValueError) as e:
+        print(f"Ignoring word timestamps of {path}: {str(e)}")
+        return rows
+
+class SearchIndex:
+    """
+    Full-text index over all transcripts with per-segment timestamps
+    """
+
+    def __init__(self, path: str = SEARCH_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def add(self, path: str, transcript, mtime: float = None) -> int:
+        """
+        Index (or re-index) one transcript
+
+        Args:
+            path: Transcript file path (the key; .gz suffix is ignored)
+            transcript: stages.Transcript (keeps timestamps of txt output), txt/srt text,
+                        or a list of (start, end, text) rows
+            mtime: File modification time (read from disk if omitted)
+
+        Returns:
+            int: Number of segments indexed
+        """
+        if path.endswith(".gz"):
+            path = path[:-3]
+        if mtime is None:
+            mtime = os.path.getmtime(path if os.path.exists(path) else path + ".gz")
+        rows = transcript if isinstance(transcript, list) else transcript_segments(transcript)
+        rows = [row for row in rows if row[2]]
+        title = os.path.splitext(os.path.basename(path))[0]
+        with self._lock, self._conn:
+            self._delete(path)
+            cursor = self._conn.execute(
+                "INSERT INTO episodes (path, title, mtime, segments, indexed_at) VALUES (?, ?, ?, ?, ?)",
+                (path, title, mtime, len(rows), time.time())
+            )
+            episode_id = cursor.lastrowid
+            for start, end, text in rows:
+                segment_id = self._conn.execute(
+                    "INSERT INTO segments (episode_id, start, end, text) VALUES (?, ?, ?, ?)",
+                    (episode_id, start, end, text)
+                ).lastrowid
+                self._conn.execute(
+                    "INSERT INTO segments_fts (rowid, tokens) VALUES (?, ?)", (segment_id, " ".join(tokenize(text)))
+                )
+        return len(rows)
+
+    def _delete(self, path: str) -> None:
+        row = self._conn.execute("SELECT id FROM episodes WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return
+        self._conn.execute(
+            "DELETE FROM segments_fts WHERE rowid IN (SELECT id FROM segments WHERE episode_id = ?)", (row["id"],)
+        )
+        self._conn.execute("DELETE FROM segments WHERE episode_id = ?", (row["id"],))
+        self._conn.execute("DELETE FROM episodes WHERE id = ?", (row["id"],))
+
+    def remove(self, path: str) -> None:
+        with self._lock, self._conn:
+            self._delete(path)
+
+    def _retokenize(self, path: str) -> None:
+        """Rebuild the FTS rows of an indexed transcript from its stored segments (timestamps kept)"""
+        with self._lock, self._conn:
+            episode_id = self._conn.execute("SELECT id FROM episodes WHERE path = ?", (path,)).fetchone()["id"]
+            self._conn.execute(
+                "DELETE FROM segments_fts WHERE rowid IN (SELECT id FROM segments WHERE episode_id = ?)", (episode_id,)
+            )
+            rows = self._conn.execute("SELECT id, text FROM segments WHERE episode_id = ?", (episode_id,)).fetchall()
+            self._conn.executemany(
+                "INSERT INTO segments_fts (rowid, tokens) VALUES (?, ?)",
+                [(row["id"], " ".join(tokenize(row["text"]))) for row in rows]
+            )
+            self._conn.execute("UPDATE episodes SET indexed_at = ? WHERE id = ?", (time.time(), episode_id))
+
+    def update(self, directory: str = TRANSCRIPT_DIR, rebuild: bool = False) -> dict:
+        """
+        Incrementally sync the index with a transcript directory (new, changed and deleted files)
+
+        Args:
+            directory: Transcript directory
+            rebuild: Also re-index unchanged files. Unchanged txt transcripts are
+                     re-tokenized from their stored segments, because the file no
+                     longer has the timestamps they were indexed with.
+
+        Returns:
+            dict: {"indexed": n, "removed": n, "unchanged": n}
+        """
+        on_disk = {}
+        if os.path.isdir(directory):
+            for entry in os.scandir(directory):
+                name = entry.name[:-3] if entry.name.endswith(".gz") else entry.name
+                if entry.is_file() and name.endswith(TRANSCRIPT_EXTENSIONS):
+                    on_disk[os.path.join(directory, name)] = entry.stat().st_mtime
+        with self._lock:
+            known = {
+                row["path"]: row["mtime"]
+                for row in self._conn.execute("SELECT path, mtime FROM episodes WHERE path LIKE ?", (f"{directory}{os.sep}%",))
+            }
+        result = {"indexed": 0, "removed": 0, "unchanged": 0}
+        for path, mtime in on_disk.items():
+            if known.get(path) == mtime:
+                if not rebuild:
+                    result["unchanged"] += 1
+                    continue
+                if path.endswith(".txt"):
+                    self._retokenize(path)
+                    result["indexed"] += 1
+                    continue
+            try:
+                self.add(path, file_segments(path, read_transcript(path, touch=False)), mtime)
+                result["indexed"] += 1
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"Skipping {path}: {str(e)}")
+        for path in known.keys() - on_disk.keys():
+            self.remove(path)
+            result["removed"] += 1
+        return result
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT) -> list:
+        """
+        Best matching segments
+
+        Returns:
+            list: dicts with title, path, start, end, text, score (best first)
+        """
+        match = build_match_query(query)
+        if not match:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT e.title, e.path, s.start, s.end, s.text, segments_fts.rank AS score
+                   FROM segments_fts
+                   JOIN segments s ON s.id = segments_fts.rowid
+                   JOIN episodes e ON e.id = s.episode_id
+                   WHERE segments_fts MATCH ? ORDER BY segments_fts.rank LIMIT ?""",
+                (match, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def clear(self) -> None:
+        """Drop every indexed transcript"""
+        with self._lock, self._conn:
+            self._conn.executescript("DELETE FROM segments_fts; DELETE FROM segments; DELETE FROM episodes;")
+
+    def stats(self) -> dict:
+        with self._lock:
+            row = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(segments), 0) FROM episodes").fetchone()
+        return {"episodes": row[0], "segments": row[1]}
+
+    def close(self) -> None:
+        self._conn.close()
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_search_index() -> SearchIndex:
+    """
+    Return the process-wide search index
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SearchIndex()
+        return _index
+
+def index_transcript(path: str, transcript) -> None:
+    """
+    Add a freshly saved transcript to the search index; failures only print a warning
+    """
+    try:
+        get_search_index().add(path, transcript)
+    except (sqlite3.Error, OSError) as e:
+        print(f"Search index update failed for {path}: {str(e)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Full-text search over transcripts")
+    parser.add_argument("--db", default=SEARCH_INDEX_PATH, help="Search index file")
+    commands = parser.add_subparsers(dest="command")
+    query = commands.add_parser("query", help="Search transcripts")
+    query.add_argument("terms", nargs="+", help="Words or phrases; all must match")
+    query.add_argument("-n", "--limit", type=int, default=SEARCH_LIMIT, help="Maximum hits")
+    commands.add_parser("update", help="Index new and changed transcripts, drop deleted ones")
+    commands.add_parser("rebuild", help="Re-index every transcript (txt timestamps are kept)")
+    args = parser.parse_args()
+
+    index = SearchIndex(args.db)
+    if args.command in ("update", "rebuild"):
+        start = time.perf_counter()
+        result = index.update(rebuild=args.command == "rebuild")
+        stats = index.stats()
+        print(
+            f"{result['indexed']} indexed, {result['removed']} removed, {result['unchanged']} unchanged "
+            f"in {time.perf_counter() - start:.1f}s ({stats['episodes']} episodes, {stats['segments']} segments)"
+        )
+    elif args.command == "query":
+        text = " ".join(args.terms)
+        start = time.perf_counter()
+        hits = index.search(text, args.limit)
+        elapsed = (time.perf_counter() - start) * 1000
+        for hit in hits:
+            print(f"{format_offset(hit['start']):>9}  {hit['title']}\n           {highlight(hit['text'], text, '[', ']')}")
+        print(f"{len(hits)} hit(s) in {elapsed:.1f} ms")
+    else:
+        parser.print_help()
+    index.close()
+
+if __name__ == "__main__":
+    main()
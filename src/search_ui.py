@@ -0,0 +1,36 @@
+import time
+from search import get_search_index, highlight, format_offset
+
+def render_search_section(st):
+    """
+    Render the transcript search panel of the Streamlit interface
+
+    Args:
+        st: Streamlit object
+    """
+    index = get_search_index()
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        query = st.text_input(
+            "Search all transcripts",
+            placeholder="e.g. 大模型 agent",
+            help="Every word must appear; Chinese is matched as a phrase"
+        )
+    with col2:
+        st.write("")
+        if st.button("🔄 Update Index", help="Index transcripts added outside this app"):
+            with st.spinner("Indexing transcripts..."):
+                result = index.update()
+            st.caption(f"{result['indexed']} indexed, {result['removed']} removed")
+
+    stats = index.stats()
+    if not query:
+        st.caption(f"{stats['episodes']} episodes, {stats['segments']} segments indexed")
+        return
+
+    start = time.perf_counter()
+    hits = index.search(query)
+    elapsed = (time.perf_counter() - start) * 1000
+    st.caption(f"{len(hits)} hit(s) in {elapsed:.0f} ms across {stats['episodes']} episodes")
+    for hit in hits:
+        st.markdown(f"**{hit['title']}** · `{format_offset(hit['start'])}`  \n{highlight(hit['text'], query)}")
@@ -0,0 +1,114 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict, field
+import threading
+from compact import parse_transcript
+
+@dataclass(slots=True)
+class EpisodeMeta:
+    """Episode page metadata"""
+    title: str
+    host: str
+    date: str
+    url: str
+    shownotes: str = ""
+
+    def podcast_info(self) -> dict:
+        """The podcast_info dict expected by upload_to_notion"""
+        return {'title': self.title, 'host': self.host, 'date': self.date, 'url': self.url}
+
+@dataclass(slots=True)
+class AudioArtifact:
+    """Downloaded audio file"""
+    path: str
+    size: int = 0
+    cached: bool = False
+
+@dataclass(slots=True, frozen=True)
+class Word:
+    """One recognized word with its time span (seconds) and probability"""
+    start: float
+    end: float
+    text: str
+    probability: float = 1.0
+
+@dataclass(slots=True, frozen=True)
+class TranscriptSegment:
+    """One recognized segment; start/end are None for untimed text; words only with word timestamps"""
+    start: float
+    end: float
+    text: str
+    words: tuple = None
+
+@dataclass(slots=True)
+class Transcript:
+    """Transcript segments plus where they are (or will be) persisted"""
+    segments: list
+    language: str = None
+    path: str = None
+    # Future of the background write to path, while one is pending
+    saved: object = field(default=None, repr=False, compare=False)
+
+    @property
+    def text(self) -> str:
+        return "\n".join(segment.text.strip() for segment in self.segments)
+
+    @classmethod
+    def from_text(cls, content: str, path: str = None) -> "Transcript":
+        """Build segments from a txt or srt transcript"""
+        parsed = parse_transcript(content)
+        segments = [
+            TranscriptSegment(start, parsed[i + 1][0] if i + 1 < len(parsed) else None, text)
+            for i, (start, text) in enumerate(parsed)
+        ]
+        return cls(segments, path=path)
+
+@dataclass(slots=True)
+class Analysis:
+    """LLM analysis: Markdown text, or section title -> Markdown for template runs"""
+    content: object
+
+@dataclass(slots=True)
+class Episode:
+    """
+    Pipeline item handed from stage to stage in memory
+    """
+    source_url: str
+    meta: EpisodeMeta = None
+    audio: AudioArtifact = None
+    transcript: Transcript = None
+    analysis: Analysis = None
+
+    def to_dict(self, *fields) -> dict:
+        """Selected fields as plain dicts (for ledger artifacts)"""
+        return {name: asdict(getattr(self, name)) for name in fields if getattr(self, name) is not None}
+
+# Single writer so files are persisted in order, off the stage threads
+_persist_executor = None
+_persist_lock = threading.Lock()
+
+def persist(func, *args):
+    """
+    Run a persistence callable (e.g. writing a transcript file) in the background
+
+    Returns:
+        Future: Completes when the data is on disk
+    """
+    global _persist_executor
+    with _persist_lock:
+        if _persist_executor is None:
+            _persist_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="persist")
+        future = _persist_executor.submit(func, *args)
+    future.add_done_callback(
+        lambda f: f.exception() and print(f"Background write failed: {str(f.exception())}")
+    )
+    return future
+
+def flush_persistence() -> None:
+    """
+    Wait until every queued write has finished
+    """
+    global _persist_executor
+    with _persist_lock:
+        executor, _persist_executor = _persist_executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
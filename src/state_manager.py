@@ -1,36 +1,77 @@
 import streamlit as st
+from job_runner import get_job_runner
+
+SESSION_DEFAULTS = {
+    "download_completed": False,
+    "audio_path": None,
+    "podcast_title": None,
+    "podcast_host": None,
+    "publish_date": None,
+    "podcast_url": None,
+    "shownotes": None,
+    "transcript": None,
+    "transcript_path": None,
+    "transcribe_completed": False,
+    "analysis": None,
+    # Background job of the episode opened in this session (see job_runner)
+    "job_id": None,
+    "job_version": -1
+}
 
 def init_session_state():
-    session_defaults = {
-        "download_completed": False,
-        "audio_path": None,
-        "podcast_title": None,
-        "podcast_host": None,
-        "publish_date": None,
-        "podcast_url": None,
-        "transcript": None,
-        "transcript_path": None,
-        "analysis": None,
-        "is_analyzing": False,
-        "is_transcribing": False
-    }
-
-    for key, value in session_defaults.items():
+    for key, value in SESSION_DEFAULTS.items():
         if key not in st.session_state:
             st.session_state[key] = value
 
+    # A reloaded page starts a new session: reopen the job named in the URL
+    if st.session_state.job_id is None and "job" in st.query_params:
+        job = get_job_runner().get(st.query_params["job"])
+        if job:
+            open_job(job)
+    sync_session_state()
+
 def reset_session_state():
-    session_defaults = {
-        "download_completed": False,
-        "audio_path": None,
-        "podcast_title": None,
-        "podcast_host": None,
-        "publish_date": None,
-        "podcast_url": None,
-        "transcript": None,
-        "transcript_path": None,
-        "analysis": None,
-        "is_analyzing": False,
-        "is_transcribing": False
-    }
-    st.session_state.update(session_defaults) 
\ No newline at end of file
+    st.session_state.update(SESSION_DEFAULTS)
+    st.query_params.pop("job", None)
+
+def current_job():
+    """
+    The background job opened in this session, or None
+    """
+    job_id = st.session_state.get("job_id")
+    return get_job_runner().get(job_id) if job_id else None
+
+def open_job(job):
+    """
+    Show a job's episode in this session and remember it in the URL for reloads
+    """
+    st.session_state.update(SESSION_DEFAULTS)
+    st.session_state.job_id = job.id
+    st.query_params["job"] = job.id
+    sync_session_state()
+
+def sync_session_state():
+    """
+    Copy the results of the opened job into the session once it has moved on
+    """
+    job = current_job()
+    if job is None or job.version == st.session_state.job_version:
+        return
+    from storage import read_transcript, transcript_exists
+
+    meta = job.meta or {}
+    transcript_path = job.transcript_path if job.transcript_path and transcript_exists(job.transcript_path) else None
+    st.session_state.update({
+        "download_completed": bool(job.meta and job.audio_path),
+        "audio_path": job.audio_path,
+        "podcast_title": meta.get("title"),
+        "podcast_host": meta.get("host"),
+        "publish_date": meta.get("date"),
+        "podcast_url": meta.get("url"),
+        "shownotes": meta.get("shownotes"),
+        "transcript": read_transcript(transcript_path) if transcript_path else None,
+        "transcript_path": transcript_path,
+        "transcribe_completed": bool(transcript_path),
+        "analysis": job.analysis,
+        "job_version": job.version
+    })
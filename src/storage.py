@@ -0,0 +1,416 @@
+import argparse
+import gzip
+import sqlite3
+import subprocess
+import threading
+import time
+import os
+from metrics import span
+from word_timestamps import words_path
+
+# SQLite index of managed audio and transcript files (sizes, last access, links)
+STORAGE_INDEX_PATH = os.getenv('STORAGE_INDEX_PATH', 'storage.db')
+AUDIO_DIR = "audio_files"
+TRANSCRIPT_DIR = "transcript_files"
+# Disk budget for audio + transcripts in MB; least recently used audio with a saved transcript is evicted (0 = unlimited)
+STORAGE_BUDGET_MB = float(os.getenv('STORAGE_BUDGET_MB', '0'))
+# Re-encode audio to 16 kHz mono Opus once it has been transcribed (1 = on)
+AUDIO_TRANSCODE = os.getenv('AUDIO_TRANSCODE', '0') == '1'
+AUDIO_OPUS_BITRATE = os.getenv('AUDIO_OPUS_BITRATE', '24k')
+# Gzip transcripts not read for this many days (0 = never)
+TRANSCRIPT_COMPRESS_DAYS = float(os.getenv('TRANSCRIPT_COMPRESS_DAYS', '30'))
+
+AUDIO_SUFFIX = "-episode_audio"
+WORDS_SUFFIX = ".words"
+TRANSCRIPT_FORMATS = ("txt", "srt", "json")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,            -- audio / transcript / words (word timestamp sidecar)
+    size INTEGER NOT NULL,
+    original_size INTEGER NOT NULL,
+    last_access REAL NOT NULL,
+    transcript TEXT,               -- audio: transcript covering it; words: transcript it belongs to
+    compressed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS files_lru ON files (kind, last_access);
+"""
+
+def cached_audio(path: str) -> str:
+    """
+    The stored audio for a download path: the file itself or its Opus version (None if neither exists)
+    """
+    for candidate in (path, os.path.splitext(path)[0] + ".opus"):
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+def transcript_exists(path: str) -> bool:
+    """Whether a transcript is stored, plain or gzip-compressed"""
+    return os.path.exists(path) or os.path.exists(path + ".gz")
+
+def transcript_size(path: str) -> int:
+    """Bytes on disk of a stored transcript (plain or compressed)"""
+    return os.path.getsize(path) if os.path.exists(path) else os.path.getsize(path + ".gz")
+
+def read_transcript(path: str, touch: bool = True) -> str:
+    """
+    Read a stored transcript, transparently decompressing archived ones
+
+    Args:
+        path: Transcript path (without .gz)
+        touch: Count as a use (delays compression); off for background readers such as indexing
+    """
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+    else:
+        with gzip.open(path + ".gz", "rt", encoding="utf-8") as f:
+            content = f.read()
+    if touch:
+        get_storage().touch(path)
+    return content
+
+def transcode_to_opus(audio_path: str, bitrate: str = AUDIO_OPUS_BITRATE) -> str:
+    """
+    Re-encode audio to 16 kHz mono Opus (what Whisper consumes anyway) and remove the original
+
+    Returns:
+        str: Path of the .opus file
+    """
+    output_path = os.path.splitext(audio_path)[0] + ".opus"
+    tmp_path = output_path + ".tmp"
+    with span("storage.transcode", bytes_before=os.path.getsize(audio_path)) as transcode_span:
+        try:
+            subprocess.run(
+                ["ffmpeg", "-v", "error", "-y", "-i", audio_path, "-vn", "-ac", "1", "-ar", "16000",
+                 "-c:a", "libopus", "-b:a", bitrate, "-application", "voip", "-f", "ogg", tmp_path],
+                check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
+        except (subprocess.CalledProcessError, OSError):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, output_path)
+        transcode_span.set(bytes_after=os.path.getsize(output_path))
+    os.remove(audio_path)
+    return output_path
+
+def compress_file(path: str) -> str:
+    """
+    Gzip a file in place (atomically) and remove the original, unless compression does not shrink it
+
+    Returns:
+        str: Path of the .gz file, or None if the file was left as it is
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    packed = gzip.compress(data, compresslevel=9)
+    if len(packed) >= len(data):
+        return None
+    output_path = path + ".gz"
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(packed)
+    # Keep the modification time so indexes keyed on it (search) see the same transcript
+    stat = os.stat(path)
+    os.utime(tmp_path, (stat.st_atime, stat.st_mtime))
+    os.replace(tmp_path, output_path)
+    os.remove(path)
+    return output_path
+
+def audio_title(audio_path: str) -> str:
+    """Episode title encoded in an audio filename ("<title>-episode_audio.mp3")"""
+    stem = os.path.splitext(os.path.basename(audio_path))[0]
+    return stem[:-len(AUDIO_SUFFIX)] if stem.endswith(AUDIO_SUFFIX) else stem
+
+class StorageManager:
+    """
+    Lifecycle of downloaded audio and transcripts, tracked in a small SQLite index
+
+    Usage figures come from the index, so the UI never walks the directories;
+    `scan()` reconciles the index with files created or removed outside it.
+    """
+
+    def __init__(self, path: str = STORAGE_INDEX_PATH, budget_mb: float = STORAGE_BUDGET_MB,
+                 transcode: bool = AUDIO_TRANSCODE, compress_days: float = TRANSCRIPT_COMPRESS_DAYS):
+        self.path = path
+        self.budget_bytes = int(budget_mb * 2**20)
+        self.transcode = transcode
+        self.compress_days = compress_days
+        self._lock = threading.Lock()
+        created = not os.path.exists(path)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        if created:
+            # First use: index what is already on disk
+            self.scan()
+
+    def _execute(self, sql: str, params: tuple = ()) -> list:
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).fetchall()
+
+    def register(self, path: str, kind: str, transcript: str = None) -> None:
+        """Record a new or rewritten file as just used"""
+        size = os.path.getsize(path)
+        self._execute(
+            """INSERT INTO files (path, kind, size, original_size, last_access, transcript) VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(path) DO UPDATE SET size = excluded.size, original_size = excluded.size,
+               last_access = excluded.last_access, compressed = 0,
+               transcript = COALESCE(excluded.transcript, files.transcript)""",
+            (path, kind, size, size, time.time(), transcript)
+        )
+
+    def touch(self, path: str) -> None:
+        """Mark a file as recently used (keeps it off the eviction/compression list)"""
+        self._execute("UPDATE files SET last_access = ? WHERE path = ?", (time.time(), path))
+
+    def remove(self, path: str) -> bool:
+        """
+        Delete a managed file and its index entry
+
+        Returns:
+            bool: Whether a file was deleted
+        """
+        self._execute("DELETE FROM files WHERE path = ?", (path,))
+        if os.path.exists(path):
+            os.remove(path)
+            return True
+        return False
+
+    def after_transcription(self, audio_path: str, transcript_path: str) -> str:
+        """
+        Apply the lifecycle once a transcript is saved: link it to the audio, optionally
+        transcode the audio, then enforce the disk budget and compress old transcripts
+
+        Returns:
+            str: Current audio path (the .opus file if it was transcoded)
+        """
+        self.register(transcript_path, "transcript")
+        # The word sidecar counts against the budget but is never compressed (it is read through mmap)
+        if os.path.exists(words_path(transcript_path)):
+            self.register(words_path(transcript_path), "words", transcript_path)
+        self.register(audio_path, "audio", transcript_path)
+        if self.transcode and not audio_path.endswith(".opus"):
+            try:
+                opus_path = transcode_to_opus(audio_path)
+                # original_size keeps the download size, so usage can report the savings
+                self._execute(
+                    "UPDATE files SET path = ?, size = ?, last_access = ? WHERE path = ?",
+                    (opus_path, os.path.getsize(opus_path), time.time(), audio_path)
+                )
+                audio_path = opus_path
+            except (subprocess.CalledProcessError, OSError) as e:
+                print(f"Audio transcode failed, keeping {audio_path}: {str(e)}")
+        self.enforce_budget()
+        self.compress_transcripts()
+        return audio_path
+
+    def enforce_budget(self, budget_bytes: int = None, keep=()) -> list:
+        """
+        Evict least recently used audio whose transcript is saved until usage fits the budget
+
+        Args:
+            budget_bytes: Override the configured budget
+            keep: Audio paths never to evict (e.g. files still used by running jobs)
+
+        Returns:
+            list: Evicted audio paths
+        """
+        budget = self.budget_bytes if budget_bytes is None else budget_bytes
+        if not budget:
+            return []
+        used = self._execute("SELECT COALESCE(SUM(size), 0) FROM files")[0][0]
+        evicted = []
+        if used <= budget:
+            return evicted
+        for row in self._execute(
+            "SELECT path, size, transcript FROM files WHERE kind = 'audio' AND transcript IS NOT NULL ORDER BY last_access"
+        ):
+            if used <= budget:
+                break
+            # Only audio that can never be needed again for this transcript
+            if row["path"] in keep or not transcript_exists(row["transcript"]):
+                continue
+            self.remove(row["path"])
+            used -= row["size"]
+            evicted.append(row["path"])
+        if evicted:
+            print(f"Storage budget: evicted {len(evicted)} audio file(s), {used / 2**20:.0f} MB in use")
+        return evicted
+
+    def compress_transcripts(self, older_than_days: float = None) -> int:
+        """
+        Gzip transcripts not read for the given number of days
+
+        Returns:
+            int: Number of transcripts compressed
+        """
+        days = self.compress_days if older_than_days is None else older_than_days
+        if not days:
+            return 0
+        cutoff = time.time() - days * 86400
+        count = 0
+        for row in self._execute(
+            "SELECT path FROM files WHERE kind = 'transcript' AND compressed = 0 AND last_access < ?", (cutoff,)
+        ):
+            if not os.path.exists(row["path"]):
+                continue
+            compressed_path = compress_file(row["path"])
+            # Marked either way so incompressible files are not retried on every run
+            self._execute(
+                "UPDATE files SET size = ?, compressed = 1 WHERE path = ?",
+                (os.path.getsize(compressed_path or row["path"]), row["path"])
+            )
+            count += compressed_path is not None
+        return count
+
+    def usage(self) -> dict:
+        """
+        Disk usage by kind from the index, plus what eviction could reclaim
+
+        Word sidecars are counted in the bytes of the transcripts they belong to.
+
+        Returns:
+            dict: audio/transcript {"files", "bytes", "original_bytes"}, reclaimable_bytes, budget_bytes
+        """
+        usage = {kind: {"files": 0, "bytes": 0, "original_bytes": 0} for kind in ("audio", "transcript")}
+        for row in self._execute(
+            "SELECT kind, COUNT(*) AS files, SUM(size) AS bytes, SUM(original_size) AS original FROM files GROUP BY kind"
+        ):
+            if row["kind"] == "words":
+                kind_usage = usage["transcript"]
+            else:
+                kind_usage = usage[row["kind"]]
+                kind_usage["files"] += row["files"]
+            kind_usage["bytes"] += row["bytes"]
+            kind_usage["original_bytes"] += row["original"]
+        usage["reclaimable_bytes"] = self._execute(
+            "SELECT COALESCE(SUM(size), 0) FROM files WHERE kind = 'audio' AND transcript IS NOT NULL"
+        )[0][0]
+        usage["budget_bytes"] = self.budget_bytes
+        return usage
+
+    def scan(self) -> dict:
+        """
+        Reconcile the index with the audio and transcript directories
+
+        Returns:
+            dict: {"added": n, "removed": n}
+        """
+        on_disk = {}
+        for directory, kind in ((AUDIO_DIR, "audio"), (TRANSCRIPT_DIR, "transcript")):
+            if not os.path.isdir(directory):
+                continue
+            for entry in os.scandir(directory):
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    # Word sidecars live next to the transcripts but are indexed (and never compressed) on their own
+                    on_disk[entry.path] = ("words" if entry.name.endswith(WORDS_SUFFIX) else kind, entry.stat())
+        # Transcripts are indexed under their plain path; the .gz suffix is the compressed flag
+        transcripts = {}
+        for path, (kind, stat) in on_disk.items():
+            if kind == "transcript":
+                transcripts[path[:-3] if path.endswith(".gz") else path] = (stat, path.endswith(".gz"))
+
+        known = {row["path"] for row in self._execute("SELECT path FROM files")}
+        added = 0
+        now = time.time()
+        with self._lock, self._conn:
+            for path, (stat, compressed) in transcripts.items():
+                if path not in known:
+                    self._conn.execute(
+                        "INSERT INTO files (path, kind, size, original_size, last_access, compressed) VALUES (?, 'transcript', ?, ?, ?, ?)",
+                        (path, stat.st_size, stat.st_size, min(stat.st_atime, now), int(compressed))
+                    )
+                    added += 1
+            for path, (kind, stat) in on_disk.items():
+                if kind != "audio" or path in known:
+                    continue
+                title = audio_title(path)
+                transcript = next((
+                    candidate for candidate in
+                    (os.path.join(TRANSCRIPT_DIR, f"{title}.{fmt}") for fmt in TRANSCRIPT_FORMATS)
+                    if candidate in transcripts
+                ), None)
+                self._conn.execute(
+                    "INSERT INTO files (path, kind, size, original_size, last_access, transcript) VALUES (?, 'audio', ?, ?, ?, ?)",
+                    (path, stat.st_size, stat.st_size, min(stat.st_atime, now), transcript)
+                )
+                added += 1
+            for path, (kind, stat) in on_disk.items():
+                if kind != "words" or path in known:
+                    continue
+                stem = path[:-len(WORDS_SUFFIX)]
+                transcript = next((
+                    candidate for candidate in (f"{stem}.{fmt}" for fmt in TRANSCRIPT_FORMATS)
+                    if candidate in transcripts
+                ), None)
+                self._conn.execute(
+                    "INSERT INTO files (path, kind, size, original_size, last_access, transcript) VALUES (?, 'words', ?, ?, ?, ?)",
+                    (path, stat.st_size, stat.st_size, min(stat.st_atime, now), transcript)
+                )
+                added += 1
+            stale = [path for path in known if path not in on_disk and path not in transcripts]
+            self._conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in stale])
+        return {"added": added, "removed": len(stale)}
+
+    def close(self) -> None:
+        self._conn.close()
+
+_storage = None
+_storage_lock = threading.Lock()
+
+def get_storage() -> StorageManager:
+    """
+    Return the process-wide storage manager
+    """
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            _storage = StorageManager()
+        return _storage
+
+def format_bytes(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+def main():
+    parser = argparse.ArgumentParser(description="Audio and transcript storage")
+    parser.add_argument("--db", default=STORAGE_INDEX_PATH, help="Storage index file")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("usage", help="Disk usage from the index (default)")
+    commands.add_parser("scan", help="Re-index files added or removed outside the app")
+    enforce = commands.add_parser("enforce", help="Evict audio down to the disk budget")
+    enforce.add_argument("--budget-mb", type=float, default=None, help="Override STORAGE_BUDGET_MB")
+    compress = commands.add_parser("compress", help="Gzip transcripts not read recently")
+    compress.add_argument("--days", type=float, default=None, help="Override TRANSCRIPT_COMPRESS_DAYS")
+    args = parser.parse_args()
+
+    storage = StorageManager(args.db)
+    if args.command == "scan":
+        result = storage.scan()
+        print(f"{result['added']} file(s) indexed, {result['removed']} stale entr(ies) removed")
+    elif args.command == "enforce":
+        budget = int(args.budget_mb * 2**20) if args.budget_mb is not None else None
+        print(f"{len(storage.enforce_budget(budget))} audio file(s) evicted")
+    elif args.command == "compress":
+        print(f"{storage.compress_transcripts(args.days)} transcript(s) compressed")
+    else:
+        usage = storage.usage()
+        for kind in ("audio", "transcript"):
+            u = usage[kind]
+            saved = u["original_bytes"] - u["bytes"]
+            print(f"{kind:<11} {u['files']:>5} file(s) {format_bytes(u['bytes']):>10}"
+                  + (f"  ({format_bytes(saved)} saved)" if saved else ""))
+        print(f"Reclaimable audio (transcript saved): {format_bytes(usage['reclaimable_bytes'])}")
+        if usage["budget_bytes"]:
+            print(f"Budget: {format_bytes(usage['budget_bytes'])}")
+    storage.close()
+
+if __name__ == "__main__":
+    main()
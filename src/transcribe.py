@@ -3,18 +3,52 @@ import os
 import subprocess
 from datetime import timedelta
 from pathlib import Path
+import threading
 import time
 
 import filetype
-import requests
-from faster_whisper import WhisperModel
-from pydub import AudioSegment
 from tqdm import tqdm
+from resources import configure_threads, get_thread_plan
+from metrics import span
+from stages import Transcript, TranscriptSegment, Word
+from storage import transcript_exists, read_transcript
+from search import index_transcript
 
 # 初始化配置
 SUPPORTED_API_FORMATS = ['flac', 'm4a', 'mp3', 'mp4', 'mpeg', 'mpga', 'oga', 'ogg', 'wav', 'webm']
 MAX_API_SIZE = 100 * 1024 * 1024  # 调整为更大的文件限制（可选）
 
+# Whisper模型大小（tiny/base/small/medium/large-v3）
+WHISPER_MODEL = os.getenv('WHISPER_MODEL', 'base')
+# 词级时间戳（1 = 开启，本地模式下额外写入 <转录>.words 二进制文件；API模式无词级时间）
+WORD_TIMESTAMPS = os.getenv('WORD_TIMESTAMPS', '0') == '1'
+
+_models = {}
+_models_lock = threading.Lock()
+
+def whisper_model_loaded():
+    """是否已有常驻内存的Whisper模型（准入控制据此判断是否计入模型内存）"""
+    return bool(_models)
+
+def get_whisper_model(device='cpu', compute_type='int8'):
+    """按CPU规划加载并复用Whisper模型（并发转录共享同一模型）"""
+    with _models_lock:
+        model = _models.get((device, compute_type))
+        if model is None:
+            # faster_whisper（ctranslate2、av、tokenizers）较重，首次转录时才导入
+            from faster_whisper import WhisperModel
+            plan = get_thread_plan()
+            with span("transcribe.model_load", device=device, compute_type=compute_type):
+                model = WhisperModel(
+                    WHISPER_MODEL,
+                    device=device,
+                    compute_type=compute_type,
+                    cpu_threads=plan['cpu_threads'],
+                    num_workers=plan['transcribe_workers']
+                )
+            _models[(device, compute_type)] = model
+        return model
+
 def format_timestamp(seconds):
     """将秒转换为SRT时间格式：HH:MM:SS,mmm"""
     millisec = int((seconds - int(seconds)) * 1000)
@@ -81,6 +115,156 @@ def convert_to_supported_format(input_path):
     validate_audio_file(output_path)
     return output_path
 
+def transcribe_segments(audio_path, device_option='cpu', mode='local', api_url=None,
+                        output_format="txt", progress_callback=None):
+    """
+    转录音频并在内存中返回 Transcript（不读写转录文件）
+    
+    并发转录先经准入控制：按音频时长和模型估算内存，超出上限时排队等待。
+    
+    Returns:
+        Transcript: Recognized segments and detected language
+    """
+    if not os.path.exists(audio_path):
+        raise FileNotFoundError(f"Audio file not found: {audio_path}")
+    
+    from admission import ADMISSION_CONTROL, admit_transcription
+    duration = None
+    if ADMISSION_CONTROL and mode != 'api':
+        # 只探测一次时长，准入估算与转录进度共用
+        try:
+            duration = get_audio_duration(audio_path)
+        except Exception:
+            pass  # 准入按文件大小估算，进度用解码器给出的时长
+    if progress_callback:
+        progress_callback(0.05, "Waiting for memory and CPU...")
+    # 等待期间反复调用进度回调，回调抛出的异常（如任务取消）会中止等待
+    on_wait = (lambda: progress_callback(0.05, "Waiting for memory and CPU...")) if progress_callback else None
+    with admit_transcription(
+        audio_path, Path(audio_path).stem, mode, duration, WHISPER_MODEL, whisper_model_loaded(), on_wait
+    ):
+        return _transcribe_segments(audio_path, device_option, mode, api_url, output_format, progress_callback, duration)
+
+def _transcribe_segments(audio_path, device_option, mode, api_url, output_format, progress_callback, duration=None):
+    if mode == 'api':
+        file_type = filetype.guess(audio_path)
+        if not file_type:
+            raise ValueError("Unable to identify file type")
+            
+        print(f"Actual file type: {file_type.extension} (MIME: {file_type.mime})")
+
+        if file_type.extension not in SUPPORTED_API_FORMATS:
+            raise ValueError(f"File type {file_type.extension} not in supported list")
+
+        if not api_url:
+            raise ValueError("API mode requires server URL")
+        
+        if progress_callback:
+            progress_callback(0.1, "Converting audio format...")
+        # mp3 and Ogg/Opus (compact transcoded audio) are uploaded as they are
+        converted_path = convert_to_supported_format(audio_path) if file_type.extension not in ('mp3', 'ogg') else audio_path
+
+        format_mapping = {
+            "txt": "text",
+            "srt": "srt",
+            "vtt": "vtt",
+            "json": "json"
+        }
+        
+        response_format = format_mapping.get(output_format.lower(), 'text')
+        import requests
+
+        try:
+            with open(converted_path, 'rb') as f:
+                files = {'file': f}
+                data = {'response_format': response_format}
+                
+                if progress_callback:
+                    progress_callback(0.3, "Transcribing...")
+                
+                response = requests.post(
+                    api_url,
+                    files=files,
+                    data=data,
+                    timeout=60
+                )
+                response.raise_for_status()
+
+            if response_format == 'srt':
+                content = response.text
+            else:
+                content = response.json().get('text', '')
+        except requests.exceptions.RequestException as e:
+            raise RuntimeError(f"API request failed: {str(e)}")
+        
+        if converted_path != audio_path:
+            Path(converted_path).unlink()
+        return Transcript.from_text(content)
+    
+    device = device_option or 'cpu'
+    compute_type = "float16" if device == "cuda" else "int8"
+    
+    if progress_callback:
+        progress_callback(0.1, "Loading Whisper model...")
+    model = get_whisper_model(device, compute_type)
+    
+    if progress_callback:
+        progress_callback(0.2, "Starting transcription...")
+    
+    start_time = time.time()
+    
+    with span("transcribe.decode") as decode_span:
+        segments, info = model.transcribe(audio_path, beam_size=5, word_timestamps=WORD_TIMESTAMPS)
+        # 解码前 faster-whisper 已读出音频时长，无需再调用 ffprobe
+        duration = duration or info.duration
+        decode_span.set(audio_seconds=duration)
+        
+        processed_segments = []
+        for segment in segments:
+            words = tuple(
+                Word(word.start, word.end, word.word, word.probability) for word in segment.words
+            ) if segment.words else None
+            processed_segments.append(TranscriptSegment(segment.start, segment.end, segment.text, words))
+            if progress_callback:
+                elapsed_time = time.time() - start_time
+                progress = min(0.2 + (0.7 * (elapsed_time / duration)), 0.9) if duration else 0.2
+                progress_callback(progress, f"Transcribing... ({int(elapsed_time)}s / {int(duration)}s)")
+        # 实时率 RTF = 处理耗时 / 音频时长
+        decode_span.set(segments=len(processed_segments), rtf=(time.time() - start_time) / duration if duration else 0.0)
+    
+    print(f"Detected language: {info.language} (confidence: {info.language_probability:.2f})")
+    return Transcript(processed_segments, language=info.language)
+
+def render_transcript(transcript, output_format="txt"):
+    """将 Transcript 渲染为 txt 或 srt 文本（无时间戳的片段只能输出 txt）"""
+    if output_format.lower() == "srt" and all(segment.start is not None for segment in transcript.segments):
+        # 末段无结束时间时沿用开始时间
+        return generate_srt(
+            segment if segment.end is not None else TranscriptSegment(segment.start, segment.start, segment.text)
+            for segment in transcript.segments
+        )
+    return generate_txt(transcript.segments)
+
+def save_transcript(transcript, output_path, output_format="txt"):
+    """
+    原子写入转录文件（先写临时文件再替换，避免中断后留下被当作已完成的半截转录）
+    
+    Returns:
+        str: The written content
+    """
+    content = render_transcript(transcript, output_format)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, output_path)
+    print(f"Successfully saved to: {output_path}")
+    if any(segment.words for segment in transcript.segments):
+        from word_timestamps import words_path, write_words
+        size = write_words(words_path(output_path), transcript.segments)
+        print(f"Saved word timestamps ({size} bytes) to: {words_path(output_path)}")
+    return content
+
 def transcribe_audio(audio_path, output_file, output_format="txt", device_option='cpu', 
                     mode='local', api_url=None, progress_callback=None):
     """
@@ -91,114 +275,32 @@ def transcribe_audio(audio_path, output_file, output_format="txt", device_option
     
     print(f"Starting processing: {audio_path}")
     
-    if not os.path.exists(audio_path):
-        raise FileNotFoundError(f"Audio file not found: {audio_path}")
-    
-    # Check if transcript file already exists
-    if os.path.exists(output_path):
+    # Check if transcript file already exists (the audio may since have been evicted)
+    if transcript_exists(output_path):
         print(f"Transcript file exists: {output_path}")
         try:
-            with open(output_path, "r", encoding="utf-8") as f:
-                return f.read()
+            return read_transcript(output_path)
         except Exception as e:
             print(f"Failed to load existing transcript: {str(e)}")
             # If loading fails, continue with new transcription
     
+    if not os.path.exists(audio_path):
+        raise FileNotFoundError(f"Audio file not found: {audio_path}")
+    
     # If no progress callback is provided, just get info
     if progress_callback is None:
         return output_path, output_file, output_format, mode, api_url
     
     try:
-        if mode == 'api':
-            file_type = filetype.guess(audio_path)
-            if not file_type:
-                raise ValueError("Unable to identify file type")
-                
-            print(f"Actual file type: {file_type.extension} (MIME: {file_type.mime})")
-
-            if file_type.extension not in SUPPORTED_API_FORMATS:
-                raise ValueError(f"File type {file_type.extension} not in supported list")
-
-            if not api_url:
-                raise ValueError("API mode requires server URL")
-            
-            if progress_callback:
-                progress_callback(0.1, "Converting audio format...")
-            converted_path = convert_to_supported_format(audio_path) if file_type.extension != 'mp3' else audio_path
-
-            format_mapping = {
-                "txt": "text",
-                "srt": "srt",
-                "vtt": "vtt",
-                "json": "json"
-            }
-            
-            response_format = format_mapping.get(output_format.lower(), 'text')
-
-            try:
-                with open(converted_path, 'rb') as f:
-                    files = {'file': f}
-                    data = {'response_format': response_format}
-                    
-                    if progress_callback:
-                        progress_callback(0.3, "Transcribing...")
-                    
-                    response = requests.post(
-                        api_url,
-                        files=files,
-                        data=data,
-                        timeout=60
-                    )
-                    response.raise_for_status()
-
-                if response_format == 'srt':
-                    final_content = response.text
-                else:
-                    final_content = response.json().get('text', '')
-            except requests.exceptions.RequestException as e:
-                raise RuntimeError(f"API request failed: {str(e)}")
-            
-            if converted_path != audio_path:
-                Path(converted_path).unlink()
-                
-        else:
-            device = device_option or 'cpu'
-            compute_type = "float16" if device == "cuda" else "int8"
-            
-            if progress_callback:
-                progress_callback(0.1, "Loading Whisper model...")
-            model = WhisperModel("base", device=device, compute_type=compute_type)
-            
-            if progress_callback:
-                progress_callback(0.2, "Starting transcription...")
-            
-            duration = get_audio_duration(audio_path)
-            start_time = time.time()
-            
-            segments, info = model.transcribe(audio_path, beam_size=5)
-            
-            processed_segments = []
-            for segment in segments:
-                processed_segments.append(segment)
-                if progress_callback:
-                    elapsed_time = time.time() - start_time
-                    progress = min(0.2 + (0.7 * (elapsed_time / duration)), 0.9)
-                    progress_callback(progress, f"Transcribing... ({int(elapsed_time)}s / {int(duration)}s)")
-            
-            if progress_callback:
-                progress_callback(0.9, "Processing transcription results...")
-            
-            print(f"Detected language: {info.language} (confidence: {info.language_probability:.2f})")
-            final_content = generate_srt(processed_segments) if output_format.lower() == "srt" else generate_txt(processed_segments)
-
+        transcript = transcribe_segments(audio_path, device_option, mode, api_url, output_format, progress_callback)
+        
         if progress_callback:
+            progress_callback(0.9, "Processing transcription results...")
             progress_callback(1.0, "Saving transcript file...")
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(final_content)
-        
-        print(f"Successfully saved to: {output_path}")
-        return final_content
+        content = save_transcript(transcript, output_path, output_format)
+        # 用内存中的片段建索引，txt 输出也保留时间戳
+        index_transcript(output_path, transcript)
+        return content
     
     except Exception as e:
         if os.path.exists(output_path):
@@ -220,14 +322,27 @@ if __name__ == "__main__":
     parser.add_argument("-d", "--device", default=None, help="运行设备 (cpu/cuda)")
     parser.add_argument("-m", "--mode", choices=["local", "api"], default="local", help="转录模式")
     parser.add_argument("--api-url", help="自托管服务器URL (API模式必需)")
+    parser.add_argument("--profile", action="store_true", help="采样分析热点函数与子进程耗时 (等同 PROFILE=1)")
+    parser.add_argument("--words", action="store_true", help="输出词级时间戳二进制文件 (等同 WORD_TIMESTAMPS=1)")
     
     args = parser.parse_args()
+    configure_threads('cli', verbose=True)
+    if args.words:
+        WORD_TIMESTAMPS = True
     
-    transcribe_audio(
-        args.input,
-        args.output,
-        args.format,
-        args.device,
-        args.mode,
-        args.api_url
-    )
\ No newline at end of file
+    from profiler import PROFILE, start_profiling, stop_profiling, profiled
+    start_profiling(args.profile or PROFILE)
+    try:
+        with profiled("transcribe", args.input):
+            transcribe_audio(
+                args.input,
+                args.output,
+                args.format,
+                args.device,
+                args.mode,
+                args.api_url,
+                # 不传回调时 transcribe_audio 只返回文件信息而不转录
+                progress_callback=lambda progress, message: print(f"[{progress:.0%}] {message}")
+            )
+    finally:
+        stop_profiling()
\ No newline at end of file
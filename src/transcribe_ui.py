@@ -1,13 +1,13 @@
 import os
-# Set environment variables to resolve OpenMP duplicate loading issue
-os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
-os.environ['OMP_NUM_THREADS'] = '1'
+# Plan CPU threads (and OpenMP settings) before torch/ctranslate2 are loaded
+from resources import configure_threads
+configure_threads('ui')
 
 import streamlit as st
-import time
-from pydub import AudioSegment
-from transcribe import transcribe_audio
-import os
+from storage import transcript_size
+from job_runner import get_job_runner
+from jobs_ui import render_job_progress
+from state_manager import current_job
 
 def render_transcribe_section(st):
     """
@@ -28,8 +28,6 @@ def render_transcribe_section(st):
         help="Select the output format for transcription"
     )
     
-    transcript_filename = f"{st.session_state.podcast_title}.{output_format}"
-    transcript_path = os.path.join(transcript_dir, transcript_filename)
 
     # Point 2: Unified mode naming convention
     transcribe_mode = st.radio(
@@ -51,48 +49,21 @@ def render_transcribe_section(st):
             st.warning("API mode requires a valid server URL", icon="⚠️")
             return
 
-    if st.button("Start Transcription", type="primary"):
-        progress_bar = st.progress(0)
-        status_message = st.empty()
-        
-        def update_progress(progress, message):
-            progress_bar.progress(progress)
-            status_message.text(message)
-
-        try:
-            # Point 4: Align parameters with API server
-            transcript = transcribe_audio(
-                audio_path=st.session_state.audio_path,
-                output_file=transcript_filename,
-                output_format=output_format,  # Dynamic format support
-                device_option="cpu",
-                mode=transcribe_mode,  # Use unified mode identifier
-                api_url=api_url,
-                progress_callback=update_progress
-            )
-            
-            st.session_state.transcript = transcript
-            st.session_state.transcript_path = transcript_path
-            st.session_state.transcribe_completed = True
-            
-            st.success("Transcription completed!", icon="✅")
-            st.code(f"File location: {os.path.abspath(transcript_path)}")
+    job = current_job()
+    if st.button("Start Transcription", type="primary", disabled=bool(job and job.active)):
+        # Runs in the background job runner; progress is polled below
+        get_job_runner().submit(job.url if job else st.session_state.podcast_url, [("transcribe", {
+            "format": output_format,  # Dynamic format support
+            "mode": transcribe_mode,  # Use unified mode identifier
+            "api_url": api_url
+        })])
 
-        except Exception as e:
-            # Point 5: Enhanced error handling
-            error_msg = str(e)
-            if "400" in error_msg:
-                st.error(f"Request error: {error_msg.split('detail')[-1]}", icon="🚨")
-            elif "422" in error_msg:
-                st.error(f"Processing error: {error_msg.split('detail')[-1]}", icon="🚧")
-            else:
-                st.error(f"Transcription failed: {error_msg}", icon="❌")
-            st.session_state.transcribe_completed = False
+    render_job_progress(st, "transcribe")
 
     if st.session_state.get("transcribe_completed"):
         st.markdown("### 📝 Transcription Info")
         st.markdown(f"""
-        - **Filename**: `{transcript_filename}`
-        - **Path**: `{transcript_path}`
-        - **Size**: `{os.path.getsize(transcript_path)/1024:.1f} KB`
+        - **Filename**: `{os.path.basename(st.session_state.transcript_path)}`
+        - **Path**: `{st.session_state.transcript_path}`
+        - **Size**: `{transcript_size(st.session_state.transcript_path)/1024:.1f} KB`
         """)
\ No newline at end of file
@@ -0,0 +1,173 @@
+from queue import Queue, Empty
+import re
+import signal
+import threading
+import time
+import xml.etree.ElementTree as ET
+import os
+from metrics import record
+from pipeline import run_pipeline
+
+# How often podcast_urls.txt is checked for changes
+WATCH_INTERVAL_SECONDS = float(os.getenv('WATCH_INTERVAL_SECONDS', '30'))
+# Show pages / RSS feeds checked for new episodes, one URL per line
+PODCAST_FEEDS_FILE = os.getenv('PODCAST_FEEDS_FILE', 'podcast_feeds.txt')
+FEED_INTERVAL_SECONDS = float(os.getenv('FEED_INTERVAL_SECONDS', '900'))
+# Newest episodes taken from a feed the first time it is seen
+FEED_BACKFILL = int(os.getenv('FEED_BACKFILL', '3'))
+
+EPISODE_LINK = re.compile(r'(?:https://www\.xiaoyuzhoufm\.com)?/episode/([0-9a-f]{24})')
+
+def read_url_file(path: str) -> list:
+    """
+    Non-comment lines of a URL list file ([] if it does not exist)
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+    except FileNotFoundError:
+        return []
+
+def fetch_feed_episodes(feed_url: str) -> list:
+    """
+    Episode URLs of a show, newest first
+
+    Accepts an RSS feed (item links) or a Xiaoyuzhou show page (episode links).
+    """
+    import requests
+    response = requests.get(feed_url, timeout=30)
+    response.raise_for_status()
+    text = response.text
+    if text.lstrip().startswith('<?xml') or '<rss' in text[:500]:
+        root = ET.fromstring(response.content)
+        links = [item.findtext('link') for item in root.iter('item')]
+        return [link.strip() for link in links if link]
+    episodes = []
+    for episode_id in EPISODE_LINK.findall(text):
+        url = f"https://www.xiaoyuzhoufm.com/episode/{episode_id}"
+        if url not in episodes:
+            episodes.append(url)
+    return episodes
+
+class Watcher:
+    """
+    Turns changes to the URL list and show feeds into a stream of new episode URLs
+
+    Episodes already uploaded according to the job ledger are ignored, so the
+    same URL is processed at most once across restarts.
+    """
+
+    def __init__(self, ledger, urls_file: str = 'podcast_urls.txt', feeds_file: str = PODCAST_FEEDS_FILE):
+        self.ledger = ledger
+        self.urls_file = urls_file
+        self.feeds_file = feeds_file
+        self.discovered = {}    # url -> time it was queued
+        self._queue = Queue()
+        self._mtime = None
+        self._next_feed_check = 0.0
+        self._known_feeds = set()
+
+    def _offer(self, url: str) -> None:
+        if url in self.discovered:
+            return
+        uploaded = self.ledger.get(url, 'upload')
+        if uploaded and uploaded['status'] == 'done':
+            self.discovered[url] = None
+            return
+        self.ledger.add([url])
+        self.discovered[url] = time.time()
+        self._queue.put(url)
+        print(f"Queued {url}")
+
+    def poll(self) -> None:
+        """Check the URL list (on mtime change) and, when due, the show feeds"""
+        try:
+            mtime = os.stat(self.urls_file).st_mtime
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._mtime:
+            self._mtime = mtime
+            for url in read_url_file(self.urls_file):
+                self._offer(url)
+
+        if time.time() < self._next_feed_check:
+            return
+        self._next_feed_check = time.time() + FEED_INTERVAL_SECONDS
+        for feed in read_url_file(self.feeds_file):
+            try:
+                episodes = fetch_feed_episodes(feed)
+            except Exception as e:
+                print(f"Feed check failed for {feed}: {str(e)}")
+                continue
+            if feed not in self._known_feeds:
+                # First sight of a feed: only its newest episodes, not the whole archive
+                self._known_feeds.add(feed)
+                for url in episodes[FEED_BACKFILL:]:
+                    self.discovered.setdefault(url, None)
+                episodes = episodes[:FEED_BACKFILL]
+            for url in reversed(episodes):
+                self._offer(url)
+
+    def urls(self, stop: threading.Event, interval: float = WATCH_INTERVAL_SECONDS):
+        """
+        Yield new episode URLs until stop is set
+        """
+        next_poll = 0.0
+        while not stop.is_set():
+            if time.time() >= next_poll:
+                self.poll()
+                next_poll = time.time() + interval
+            try:
+                yield self._queue.get(timeout=min(1.0, interval))
+            except Empty:
+                continue
+
+def install_drain_handlers(stop: threading.Event) -> None:
+    """
+    SIGTERM/SIGINT stop taking new episodes; in-flight ones finish. A second signal exits at once.
+    """
+    def handle(signum, frame):
+        print(f"\nReceived {signal.Signals(signum).name}, draining in-flight episodes (signal again to exit now)")
+        stop.set()
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    signal.signal(signal.SIGTERM, handle)
+    signal.signal(signal.SIGINT, handle)
+
+def run_daemon(ledger, stages: list, urls_file: str = 'podcast_urls.txt', stop: threading.Event = None,
+               interval: float = WATCH_INTERVAL_SECONDS) -> dict:
+    """
+    Process episodes as they appear, with models and clients kept warm between them
+
+    Args:
+        ledger: Job ledger (skips finished episodes/stages)
+        stages: Pipeline stages, built once for the whole run
+        urls_file: URL list watched for changes
+        stop: Event that starts a graceful drain (set by SIGTERM/SIGINT by default)
+        interval: Seconds between URL list checks
+
+    Returns:
+        dict: run_pipeline statistics for the whole service run
+    """
+    if stop is None:
+        stop = threading.Event()
+        install_drain_handlers(stop)
+    watcher = Watcher(ledger, urls_file)
+    # Pipeline index -> URL of episodes in flight
+    urls = {}
+
+    def feed():
+        for index, url in enumerate(watcher.urls(stop, interval)):
+            urls[index] = url
+            yield url
+
+    def on_result(index, output):
+        url = urls.pop(index)
+        # Time from discovery to upload; no process startup or model load in the path
+        latency = time.time() - watcher.discovered[url]
+        record("episode.latency", latency, "ok" if output is not None else "error")
+        print(f"{'Finished' if output is not None else 'Failed'} {url} in {latency:.0f}s")
+
+    _, stats = run_pipeline(feed(), stages, on_result)
+    return stats
@@ -0,0 +1,342 @@
+import argparse
+import math
+import mmap
+import struct
+import sys
+import os
+from array import array
+from bisect import bisect_right
+from stages import Word
+
+
+# Binary word-timestamp sidecar (<transcript>.words)
+#
+# Little-endian layout, every column 4-byte aligned after the header:
+#
+#     header          magic "PWTS", version, id width (2 or 4), word/block/segment/string counts, string bytes
+#     block_first     u32[blocks]   index of the first word of each block
+#     block_start     u32[blocks]   absolute start of that word (centiseconds)
+#     segment_first   u32[segments] index of the first word of each transcript segment
+#     string_offsets  u32[strings+1] offsets of each distinct word into the string blob
+#     word_ids        u16|u32[words] string table index of each word
+#     start_deltas    u16[words]    start minus the previous word's start (0 for a block's first word)
+#     durations       u16[words]    end minus start
+#     strings         utf-8 blob
+#     probabilities   u8[words]     probability * 255
+#
+# Starts are delta-encoded inside blocks of at most BLOCK_WORDS words; a block
+# also starts early when a gap does not fit 16 bits. Looking up a time is a
+# binary search over block starts plus a scan of one block.
+MAGIC = b"PWTS"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHIIIII")
+# Seconds per time unit (Whisper word times have 20 ms resolution)
+TIME_UNIT = 0.01
+# Words per delta block: bounds the scan for a random lookup
+BLOCK_WORDS = 64
+U16_MAX = 0xFFFF
+
+def words_path(transcript_path: str) -> str:
+    """Sidecar path of a transcript (shared by its txt/srt and compressed variants)"""
+    if transcript_path.endswith(".gz"):
+        transcript_path = transcript_path[:-3]
+    return os.path.splitext(transcript_path)[0] + ".words"
+
+def encode_words(segments) -> bytes:
+    """
+    Encode the words of transcript segments into the sidecar format
+
+    Starts are clamped to be non-decreasing so blocks stay searchable by time.
+
+    Args:
+        segments: TranscriptSegment list (segments without words keep their place)
+
+    Returns:
+        bytes: Sidecar content
+    """
+    strings = {}
+    word_ids, starts, durations, probabilities = array("I"), array("H"), array("H"), array("B")
+    block_first, block_start, segment_first = array("I"), array("I"), array("I")
+    previous, in_block = None, 0
+    for segment in segments:
+        segment_first.append(len(word_ids))
+        for word in segment.words or ():
+            start = max(round(word.start / TIME_UNIT), previous or 0)
+            end = max(round(word.end / TIME_UNIT), start)
+            if previous is None or in_block == BLOCK_WORDS or start - previous > U16_MAX:
+                block_first.append(len(word_ids))
+                block_start.append(start)
+                starts.append(0)
+                in_block = 0
+            else:
+                starts.append(start - previous)
+            in_block += 1
+            previous = start
+            durations.append(min(end - start, U16_MAX))
+            probabilities.append(min(255, max(0, round(word.probability * 255))))
+            word_ids.append(strings.setdefault(word.text, len(strings)))
+
+    encoded = [text.encode("utf-8") for text in strings]
+    offsets = array("I", [0])
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    id_width = 2 if len(strings) <= U16_MAX + 1 else 4
+    if id_width == 2:
+        word_ids = array("H", word_ids)
+    columns = [block_first, block_start, segment_first, offsets, word_ids, starts, durations]
+    if sys.byteorder != "little":
+        for column in columns + [probabilities]:
+            column.byteswap()
+    header = HEADER.pack(MAGIC, VERSION, id_width, 0, len(word_ids), len(block_first),
+                         len(segment_first), len(strings), offsets[-1])
+    return b"".join([header] + [column.tobytes() for column in columns] + [b"".join(encoded), probabilities.tobytes()])
+
+def write_words(path: str, segments) -> int:
+    """
+    Atomically write a word sidecar
+
+    Returns:
+        int: Bytes written
+    """
+    data = encode_words(segments)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return len(data)
+
+class WordTimestamps:
+    """
+    Memory-mapped word sidecar: random access, time lookup and ranges without decoding the file
+
+    Usage:
+        with WordTimestamps(words_path(transcript_path)) as words:
+            clip = words.between(61.0, 75.5)
+    """
+
+    def __init__(self, path: str):
+        if sys.byteorder != "little":
+            raise OSError("Word sidecars are little-endian; this host is not")
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views = [memoryview(self._mmap)]
+        view = self._views[0]
+        magic, version, id_width, _, words, blocks, segments, strings, string_bytes = HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"Not a version {VERSION} word sidecar: {path}")
+        offset = HEADER.size
+
+        def column(fmt: str, count: int, size: int):
+            nonlocal offset
+            data = self._view(offset, offset + count * size)
+            offset += count * size
+            if fmt != "B":
+                data = data.cast(fmt)
+                self._views.append(data)
+            return data
+
+        self._block_first = column("I", blocks, 4)
+        self._block_start = column("I", blocks, 4)
+        self._segment_first = column("I", segments, 4)
+        self._offsets = column("I", strings + 1, 4)
+        self._ids = column("H" if id_width == 2 else "I", words, id_width)
+        self._deltas = column("H", words, 2)
+        self._durations = column("H", words, 2)
+        self._strings = column("B", string_bytes, 1)
+        self._probabilities = column("B", words, 1)
+        self._texts = {}
+
+    def _view(self, start: int, end: int) -> memoryview:
+        view = self._views[0][start:end]
+        self._views.append(view)
+        return view
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self) -> None:
+        # Views must be released before the map can close
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mmap.close()
+        self._file.close()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def segment_count(self) -> int:
+        return len(self._segment_first)
+
+    def _text(self, string_id: int) -> str:
+        text = self._texts.get(string_id)
+        if text is None:
+            text = bytes(self._strings[self._offsets[string_id]:self._offsets[string_id + 1]]).decode("utf-8")
+            self._texts[string_id] = text
+        return text
+
+    def _start_units(self, index: int) -> int:
+        block = bisect_right(self._block_first, index) - 1
+        first = self._block_first[block]
+        return self._block_start[block] + sum(self._deltas[first + 1:index + 1])
+
+    def _word(self, index: int, start: int) -> Word:
+        return Word(
+            start * TIME_UNIT,
+            (start + self._durations[index]) * TIME_UNIT,
+            self._text(self._ids[index]),
+            self._probabilities[index] / 255
+        )
+
+    def word(self, index: int) -> Word:
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._word(index, self._start_units(index))
+
+    def words(self, first: int = 0, last: int = None):
+        """Iterate words[first:last] sequentially (one delta addition per word)"""
+        last = len(self) if last is None else min(last, len(self))
+        if first >= last:
+            return
+        start = self._start_units(first)
+        block = bisect_right(self._block_first, first)
+        for index in range(first, last):
+            if block < len(self._block_first) and self._block_first[block] == index:
+                start = self._block_start[block]
+                block += 1
+            elif index != first:
+                start += self._deltas[index]
+            yield self._word(index, start)
+
+    def find(self, seconds: float) -> int:
+        """
+        Index of the last word starting at or before the given time (0 if none does)
+        """
+        if not len(self):
+            return -1
+        target = math.floor(seconds / TIME_UNIT + 1e-6)
+        block = max(0, bisect_right(self._block_start, target) - 1)
+        index = self._block_first[block]
+        start = self._block_start[block]
+        end = self._block_first[block + 1] if block + 1 < len(self._block_first) else len(self)
+        while index + 1 < end and start + self._deltas[index + 1] <= target:
+            index += 1
+            start += self._deltas[index]
+        return index
+
+    def between(self, start: float, end: float) -> list:
+        """Words overlapping [start, end) seconds, e.g. for cutting a clip"""
+        words = []
+        for word in self.words(max(0, self.find(start))):
+            if word.start >= end:
+                break
+            if word.end > start:
+                words.append(word)
+        return words
+
+    def segment_words(self, segment: int) -> tuple:
+        """(first, last) word indices of a transcript segment"""
+        first = self._segment_first[segment]
+        last = self._segment_first[segment + 1] if segment + 1 < self.segment_count else len(self)
+        return first, last
+
+def format_time(seconds: float, separator: str = ",") -> str:
+    millis = round(seconds * 1000)
+    return f"{millis // 3600000:02d}:{millis // 60000 % 60:02d}:{millis // 1000 % 60:02d}{separator}{millis % 1000:03d}"
+
+def group_words(timestamps: WordTimestamps, max_words: int = 0, max_seconds: float = 0.0):
+    """
+    Split the words into cues: whole segments, further split by word count and/or duration
+
+    Args:
+        timestamps: Open sidecar
+        max_words: Words per cue at most (1 = one cue per word, 0 = no limit)
+        max_seconds: Cue duration at most (0 = no limit)
+
+    Yields:
+        list: Words of one cue
+    """
+    for segment in range(timestamps.segment_count):
+        first, last = timestamps.segment_words(segment)
+        cue = []
+        for word in timestamps.words(first, last):
+            if cue and ((max_words and len(cue) >= max_words) or (max_seconds and word.end - cue[0].start > max_seconds)):
+                yield cue
+                cue = []
+            cue.append(word)
+        if cue:
+            yield cue
+
+def render_subtitles(timestamps: WordTimestamps, output_format: str = "srt", max_words: int = 0,
+                     max_seconds: float = 0.0) -> str:
+    """
+    Render subtitles from a word sidecar at any granularity
+
+    Args:
+        timestamps: Open sidecar
+        output_format: "srt", "vtt" or "karaoke" (WebVTT with a timestamp tag before each word)
+        max_words, max_seconds: Cue size limits (see group_words)
+
+    Returns:
+        str: Subtitle file content
+    """
+    cues = []
+    for i, cue in enumerate(group_words(timestamps, max_words, max_seconds), start=1):
+        if output_format == "srt":
+            text = "".join(word.text for word in cue).strip()
+            cues.append(f"{i}\n{format_time(cue[0].start)} --> {format_time(cue[-1].end)}\n{text}\n")
+            continue
+        if output_format == "karaoke":
+            # Each word is highlighted from its own start time
+            text = (cue[0].text.lstrip() + "".join(
+                f"<{format_time(word.start, '.')}><c>{word.text}</c>" for word in cue[1:]
+            )).strip()
+        else:
+            text = "".join(word.text for word in cue).strip()
+        cues.append(f"{format_time(cue[0].start, '.')} --> {format_time(cue[-1].end, '.')}\n{text}\n")
+    if output_format == "srt":
+        return "\n".join(cues)
+    return "WEBVTT\n\n" + "\n".join(cues)
+
+def main():
+    parser = argparse.ArgumentParser(description="Word timestamp sidecars")
+    commands = parser.add_subparsers(dest="command", required=True)
+    info = commands.add_parser("info", help="Sizes and counts")
+    info.add_argument("path")
+    render = commands.add_parser("render", help="Write subtitles")
+    render.add_argument("path")
+    render.add_argument("-f", "--format", choices=["srt", "vtt", "karaoke"], default="srt")
+    render.add_argument("--max-words", type=int, default=0, help="Words per cue (1 = word by word; 0 = segments)")
+    render.add_argument("--max-seconds", type=float, default=0.0, help="Longest cue in seconds (0 = no limit)")
+    render.add_argument("-o", "--output", help="Output file (default: stdout)")
+    clip = commands.add_parser("clip", help="Words between two times (seconds)")
+    clip.add_argument("path")
+    clip.add_argument("start", type=float)
+    clip.add_argument("end", type=float)
+    args = parser.parse_args()
+
+    with WordTimestamps(args.path) as timestamps:
+        if args.command == "info":
+            size = os.path.getsize(args.path)
+            print(f"{len(timestamps)} words in {timestamps.segment_count} segments, "
+                  f"{len(timestamps._offsets) - 1} distinct, {size} bytes ({size / max(1, len(timestamps)):.1f} B/word)")
+        elif args.command == "render":
+            content = render_subtitles(timestamps, args.format, args.max_words, args.max_seconds)
+            if args.output:
+                with open(args.output, "w", encoding="utf-8") as f:
+                    f.write(content)
+            else:
+                print(content)
+        else:
+            for word in timestamps.between(args.start, args.end):
+                print(f"{format_time(word.start, '.')}  {format_time(word.end, '.')}  {word.probability:.2f}  {word.text.strip()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import argparse
+import socket
+import threading
+import os
+from dotenv import load_dotenv
+# Load .env before importing modules that read their settings at import time
+load_dotenv()
+from job_ledger import JobLedger, item_url
+from metrics import METRICS_ENABLED, get_recorder, format_metrics_summary
+from pipeline import Stage, run_pipeline, format_pipeline_stats
+
+# Lease length in seconds; workers renew at a third of it while an episode is in progress
+WORKER_LEASE_SECONDS = float(os.getenv('WORKER_LEASE_SECONDS', '120'))
+# How often an idle worker checks for new or abandoned episodes
+WORKER_POLL_SECONDS = float(os.getenv('WORKER_POLL_SECONDS', '5'))
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class LeaseKeeper:
+    """
+    Heartbeat thread renewing a worker's leases in the shared ledger
+
+    Episodes whose lease was lost (expired and claimed by another worker)
+    are remembered so the remaining stages can be skipped.
+    """
+
+    def __init__(self, ledger: JobLedger, owner: str, ttl: float = WORKER_LEASE_SECONDS):
+        self.ledger = ledger
+        self.owner = owner
+        self.ttl = ttl
+        self._active = set()
+        self._lost = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lease-heartbeat", daemon=True)
+
+    def start(self) -> "LeaseKeeper":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def add(self, url: str) -> None:
+        with self._lock:
+            self._active.add(url)
+
+    def discard(self, url: str) -> None:
+        with self._lock:
+            self._active.discard(url)
+            self._lost.discard(url)
+
+    def lost(self, url: str) -> bool:
+        with self._lock:
+            return url in self._lost
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.ttl / 3):
+            with self._lock:
+                active = list(self._active - self._lost)
+            try:
+                lost = self.ledger.renew(self.owner, active, self.ttl)
+            except Exception as e:
+                print(f"Lease renewal failed: {str(e)}")
+                continue
+            if lost:
+                print(f"Lost lease on {len(lost)} episode(s), another worker took over")
+                with self._lock:
+                    self._lost |= lost
+
+def claim_urls(ledger: JobLedger, keeper: LeaseKeeper, stop: threading.Event = None,
+               poll: float = WORKER_POLL_SECONDS):
+    """
+    Yield episodes leased to this worker until the shared queue is drained
+
+    While other workers still hold leases the worker keeps polling, so
+    episodes abandoned by a dead worker are picked up once their lease expires.
+    """
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        url = ledger.claim(keeper.owner, keeper.ttl)
+        if url:
+            keeper.add(url)
+            yield url
+            continue
+        counts = ledger.queue_counts()
+        if not counts["queued"] and not counts["leased"]:
+            return
+        stop.wait(poll)
+
+def _guard(keeper: LeaseKeeper, func):
+    """Skip stages of episodes whose lease moved to another worker"""
+    def run(item):
+        url = item_url(item)
+        if keeper.lost(url):
+            print(f"Dropping {url}: lease lost")
+            return None
+        return func(item)
+    return run
+
+def run_worker(ledger: JobLedger, stages: list, owner: str = None, ttl: float = WORKER_LEASE_SECONDS,
+               stop: threading.Event = None, poll: float = WORKER_POLL_SECONDS) -> dict:
+    """
+    Process episodes from the shared ledger queue until it is empty
+
+    Any number of workers (threads, processes or hosts sharing the ledger file)
+    can run this concurrently; each episode is leased to one worker at a time
+    and its final status is written back only if that worker still holds the lease.
+
+    Args:
+        ledger: Shared job ledger
+        stages: Pipeline stages (e.g. auto_process.build_stages(ledger))
+        owner: Worker ID (defaults to host:pid)
+        ttl: Lease length in seconds
+        stop: Optional event that stops claiming new episodes
+        poll: Idle polling interval in seconds
+
+    Returns:
+        dict: run_pipeline statistics
+    """
+    keeper = LeaseKeeper(ledger, owner or default_worker_id(), ttl).start()
+    claimed = []
+
+    def claims():
+        for url in claim_urls(ledger, keeper, stop, poll):
+            claimed.append(url)
+            yield url
+
+    def on_result(index, output):
+        url = claimed[index]
+        if not ledger.release(keeper.owner, url, output is not None):
+            print(f"Result for {url} discarded: lease lost")
+        keeper.discard(url)
+
+    guarded = [Stage(stage.name, _guard(keeper, stage.func), stage.workers, stage.queue_size) for stage in stages]
+    try:
+        _, stats = run_pipeline(claims(), guarded, on_result)
+    finally:
+        keeper.stop()
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch worker claiming episodes from a shared job ledger")
+    parser.add_argument("--ledger", default=None, help="Ledger file on a volume shared by all workers")
+    parser.add_argument("--enqueue", metavar="FILE", help="Queue the URLs in FILE (e.g. podcast_urls.txt) first")
+    parser.add_argument("--id", default=None, help="Worker ID (default host:pid)")
+    args = parser.parse_args()
+
+    # Imported here so the queue helpers above stay light
+    from auto_process import build_stages
+    from stages import flush_persistence
+
+    ledger = JobLedger(args.ledger) if args.ledger else JobLedger()
+    if args.enqueue:
+        with open(args.enqueue, 'r', encoding='utf-8') as f:
+            urls = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        ledger.enqueue(urls)
+        print(f"Queued {len(urls)} episode(s)")
+
+    owner = args.id or default_worker_id()
+    print(f"Worker {owner} started")
+    if METRICS_ENABLED:
+        get_recorder().start_sampling()
+    stats = run_worker(ledger, build_stages(ledger), owner)
+    # Transcript writes finish (and are recorded in the ledger) before it closes
+    flush_persistence()
+    print("\n" + format_pipeline_stats(stats))
+    if METRICS_ENABLED:
+        get_recorder().close()
+        print(format_metrics_summary())
+    ledger.close()
+
+if __name__ == "__main__":
+    main()
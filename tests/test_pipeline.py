@@ -0,0 +1,43 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from pipeline import RetryLater, Stage, run_pipeline
+
+def test_retry_after_upstream_finished_is_not_lost():
+    # Item 0 asks for a retry only after the first stage has finished and the
+    # second stage's input would otherwise already be closed
+    attempts = []
+
+    def flaky(item):
+        attempts.append(item)
+        if item == 0 and attempts.count(0) == 1:
+            time.sleep(0.3)
+            raise RetryLater(0.2)
+        return item
+
+    results, stats = run_pipeline(range(3), [Stage("a", lambda item: item, 1, 10), Stage("b", flaky, 1, 10)])
+
+    assert results == [0, 1, 2]
+    assert stats["completed"] == 3
+    assert stats["stages"]["b"]["retried"] == 1
+    assert stats["stages"]["b"]["failed"] == 0
+
+def test_on_result_sees_retried_item():
+    seen = {}
+
+    def flaky(item):
+        if item == 1 and 1 not in seen:
+            seen[1] = None
+            raise RetryLater(0.05)
+        return item * 10
+
+    outputs = {}
+    results, stats = run_pipeline(
+        range(3), [Stage("a", flaky, 2)], on_result=lambda index, output: outputs.__setitem__(index, output)
+    )
+
+    assert results == []
+    assert outputs == {0: 0, 1: 10, 2: 20}